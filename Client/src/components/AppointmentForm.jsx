@@ -6,6 +6,8 @@ import { getAllPatients } from "../services/PatientService";
 function AppointmentForm({ onAdd, selectedAppointment, setSelectedAppointment }) {
   const [formData, setFormData] = useState({
     date: "",
+    start_time: "",
+    end_time: "",
     reason: "",
     doctor_id: "",
     patient_id: "",
@@ -22,6 +24,8 @@ function AppointmentForm({ onAdd, selectedAppointment, setSelectedAppointment })
     if (selectedAppointment) {
       setFormData({
         date: selectedAppointment.date,
+        start_time: selectedAppointment.start_time || "",
+        end_time: selectedAppointment.end_time || "",
         reason: selectedAppointment.reason,
         doctor_id: selectedAppointment.doctor_id.toString(),
         patient_id: selectedAppointment.patient_id.toString(),
@@ -37,15 +41,17 @@ function AppointmentForm({ onAdd, selectedAppointment, setSelectedAppointment })
     e.preventDefault();
     try {
       let appointment;
+      // Without an end time the server books the default length
+      const payload = { ...formData, end_time: formData.end_time || undefined };
       if (selectedAppointment) {
-        appointment = await patchAppointment(selectedAppointment.id, formData);
+        appointment = await patchAppointment(selectedAppointment.id, payload);
         setSelectedAppointment(null); // clear form after editing
       } else {
-        appointment = await addAppointment(formData);
+        appointment = await addAppointment(payload);
       }
 
       onAdd(appointment);
-      setFormData({ date: "", reason: "", doctor_id: "", patient_id: "" });
+      setFormData({ date: "", start_time: "", end_time: "", reason: "", doctor_id: "", patient_id: "" });
     } catch (err) {
       console.error(err.message);
     }
@@ -65,6 +71,23 @@ function AppointmentForm({ onAdd, selectedAppointment, setSelectedAppointment })
           className="w-full border px-3 py-2 rounded"
           required
         />
+        <div className="flex space-x-3">
+          <input
+            type="time"
+            name="start_time"
+            value={formData.start_time}
+            onChange={handleChange}
+            className="w-full border px-3 py-2 rounded"
+            required
+          />
+          <input
+            type="time"
+            name="end_time"
+            value={formData.end_time}
+            onChange={handleChange}
+            className="w-full border px-3 py-2 rounded"
+          />
+        </div>
         <input
           type="text"
           name="reason"
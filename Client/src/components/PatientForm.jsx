@@ -1,12 +1,15 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useFormik } from 'formik';
 import * as Yup from 'yup';
-import { createPatient, getAllPatients, deletePatient } from '../services/PatientService';
+import { createPatient, deletePatient } from '../services/PatientService';
+import { createSync } from '../services/ChangeService';
 
 const PatientForm = () => {
   const [patients, setPatients] = useState([]);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
+  // Everything once, then only what changed since (see ChangeService)
+  const sync = useRef(createSync(['patient']));
 
   useEffect(() => {
     fetchPatients();
@@ -14,8 +17,8 @@ const PatientForm = () => {
 
   const fetchPatients = async () => {
     try {
-      const data = await getAllPatients();
-      setPatients(data);
+      const data = await sync.current();
+      setPatients(data.patient);
     } catch (err) {
       console.error('Error fetching patients:', err);
       setError('Failed to load patients');
@@ -1,15 +1,13 @@
 
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useFormik } from 'formik';
 import * as Yup from 'yup';
 import {
-  getAllRecords,
   createRecord,
   updateRecord,
   deleteRecord,
 } from '../services/RecordService';
-import { getAllPatients } from '../services/PatientService';
-import { getDoctors } from '../services/DoctorService';
+import { createSync } from '../services/ChangeService';
 
 const RecordForm = () => {
   const [records, setRecords] = useState([]);
@@ -18,6 +16,8 @@ const RecordForm = () => {
   const [editingId, setEditingId] = useState(null);
   const [success, setSuccess] = useState('');
   const [error, setError] = useState('');
+  // Everything once, then only what changed since (see ChangeService)
+  const sync = useRef(createSync(['medical_record', 'patient', 'doctor']));
 
   useEffect(() => {
     fetchAll();
@@ -25,14 +25,10 @@ const RecordForm = () => {
 
   const fetchAll = async () => {
     try {
-      const [recordsData, patientsData, doctorsData] = await Promise.all([
-        getAllRecords(),
-        getAllPatients(),
-        getDoctors(),
-      ]);
-      setRecords(recordsData);
-      setPatients(patientsData);
-      setDoctors(doctorsData);
+      const data = await sync.current();
+      setRecords(data.medical_record);
+      setPatients(data.patient);
+      setDoctors(data.doctor);
     } catch (err) {
       console.error('Fetch error:', err);
     }
@@ -52,6 +52,7 @@ function Appointments() {
             <thead>
               <tr className="bg-gray-100">
                 <th className="border px-3 py-2">Date</th>
+                <th className="border px-3 py-2">Time</th>
                 <th className="border px-3 py-2">Reason</th>
                 <th className="border px-3 py-2">Doctor</th>
                 <th className="border px-3 py-2">Patient</th>
@@ -62,6 +63,7 @@ function Appointments() {
               {appointments.map((a) => (
                 <tr key={a.id}>
                   <td className="border px-3 py-2">{a.date}</td>
+                  <td className="border px-3 py-2">{a.start_time ? `${a.start_time}–${a.end_time}` : "—"}</td>
                   <td className="border px-3 py-2">{a.reason}</td>
                   <td className="border px-3 py-2">{a.doctor?.name || a.doctor_id}</td>
                   <td className="border px-3 py-2">{a.patient?.name || a.patient_id}</td>
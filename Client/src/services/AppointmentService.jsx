@@ -1,10 +1,9 @@
+import { fetchAllPages } from './api';
+
 const BASE_URL = 'http://localhost:5555/appointments/';
 
-export const getAppointments = async () => {
-  const res = await fetch(BASE_URL);
-  if (!res.ok) throw new Error("Failed to fetch appointments");
-  return res.json();
-};
+// Every appointment, following the server's pages
+export const getAppointments = () => fetchAllPages(BASE_URL, "Failed to fetch appointments");
 
 export const addAppointment = async (appointmentData) => {
   const res = await fetch(BASE_URL, {
@@ -12,7 +11,8 @@ export const addAppointment = async (appointmentData) => {
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(appointmentData),
   });
-  if (!res.ok) throw new Error("Failed to add appointment");
+  // 409 carries the booking it clashes with
+  if (!res.ok) throw new Error((await res.json().catch(() => ({}))).error || "Failed to add appointment");
   return res.json();
 };
 
@@ -23,7 +23,7 @@ export const patchAppointment = async (id, appointmentData) => {
     body: JSON.stringify(appointmentData),
   });
 
-  if (!res.ok) throw new Error("Failed to update appointment");
+  if (!res.ok) throw new Error((await res.json().catch(() => ({}))).error || "Failed to update appointment");
   return res.json();
 };
 
@@ -0,0 +1,28 @@
+import api from './api';
+
+// Keeps local copies of some tables in step with the server through GET /changes.
+// createSync(['medical_record', 'patient']) returns a function; the first call pages through every row of those
+// types (a full sync), later calls fetch only the rows created, changed or deleted since the previous call.
+// Each call resolves to { medical_record: [...], patient: [...] }, every list sorted by id.
+export const createSync = (types) => {
+  let cursor = null;
+  const rows = Object.fromEntries(types.map((type) => [type, new Map()]));
+
+  return async () => {
+    let page;
+    do {
+      const params = new URLSearchParams({ types: types.join(','), limit: '200' });
+      if (cursor) params.set('since', cursor);
+      page = await api.get(`/changes?${params}`);
+      for (const change of page.changes) {
+        if (change.deleted) rows[change.type].delete(change.id);
+        else rows[change.type].set(change.id, change.data);
+      }
+      cursor = page.cursor;
+    } while (page.has_more);
+
+    return Object.fromEntries(
+      types.map((type) => [type, [...rows[type].values()].sort((a, b) => a.id - b.id)])
+    );
+  };
+};
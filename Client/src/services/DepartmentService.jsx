@@ -1,10 +1,11 @@
+import { fetchAllPages } from './api';
+
 const API_BASE_URL = 'http://127.0.0.1:5555/departments';
 
+// Every department, following the server's pages
 export const getDepartments = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/`);
-    if (!response.ok) throw new Error('Failed to fetch departments');
-    return await response.json();
+    return await fetchAllPages(`${API_BASE_URL}/`, 'Failed to fetch departments');
   } catch (error) {
     console.error("Error fetching departments:", error);
     throw error;
@@ -1,7 +1,12 @@
+import { fetchAllPages } from './api';
+
 const BASE_URL = 'http://localhost:5555/doctors';
 
-export const getDoctors = async () => {
-  const res = await fetch(BASE_URL);
+// Every doctor, following the server's pages
+export const getDoctors = () => fetchAllPages(BASE_URL, "Failed to fetch doctors");
+
+export const getDoctorsByIds = async (ids) => {
+  const res = await fetch(`${BASE_URL}?ids=${ids.join(',')}`);
   if (!res.ok) throw new Error("Failed to fetch doctors");
   return res.json();
 };
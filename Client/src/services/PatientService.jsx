@@ -4,12 +4,11 @@
 import api from './api';
 
 // Get all patients
-// Sends a GET request to /patients.
-// await pauses until the data is fetched.
-// response is already parsed JSON (because api.get does that).
+// Sends GET requests to /patients, one page after another (see api.getAll).
+// await pauses until every page is fetched.
 // Returns the list of all patients.
 export const getAllPatients = async () => {
-  const response = await api.get('/patients');
+  const response = await api.getAll('/patients');
   return response; 
 };
 
@@ -41,3 +40,9 @@ export const getPatientRecords = async (id) => {
 };
 
 
+
+// Get several patients by ID in one request (in the order given; unknown IDs are left out)
+export const getPatientsByIds = async (ids) => {
+  const response = await api.get(`/patients?ids=${ids.join(',')}`);
+  return response;
+};
@@ -1,8 +1,8 @@
 import api from './api'; // Import your fetch wrapper
 
-// Get all medical records
+// Get all medical records (every page)
 export const getAllRecords = async () => {
-  const response = await api.get('/records');
+  const response = await api.getAll('/records');
   return response; 
 };
 
@@ -12,6 +12,12 @@ export const getRecordById = async (id) => {
   return response;
 };
 
+// Get several medical records by ID in one request (in the order given; unknown IDs are left out)
+export const getRecordsByIds = async (ids) => {
+  const response = await api.get(`/records?ids=${ids.join(',')}`);
+  return response;
+};
+
 // Create a new medical record
 export const createRecord = async (recordData) => {
   const response = await api.post('/records', recordData);
@@ -63,6 +63,27 @@ const api = {
 
 };
 
+// The collection endpoints (/patients, /doctors, /appointments, ...) return one page per request and send an
+// X-Next-Cursor header while there are more rows. fetchAllPages follows the cursor until the last page and
+// resolves to all the rows. It takes a full URL, so the services that call fetch() directly can use it too.
+export const fetchAllPages = async (url, errorMessage = 'Request failed') => {
+  const rows = [];
+  let cursor = null;
+  do {
+    const pageUrl = new URL(url);
+    pageUrl.searchParams.set('limit', '200');
+    if (cursor) pageUrl.searchParams.set('after', cursor);
+    const res = await fetch(pageUrl, { headers: defaultHeaders });
+    if (!res.ok) throw new Error(errorMessage);
+    rows.push(...(await res.json()));
+    cursor = res.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return rows;
+};
+
+// Every row of a collection, e.g. api.getAll('/patients')
+api.getAll = (endpoint) => fetchAllPages(`${API_BASE_URL}${endpoint}`);
+
 export default api;
 
 
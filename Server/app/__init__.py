@@ -10,35 +10,60 @@ from flask_restful import Api, Resource
 db = SQLAlchemy()
 migrate = Migrate()
 
-def create_app():
+def create_app(config=None):
+    # config: settings applied over app.config.Config (e.g. another SQLALCHEMY_DATABASE_URI)
     app = Flask(__name__)
-    CORS(app, origins=["http://localhost:5173", "http://127.0.0.1:5173"], supports_credentials=True)
+    CORS(app, origins=["http://localhost:5173", "http://127.0.0.1:5173"], supports_credentials=True,
+         expose_headers=["Link", "X-Next-Cursor", "X-Missing-Ids", "ETag", "Last-Modified"])
     app.url_map.strict_slashes = False
 
 
     app.config.from_object('app.config.Config')
+    if config:
+        app.config.update(config)
 
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 
-    db.init_app(app)
+    from .database import init_database
+    init_database(app, db)
 
     migrate.init_app(app,db)
     api = Api(app)
 
-
-    from .routes.patients import HomeResource, Patient_List, Patient_By_ID, PatientMedicalRecords
-    from .routes.medical_records import MedicalRecords, MedicalRecordByID
+    from .cache import init_cache
+    from .compression import init_compression
+    from .conditional import set_validators
+    from .instrumentation import init_instrumentation
+    from .json_provider import init_json
+    init_cache(app)
+    init_json(app)
+    # after_request hooks run last-registered first: the validators, then compression, then instrumentation
+    init_instrumentation(app)
+    init_compression(app)
+    app.after_request(set_validators)
+
+
+    from .routes.patients import (HomeResource, Patient_List, Patient_By_ID, PatientMedicalRecords, PatientBulk,
+                                  PatientSearch, PatientTimeline, WardOccupancy)
+    from .routes.medical_records import (MedicalRecords, MedicalRecordByID, MedicalRecordsBulk, MedicalRecordsExport,
+                                         MedicalRecordsSearch)
     from app.routes.departments import DepartmentByID, DepartmentList
 
 
     # ✅ Add resources here
     api.add_resource(HomeResource, '/')
     api.add_resource(Patient_List, '/patients/')
+    api.add_resource(PatientBulk, '/patients/bulk')
+    api.add_resource(PatientSearch, '/patients/search')
+    api.add_resource(WardOccupancy, '/patients/wards')
     api.add_resource(Patient_By_ID, '/patients/<int:id>')
     api.add_resource(PatientMedicalRecords, '/patients/<int:id>/records')
+    api.add_resource(PatientTimeline, '/patients/<int:id>/timeline')
     api.add_resource(MedicalRecords, '/records/')
+    api.add_resource(MedicalRecordsBulk, '/records/bulk')
+    api.add_resource(MedicalRecordsExport, '/records/export')
+    api.add_resource(MedicalRecordsSearch, '/records/search')
     api.add_resource(MedicalRecordByID, '/records/<int:id>')
     api.add_resource(DepartmentList, '/departments/')
     api.add_resource(DepartmentByID, '/departments/<int:id>')
@@ -47,17 +72,29 @@ def create_app():
 
 
     with app.app_context():
-        from . import models
-        from .routes import appointments, departments, doctors, patients, medical_records
+        from . import models, versions, stats, changes
+        from .routes import appointments, departments, doctors, patients, medical_records, imports
+        from .routes.changes import changes_bp
+        from .routes.stats import stats_bp
+        from .importer import import_command
+        from .search import search_command
+        from .stats import stats_command
 
         # Register blueprints
         app.register_blueprint(doctors.doctor_bp)
         
         app.register_blueprint(appointments.appointment_bp)
+        app.register_blueprint(imports.import_bp)
+        app.register_blueprint(stats_bp)
+        app.register_blueprint(changes_bp)
+        app.cli.add_command(import_command)
+        app.cli.add_command(search_command)
+        app.cli.add_command(stats_command)
         #app.register_blueprint(departments.department_bp)
         #app.register_blueprint(medical_records.record_bp)
 
         db.create_all()
+        versions.ensure_version_rows()
           #
 
     
@@ -0,0 +1,148 @@
+# ASGI serving mode: the same app under an ASGI server (uvicorn asgi:app), with the hot list reads served async.
+#
+# GET /patients/, /appointments/, /records/ and /doctors/ are handled on the event loop. Their table_versions
+# lookup and page query run on an AsyncSession (aiosqlite for SQLite, see database.async_engine()), so a worker
+# waiting on the database goes on accepting and answering other requests instead of holding a thread per request.
+# They build the very queries of the Flask views (patient_list() etc.) inside a Flask request context, and their
+# responses pass through the app's after_request hooks (CORS, ETag, Server-Timing), so both paths answer alike:
+# same bodies, headers, 304s and 400s.
+#
+# Every other request goes to the Flask app through asgiref's WsgiToAsgi, which runs it in a thread pool.
+import sys
+from io import BytesIO
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import request
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from werkzeug.exceptions import HTTPException
+
+from app import create_app, db
+from app.cache import cached_async
+from app.conditional import conditional_get
+from app.database import async_engine
+from app.instrumentation import instrument_engine
+from app.pagination import paginate_async
+from app.routes.appointments import appointment_list
+from app.routes.doctors import doctor_list
+from app.routes.medical_records import record_list
+from app.routes.patients import patient_list
+from app.versions import get_versions_async
+
+# Path -> (the view's list function, whether the view caches its responses)
+HOT_READS = {
+    '/patients': (patient_list, False),
+    '/appointments': (appointment_list, False),
+    '/records': (record_list, False),
+    '/doctors': (doctor_list, True),
+}
+
+
+def _environ(scope):
+    # The WSGI environ of a request without a body, built the way WsgiToAsgi does it
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin1'), value.decode('latin1')
+        if name in ('content-type', 'content-length'):
+            key = name.upper().replace('-', '_')
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _list(session, list_view, cache):
+    # What the Flask view returns, with its two queries awaited on `session`
+    fieldset, query, columns = list_view()
+    tables = fieldset.tables()
+    conditional_get(tables, await get_versions_async(session, tables))
+
+    async def load():
+        page = await paginate_async(session, query, *columns)
+        return fieldset.serialize_many(page.items), page.headers()
+
+    body, headers = await (cached_async(request.url, tables, load) if cache else load())
+    return body, 200, headers
+
+
+class AsyncApp:
+    """ASGI application serving ``flask_app``, with the HOT_READS on an AsyncSession."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        with flask_app.app_context():
+            self.engine = async_engine(flask_app, db.engine)
+        instrument_engine(self.engine.sync_engine)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        hot = None
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            hot = HOT_READS.get(scope['path'][len(scope.get('root_path', '')):].rstrip('/'))
+        if hot is None:
+            return await self.wsgi(scope, receive, send)
+        await self._serve(scope, send, *hot)
+
+    async def _serve(self, scope, send, list_view, cache):
+        app = self.flask_app
+        environ = _environ(scope)
+        with app.request_context(environ):
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    async with self.sessions() as session:
+                        rv = await _list(session, list_view, cache)
+                response = app.make_response(rv)
+            except HTTPException as e:  # bad_request(), or the 304 of conditional_get()
+                response = app.make_response(app.handle_user_exception(e))
+            except Exception as e:
+                response = app.make_response(app.handle_exception(e))
+            response = app.process_response(response)
+            headers = response.get_wsgi_headers(environ)
+            body = b''.join(response.get_app_iter(environ))
+            response.close()
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(config=None):
+    """create_app(config) wrapped for an ASGI server."""
+    return AsyncApp(create_app(config))
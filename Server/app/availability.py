@@ -0,0 +1,171 @@
+# Free appointment slots (GET /doctors/availability).
+#
+# A doctor is free during the working hours (WORKING_HOURS_START to WORKING_HOURS_END on WORKING_DAYS) that none of
+# their timed appointments cover. Slots start on a grid of ?step= minutes from the opening time and last ?duration=
+# minutes. Days are searched in order; for each batch of AVAILABILITY_DOCTOR_BATCH matching doctors a single query
+# reads their appointments that day through the (doctor_id, date) index, sorted by (doctor_id, start_time), and each
+# doctor's day is swept once: a pointer walks the busy intervals while the candidate start walks the grid.
+#
+# Only the earliest ?limit= slots overall are kept. The search ends with the first day that fills them, and once
+# they are full a batch only reads the appointments starting before the last kept slot ends, so a search usually
+# reads one day of the first batch's calendars and a few rows per doctor after that.
+#
+# ?specialization=   case-insensitive prefix ("card" matches Cardiology), for search-as-you-type
+# ?department_id= ?doctor_id=
+# ?from=YYYY-MM-DD&to=YYYY-MM-DD   inclusive (default: today and the 6 days after it)
+# ?duration=   minutes (default APPOINTMENT_MINUTES)   ?step= minutes between slot starts (default: ?duration=)
+# ?limit=   slots returned (default 10, at most MAX_PAGE_SIZE)
+from bisect import insort
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from flask import current_app, request
+from sqlalchemy import select
+
+from app import db
+from app.cache import cached
+from app.errors import bad_request
+from app.export import date_arg, int_arg
+from app.models import Appointment, Doctor, parse_time
+
+DEFAULT_LIMIT = 10
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _clock(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _time(minutes):
+    return time.max if minutes >= 24 * 60 else time(minutes // 60, minutes % 60)
+
+
+def _round_up(minutes, opens, step):
+    # The first grid point (opens + k * step) at or after `minutes`
+    return opens + -(-(minutes - opens) // step) * step
+
+
+def free_slots(busy, opens, closes, duration, step, earliest=None):
+    """Start minutes of the free ``duration``-minute slots between ``opens`` and ``closes``.
+
+    ``busy`` is the day's appointments as (start, end) minutes sorted by start; they may overlap each other.
+    Slots start on the grid ``opens + k * step``, no earlier than ``earliest``.
+    """
+    start = opens if earliest is None or earliest <= opens else _round_up(earliest, opens, step)
+    i = 0
+    while start + duration <= closes:
+        # Intervals that ended by `start` can't overlap this slot or any later one
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        # busy[i] is the first interval still running at `start`; any after it begin no earlier
+        if i < len(busy) and busy[i][0] < start + duration:
+            start = _round_up(busy[i][1], opens, step)
+            continue
+        yield start
+        start += step
+
+
+def _working_hours():
+    config = current_app.config
+    opens = _minutes(parse_time(config['WORKING_HOURS_START']))
+    closes = _minutes(parse_time(config['WORKING_HOURS_END']))
+    days = {int(day) for day in str(config['WORKING_DAYS']).split(',') if day.strip()}
+    return opens, closes, days
+
+
+def _positive_arg(name, default, maximum):
+    value = int_arg(name)
+    if value is None:
+        return default
+    if value < 1:
+        bad_request(f"{name} must be a positive integer")
+    return min(value, maximum)
+
+
+def _doctors(specialization, department_id, doctor_id):
+    # (id, name, specialization, department_id) of the matching doctors, in id order; cached until doctors change
+    def load():
+        query = select(Doctor.id, Doctor.name, Doctor.specialization, Doctor.department_id).order_by(Doctor.id)
+        if specialization:
+            query = query.where(Doctor.specialization.istartswith(specialization, autoescape=True))
+        if department_id is not None:
+            query = query.where(Doctor.department_id == department_id)
+        if doctor_id is not None:
+            query = query.where(Doctor.id == doctor_id)
+        return [tuple(row) for row in db.session.execute(query)]
+
+    return cached(('availability', specialization, department_id, doctor_id), ('doctors',), load)
+
+
+def _busy(doctor_ids, day, before):
+    # {doctor_id: [(start, end) minutes sorted by start]} of one batch of doctors on `day`, in one query. Only
+    # appointments starting before `before` can block a slot that could still be kept.
+    query = (select(Appointment.doctor_id, Appointment.start_time, Appointment.end_time)
+             .where(Appointment.doctor_id.in_(doctor_ids), Appointment.date == day)
+             .where(Appointment.start_time.is_not(None), Appointment.start_time < before)
+             .order_by(Appointment.doctor_id, Appointment.start_time))
+    busy = defaultdict(list)
+    for doctor_id, begins, ends in db.session.execute(query):
+        busy[doctor_id].append((_minutes(begins), _minutes(ends)))
+    return busy
+
+
+def search():
+    """The earliest free slots matching the request's filters, as dicts ordered by (date, start_time, doctor_id)."""
+    config = current_app.config
+    opens, closes, working_days = _working_hours()
+
+    now = datetime.now()
+    start = date_arg('from') or now.date()
+    end = date_arg('to') or start + timedelta(days=6)
+    if end < start:
+        bad_request("to must not be before from")
+    if (end - start).days >= config['AVAILABILITY_MAX_DAYS']:
+        bad_request(f"The range can span at most {config['AVAILABILITY_MAX_DAYS']} days")
+
+    duration = _positive_arg('duration', config['APPOINTMENT_MINUTES'], closes - opens)
+    step = _positive_arg('step', duration, closes - opens)
+    limit = _positive_arg('limit', DEFAULT_LIMIT, config['MAX_PAGE_SIZE'])
+
+    days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+    days = [day for day in days if day >= now.date() and day.isoweekday() in working_days]
+    doctors = _doctors(request.args.get('specialization', '').strip(), int_arg('department_id'), int_arg('doctor_id'))
+    if not days or not doctors:
+        return []
+
+    # The `limit` earliest (date, start, doctor index) found so far, sorted. Days are searched in order, so once the
+    # list is full no later day can improve it; within a day each doctor's sweep stops at the first slot that sorts
+    # after the last kept one, and later batches only read the appointments that could block an earlier slot.
+    best = []
+    batch_size = config['AVAILABILITY_DOCTOR_BATCH']
+    for day in days:
+        if len(best) == limit:
+            break
+        earliest = _minutes(now) if day == now.date() else None
+        if earliest is not None and earliest + duration > closes:
+            continue  # today's working hours are over
+        for first in range(0, len(doctors), batch_size):
+            batch = doctors[first:first + batch_size]
+            latest = closes if len(best) < limit else best[-1][1] + duration
+            busy = _busy([doctor[0] for doctor in batch], day, _time(latest))
+            for index, doctor in enumerate(batch, first):
+                for slot in free_slots(busy.get(doctor[0], ()), opens, closes, duration, step, earliest):
+                    key = (day, slot, index)
+                    if len(best) == limit and key > best[-1]:
+                        break
+                    insort(best, key)
+                    if len(best) > limit:
+                        best.pop()
+
+    return [{
+        'doctor_id': doctors[index][0],
+        'doctor': doctors[index][1],
+        'specialization': doctors[index][2],
+        'department_id': doctors[index][3],
+        'date': day.isoformat(),
+        'start_time': _clock(slot),
+        'end_time': _clock(slot + duration),
+    } for day, slot, index in best]
@@ -0,0 +1,272 @@
+# Helpers for the /bulk endpoints (appointments, patients, records).
+#
+# A bulk request validates every item up front, checks all referenced patient_id/doctor_id values with one
+# IN query per table, then writes the valid items with batched multi-row statements and one commit.
+# Invalid items are reported back by index without blocking the rest of the batch, and so are items found to
+# conflict with a concurrent write once the batch is written (the rest is then written again without them).
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import delete, insert, inspect, select, update
+
+from app import db
+from app.models import column_parsers
+
+# SQLite caps the number of bound parameters per statement, so large IN lists are split
+_IN_CHUNK = 500
+
+
+class BulkResult:
+    """Per-item outcome of a bulk request, in request order."""
+
+    def __init__(self, size):
+        self.items = [None] * size
+
+    def ok(self, index, status, **data):
+        self.items[index] = {'index': index, 'status': status, **data}
+
+    def error(self, index, message, status=400):
+        self.items[index] = {'index': index, 'status': status, 'error': message}
+
+    def failed(self, index):
+        return self.items[index] is not None and 'error' in self.items[index]
+
+    def pending(self):
+        return [i for i, item in enumerate(self.items) if item is None]
+
+    def response(self, success_status):
+        succeeded = sum(1 for item in self.items if item and 'error' not in item)
+        failed = len(self.items) - succeeded
+        if not failed:
+            status = success_status
+        elif succeeded:
+            status = 207  # Multi-Status: some items were applied, some were not
+        else:
+            status = 400
+        return make_response(jsonify({'succeeded': succeeded, 'failed': failed, 'results': self.items}), status)
+
+
+def bulk_items():
+    """The request's JSON array, or an error response if it isn't one (or is too large)."""
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return None, make_response(jsonify({'error': 'Expected a non-empty JSON array'}), 400)
+
+    limit = current_app.config['BULK_MAX_ITEMS']
+    if len(items) > limit:
+        return None, make_response(jsonify({'error': f'At most {limit} items per request'}), 400)
+    return items, None
+
+
+def is_id(value):
+    """Whether ``value`` can be a row id (a JSON integer; anything else, e.g. a list, can't even be looked up)."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def values_by_id(model, column, ids):
+    """{id: ``column``} for the ``ids`` that exist in ``model``'s table, in one query per chunk."""
+    ids = list({i for i in ids if is_id(i)})
+    found = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        found.update(db.session.execute(select(model.id, column).where(model.id.in_(chunk))).all())
+    return found
+
+
+def existing_ids(model, ids):
+    """The subset of ``ids`` that exist in ``model``'s table, in one query per chunk."""
+    return set(values_by_id(model, model.id, ids))
+
+
+def check_required(result, index, item, fields):
+    if not isinstance(item, dict):
+        result.error(index, 'Item must be a JSON object')
+        return False
+    missing = [field for field in fields if item.get(field) in (None, '')]
+    if missing:
+        result.error(index, f"Missing required fields: {', '.join(missing)}")
+        return False
+    return True
+
+
+def check_values(result, index, item, model):
+    """Check and parse the item's fields by column type, in place; the Core statements used here skip the model's
+    validators (and SQLite would store a string in an INTEGER column as it is)."""
+    for field, parse in column_parsers(model).items():
+        if item.get(field) is not None:
+            try:
+                item[field] = parse(item[field])
+            except ValueError as e:
+                result.error(index, str(e))
+                return False
+    return True
+
+
+def check_references(result, items, indexes, references, status=400):
+    """Reject items whose foreign keys don't exist; ``references`` maps field name -> model."""
+    for field, model in references.items():
+        present = [i for i in indexes if field in items[i]]
+        found = existing_ids(model, [items[i][field] for i in present])
+        for i in present:
+            if result.failed(i):
+                continue
+            if not is_id(items[i][field]):
+                result.error(i, f"Invalid {field}: {items[i][field]!r}")
+            elif items[i][field] not in found:
+                result.error(i, f"Invalid {field}: {items[i][field]!r}", status)
+    return [i for i in indexes if not result.failed(i)]
+
+
+def _insert_returning_ids(table, rows):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # SQLite can't tell SQLAlchemy which RETURNING row belongs to which parameter set, so asking for them in
+        # order makes it fall back to one INSERT per row. SQLite hands out ascending rowids within the statement,
+        # so the sorted ids are in parameter order anyway.
+        return sorted(db.session.scalars(insert(table).returning(table.c.id), rows))
+    return db.session.scalars(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows).all()
+
+
+def insert_rows(model, rows):
+    """INSERT ``rows`` with batched multi-row statements; returns the new ids in the same order.
+
+    Rows of a subtype (Inpatient, Outpatient) are split between the base table and the subtype's table here:
+    the ORM's own bulk INSERT would need each new id individually and so insert them one row at a time.
+    Rows that bring their own id are inserted as they are.
+    """
+    mapper = inspect(model)
+    base = mapper.base_mapper.local_table
+    subtables = [table for table in mapper.tables if table is not base]
+
+    # executemany needs the same keys in every row
+    groups = {}
+    for index, row in enumerate(rows):
+        groups.setdefault(tuple(sorted(row)), []).append(index)
+
+    ids = [None] * len(rows)
+    for keys, indexes in groups.items():
+        base_rows = [{key: rows[i][key] for key in keys if key in base.c} for i in indexes]
+        if 'id' in keys:
+            db.session.execute(insert(base), base_rows)
+            new_ids = [rows[i]['id'] for i in indexes]
+        else:
+            new_ids = _insert_returning_ids(base, base_rows)
+
+        for table in subtables:
+            db.session.execute(insert(table), [
+                {**{key: rows[i][key] for key in keys if key in table.c}, 'id': new_id}
+                for i, new_id in zip(indexes, new_ids)
+            ])
+        for i, new_id in zip(indexes, new_ids):
+            ids[i] = new_id
+    return ids
+
+
+def update_rows(model, rows):
+    """UPDATE ``rows`` (each with its ``id``) by primary key; returns their ids in the same order.
+
+    This is the ORM's bulk UPDATE: one executemany per distinct set of columns, and for a subtype (Inpatient,
+    Outpatient) each row's columns are split between the base table and the subtype's table, as insert_rows does.
+    """
+    db.session.execute(update(model), rows)
+    return [row['id'] for row in rows]
+
+
+def write_verified(result, indexes, write, status, verify=None):
+    """Write the items at ``indexes`` and commit them, reporting each as ``status`` with its id.
+
+    ``write(indexes)`` writes those items and returns their ids, in order. ``verify(ids)`` then runs on the
+    written rows before the commit and returns {id: error message} for the rows that conflict with one written
+    concurrently (see app/scheduling.py). Those items are reported as 409, the transaction is rolled back and the
+    others are written again, until a write verifies clean.
+    """
+    while indexes:
+        ids = write(indexes)
+        conflicts = verify(ids) if verify else {}
+        if not conflicts:
+            db.session.commit()
+            for i, id in zip(indexes, ids):
+                result.ok(i, status, id=id)
+            return
+        db.session.rollback()
+        for i, id in zip(indexes, ids):
+            if id in conflicts:
+                result.error(i, conflicts[id], 409)
+        indexes = [i for i in indexes if not result.failed(i)]
+
+
+def bulk_create(model, fields, references, optional=(), check=None, verify=None):
+    """Insert the request's items; ``fields`` are required, ``optional`` ones are written when present.
+
+    ``check(result, items, indexes)`` can reject more items before the write and returns the indexes to keep;
+    ``verify(ids)`` rejects written rows before the commit, see write_verified().
+    """
+    items, error = bulk_items()
+    if error:
+        return error
+
+    result = BulkResult(len(items))
+    valid = [i for i, item in enumerate(items)
+             if check_required(result, i, item, fields) and check_values(result, i, item, model)]
+    valid = check_references(result, items, valid, references)
+    if check:
+        valid = check(result, items, valid)
+
+    columns = [*fields, *optional]
+
+    def write(indexes):
+        return insert_rows(model, [{field: items[i][field] for field in columns if field in items[i]}
+                                   for i in indexes])
+
+    write_verified(result, valid, write, 201, verify)
+    return result.response(201)
+
+
+def bulk_update(model, fields, references, check=None, verify=None):
+    """Apply the request's partial updates; ``check`` and ``verify`` as for bulk_create()."""
+    items, error = bulk_items()
+    if error:
+        return error
+
+    result = BulkResult(len(items))
+    valid = [i for i, item in enumerate(items)
+             if check_required(result, i, item, ['id']) and check_values(result, i, item, model)]
+    valid = check_references(result, items, valid, {'id': model}, status=404)
+    valid = check_references(result, items, valid, references)
+    if check:
+        valid = check(result, items, valid)
+
+    rows = {i: {'id': items[i]['id'], **{field: items[i][field] for field in fields if field in items[i]}}
+            for i in valid}
+    # Items that change nothing are reported as they are, without a write
+    for i in valid:
+        if len(rows[i]) == 1:
+            result.ok(i, 200, id=items[i]['id'])
+    changed = [i for i in valid if len(rows[i]) > 1]
+
+    write_verified(result, changed, lambda indexes: update_rows(model, [rows[i] for i in indexes]), 200, verify)
+    return result.response(200)
+
+
+def bulk_delete(model, dependents=()):
+    """Delete the ids in the request body; ``dependents`` are (model, fk column) rows removed with them."""
+    ids, error = bulk_items()
+    if error:
+        return error
+
+    result = BulkResult(len(ids))
+    found = existing_ids(model, ids)
+    for i, id in enumerate(ids):
+        if not is_id(id):
+            result.error(i, f"Invalid id: {id!r}")
+        elif id in found:
+            result.ok(i, 200, id=id)
+        else:
+            result.error(i, f"Not found: {id!r}", 404)
+
+    found = list(found)
+    for start in range(0, len(found), _IN_CHUNK):
+        chunk = found[start:start + _IN_CHUNK]
+        # A bulk DELETE skips ORM cascades, so children go first, explicitly
+        for table, column in dependents:
+            db.session.execute(delete(table).where(column.in_(chunk)))
+        db.session.execute(delete(model.__table__).where(model.__table__.c.id.in_(chunk)))
+    db.session.commit()
+    return result.response(200)
@@ -0,0 +1,233 @@
+# In-process read cache for reference data (departments, doctors) and existence checks.
+#
+# Entries are tagged with the tables they were read from, and keyed by those tables' table_versions counters
+# (app/versions.py) as well as by the caller's key. Every write bumps the counters in its own transaction, so
+# once another process (e.g. another gunicorn worker) commits a change, the next lookup here asks for a key that
+# has not been stored and reads the database again. Routes that called conditional_get() reuse the counters it
+# read, so a cached body is always the one its ETag stands for; other lookups read them with one small SELECT.
+#
+# Within the process, after_commit also drops every entry tagged with a table the transaction wrote (after_flush
+# for ORM changes, do_orm_execute for bulk statements, see app/versions.py), so stale entries don't linger until
+# CACHE_TTL or LRU eviction removes them.
+#
+# Backends are pluggable through CACHE_BACKEND ('memory' or 'null'), or by passing any object with the same
+# interface to init_cache().
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from flask import Blueprint, current_app, g, has_app_context, has_request_context, jsonify
+from sqlalchemy import event, inspect
+
+from app import db
+from app.versions import get_versions
+
+_MISSING = object()
+
+
+class MemoryCache:
+    """LRU cache with a per-entry TTL and table tags, safe to share between request threads."""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, value, tags)
+        self._tagged = defaultdict(set)  # table -> keys
+        self._generations = defaultdict(int)  # table -> number of invalidations, see get_or_load()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags=(), generations=None):
+        with self._lock:
+            # A table written while the value was being computed makes the value stale before it is stored
+            if generations is not None and any(self._generations[tag] != gen for tag, gen in generations.items()):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tuple(tags))
+            for tag in tags:
+                self._tagged[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_load(self, key, tags, load):
+        value = self.get(key)
+        if value is _MISSING:
+            with self._lock:
+                generations = {tag: self._generations[tag] for tag in tags}
+            value = load()
+            self.set(key, value, tags, generations)
+        return value
+
+    async def get_or_load_async(self, key, tags, load):
+        # get_or_load() for a coroutine function `load`
+        value = self.get(key)
+        if value is _MISSING:
+            with self._lock:
+                generations = {tag: self._generations[tag] for tag in tags}
+            value = await load()
+            self.set(key, value, tags, generations)
+        return value
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] += 1
+                for key in list(self._tagged.pop(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+
+class NullCache:
+    """Caches nothing; every read goes to the database."""
+
+    def __init__(self, **kwargs):
+        self.misses = 0
+
+    def get(self, key):
+        self.misses += 1
+        return _MISSING
+
+    def set(self, key, value, tags=(), generations=None):
+        pass
+
+    def get_or_load(self, key, tags, load):
+        self.misses += 1
+        return load()
+
+    async def get_or_load_async(self, key, tags, load):
+        self.misses += 1
+        return await load()
+
+    def invalidate(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': 'null', 'misses': self.misses}
+
+
+BACKENDS = {
+    'memory': MemoryCache,
+    'null': NullCache,
+}
+
+
+def init_cache(app, backend=None):
+    if backend is None:
+        backend = BACKENDS[app.config['CACHE_BACKEND']](
+            max_entries=app.config['CACHE_MAX_ENTRIES'],
+            ttl=app.config['CACHE_TTL'],
+        )
+    app.extensions['cache'] = backend
+    app.register_blueprint(cache_bp)
+
+
+def get_cache():
+    return current_app.extensions['cache']
+
+
+def table_versions(tables):
+    """{table: (version, updated_at)} of ``tables``, read once per request (conditional_get() records its own)."""
+    if not has_request_context():
+        return get_versions(tables)
+    known = g.setdefault('table_versions', {})
+    missing = [name for name in tables if name not in known]
+    if missing:
+        versions = get_versions(missing)
+        known.update({name: versions.get(name, (0, None)) for name in missing})
+    return known
+
+
+def _versioned(key, tables, versions):
+    return key, tuple(versions.get(name, (0, None))[0] for name in tables)
+
+
+def cached(key, tables, load):
+    """Return ``load()`` through the cache, tagged with the ``tables`` it reads."""
+    tables = tuple(sorted(tables))
+    return get_cache().get_or_load(_versioned(key, tables, table_versions(tables)), tables, load)
+
+
+async def cached_async(key, tables, load):
+    """cached() for a coroutine function ``load``, after conditional_get() has been given the tables' versions."""
+    tables = tuple(sorted(tables))
+    return await get_cache().get_or_load_async(_versioned(key, tables, g.table_versions), tables, load)
+
+
+def exists(model, id):
+    """Cached "is there a row with this primary key" check, for validating foreign keys on writes."""
+    if id is None:
+        return False
+    table = inspect(model).local_table.name
+    return cached(('exists', table, id), (table,), lambda: db.session.get(model, id) is not None)
+
+
+# === Invalidation ===
+# app/versions.py records the tables each transaction writes; once it commits, entries read from them are dropped
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_written(session):
+    tables = session.info.get('written_tables')
+    if tables and has_app_context() and 'cache' in current_app.extensions:
+        get_cache().invalidate(tables)
+    if tables and has_request_context() and 'table_versions' in g:
+        # The request's own write moved these counters on
+        for name in tables:
+            g.table_versions.pop(name, None)
+
+
+# === Monitoring ===
+
+cache_bp = Blueprint('cache_bp', __name__)
+
+
+@cache_bp.route('/_cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_cache().stats()), 200
@@ -0,0 +1,225 @@
+# Change feed (GET /changes?since=<cursor>): the rows created, changed or deleted since a client last synced.
+#
+# Every write transaction takes the next number from change_revision (one row, incremented with an upsert) the
+# first time it writes a patient, doctor, appointment, medical record or department, and stamps it on each row it
+# inserts or updates (the indexed `revision` column). Deleted rows leave a tombstone with that revision instead.
+# Taking the number is itself a write to that row, so transactions that write get their revisions in commit
+# order: once a client has seen revision n, nothing committed later can come in at n or below.
+#
+#   ORM flushes         before_insert/before_update set `revision`, after_delete writes the tombstone, for every
+#                       row the unit of work touches (cascades and orphans included)
+#   bulk statements     INSERT/UPDATE get `revision` added to their parameters or SET clause; a DELETE first reads
+#                       the ids it is about to remove, for their tombstones
+#
+# The feed is ordered by (revision, type, id) and read with keyset pagination from each table's revision index,
+# so a page costs a few index range scans however large the tables are.
+#
+# ?since=   the cursor returned by the previous call (none: everything, i.e. a full sync)
+# ?types=   patient,appointment,... (default: all)
+# ?limit=   changes per page (DEFAULT_PAGE_SIZE, at most MAX_PAGE_SIZE); has_more says whether to call again now
+import heapq
+
+from sqlalchemy import event, inspect, insert, select, update
+
+from app import db
+from app.database import upsert_insert
+from app.errors import bad_request
+from app.fieldsets import columns_fieldset
+from app.models import Appointment, ChangeRevision, Department, Doctor, Medical_Record, Patient, Tombstone
+from app.pagination import decode_cursor, encode_cursor, get_limit, merged_after
+
+# Feed order of the types; tombstones come last within a revision
+TYPES = {
+    'department': Department,
+    'doctor': Doctor,
+    'patient': Patient,
+    'appointment': Appointment,
+    'medical_record': Medical_Record,
+}
+_TOMBSTONES = len(TYPES)
+_TYPE_OF_TABLE = {model.__table__: name for name, model in TYPES.items()}
+
+_IN_CHUNK = 500
+
+_counter = ChangeRevision.__table__
+_tombstones = Tombstone.__table__
+
+# A cursor is the (revision, feed position of the type, id) of the last change returned
+_CURSOR_COLUMNS = (_tombstones.c.revision, _tombstones.c.id, _tombstones.c.row_id)
+
+
+# === Revisions ===
+
+def _next_revision(connection):
+    upsert = upsert_insert(connection)
+    if upsert is None:
+        if not connection.execute(update(_counter).values(revision=_counter.c.revision + 1)).rowcount:
+            connection.execute(insert(_counter).values(id=1, revision=1))
+        return connection.scalar(select(_counter.c.revision))
+    statement = upsert(_counter).values(id=1, revision=1)
+    statement = statement.on_conflict_do_update(index_elements=[_counter.c.id],
+                                                set_={'revision': _counter.c.revision + 1})
+    return connection.scalar(statement.returning(_counter.c.revision))
+
+
+def revision(session, connection=None):
+    """The revision of ``session``'s current transaction, taken on its first write."""
+    current = session.info.get('change_revision')
+    if current is None:
+        current = session.info['change_revision'] = _next_revision(connection or session.connection())
+    return current
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _forget_revision(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('change_revision', None)
+
+
+def _tombstone_rows(type_name, ids, current):
+    return [{'revision': current, 'type': type_name, 'row_id': id} for id in ids]
+
+
+# === ORM flushes ===
+
+def _stamp_insert(mapper, connection, target):
+    target.revision = revision(inspect(target).session, connection)
+
+
+def _stamp_update(mapper, connection, target):
+    session = inspect(target).session
+    # Objects flushed only because a collection of theirs changed keep their revision
+    if session.is_modified(target, include_collections=False):
+        target.revision = revision(session, connection)
+
+
+def _record_delete(mapper, connection, target):
+    type_name = _TYPE_OF_TABLE[mapper.base_mapper.local_table]
+    current = revision(inspect(target).session, connection)
+    connection.execute(insert(_tombstones), _tombstone_rows(type_name, [inspect(target).identity[0]], current))
+
+
+for _model in TYPES.values():
+    event.listen(_model, 'before_insert', _stamp_insert, propagate=True)
+    event.listen(_model, 'before_update', _stamp_update, propagate=True)
+    event.listen(_model, 'after_delete', _record_delete, propagate=True)
+
+
+# === Bulk statements ===
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _stamp_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    statement = orm_execute_state.statement
+    mapper = orm_execute_state.bind_mapper
+    # A subtype (e.g. update(Inpatient)) is stamped on its base table, which holds the revision column
+    table = mapper.base_mapper.local_table if mapper is not None else statement.table
+    type_name = _TYPE_OF_TABLE.get(table)
+    if type_name is None:
+        return None
+
+    session = orm_execute_state.session
+    current = revision(session)
+    if orm_execute_state.is_delete:
+        query = select(table.c.id)
+        if statement.whereclause is not None:
+            query = query.where(statement.whereclause)
+        ids = list(session.connection().scalars(query))
+        for start in range(0, len(ids), _IN_CHUNK):
+            session.connection().execute(insert(_tombstones),
+                                         _tombstone_rows(type_name, ids[start:start + _IN_CHUNK], current))
+        return None
+
+    parameters = orm_execute_state.parameters
+    if orm_execute_state.is_executemany:
+        return orm_execute_state.invoke_statement(params=[{'revision': current}] * len(parameters))
+    if parameters:
+        return orm_execute_state.invoke_statement(params={'revision': current})
+    # Values given with .values(...) rather than as parameters
+    return orm_execute_state.invoke_statement(statement=statement.values(revision=current))
+
+
+# === Feed ===
+
+def _sources(types):
+    # [(position in the feed order, type name or None for tombstones)]
+    return [(position, name) for position, name in enumerate(TYPES) if name in types] + [(_TOMBSTONES, None)]
+
+
+def _keys(position, name, types, cursor, limit):
+    # (revision, position, id, tombstone type, tombstone row id) of the first `limit` changes of one source
+    if name is None:
+        query = (select(_tombstones.c.revision, _tombstones.c.id, _tombstones.c.type, _tombstones.c.row_id)
+                 .where(merged_after(_tombstones.c.revision, _tombstones.c.id, position, cursor))
+                 .order_by(_tombstones.c.revision, _tombstones.c.id))
+        if len(types) < len(TYPES):
+            query = query.where(_tombstones.c.type.in_(types))
+    else:
+        table = TYPES[name].__table__
+        query = (select(table.c.revision, table.c.id)
+                 .where(merged_after(table.c.revision, table.c.id, position, cursor))
+                 .order_by(table.c.revision, table.c.id))
+    return [(row[0], position, row[1], *row[2:]) for row in db.session.execute(query.limit(limit))]
+
+
+def _rows(name, ids):
+    # {id: serialized row} with every column of the type
+    fieldset = columns_fieldset(TYPES[name])
+    model = TYPES[name]
+    rows = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        objs = fieldset.query().filter(model.id.in_(ids[start:start + _IN_CHUNK])).all()
+        rows.update(zip((obj.id for obj in objs), fieldset.serialize_many(objs)))
+    return rows
+
+
+def parse_types(value):
+    if not value:
+        return list(TYPES)
+    types = [item.strip() for item in value.split(',') if item.strip()]
+    unknown = [name for name in types if name not in TYPES]
+    if unknown:
+        bad_request(f"Unknown type '{unknown[0]}': expected some of {', '.join(TYPES)}")
+    return types
+
+
+def tables(types):
+    """Tables the feed for ``types`` reads, for conditional GETs and cache tags."""
+    names = set()
+    for name in types:
+        for mapper in inspect(TYPES[name]).self_and_descendants:
+            names.update(table.name for table in mapper.tables)
+    return sorted(names)
+
+
+def feed(since, types):
+    """{'changes': [...], 'cursor': ..., 'has_more': ...} for the changes after the ``since`` cursor."""
+    cursor = (-1, 0, 0) if not since else tuple(decode_cursor(since, _CURSOR_COLUMNS))
+    limit = get_limit()
+
+    # Each source is read in (revision, id) order up to one more than a page, then the sources are merged
+    keys = [_keys(position, name, types, cursor, limit + 1) for position, name in _sources(types)]
+    page = list(heapq.merge(*keys))[:limit + 1]
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    names = list(TYPES)
+    data = {}
+    for position, name in _sources(types):
+        ids = [key[2] for key in page if key[1] == position]
+        if name is not None and ids:
+            data[name] = _rows(name, ids)
+
+    changes = []
+    for key in page:
+        change_revision, position, id = key[:3]
+        if position == _TOMBSTONES:
+            changes.append({'type': key[3], 'id': key[4], 'revision': change_revision, 'deleted': True})
+            continue
+        row = data[names[position]].get(id)
+        if row is not None:  # deleted since the keys were read
+            changes.append({'type': names[position], 'id': id, 'revision': change_revision, 'data': row})
+
+    last = page[-1][:3] if page else cursor
+    return {'changes': changes, 'cursor': encode_cursor(list(last)), 'has_more': has_more}
@@ -0,0 +1,181 @@
+# Response compression (COMPRESSION=true, the default): JSON, NDJSON and CSV bodies are sent zstd, brotli or gzip
+# encoded when the request's Accept-Encoding allows it.
+#
+# The encoding is the one with the highest q-value in Accept-Encoding; ties go to the first of
+# COMPRESS_ALGORITHMS (default zstd,br,gzip). zstd and brotli need the zstandard (or Python 3.14's
+# compression.zstd) and brotli packages and are skipped when those aren't installed; gzip is always available.
+# The levels (COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY, COMPRESS_ZSTD_LEVEL) are tuned for speed, since every
+# response is compressed as it is served.
+#
+# Bodies under COMPRESS_MIN_SIZE bytes are sent as they are, since compressing them saves little. Streamed
+# responses (the /export endpoints) are compressed chunk by chunk as they are sent. Compressible responses carry
+# Vary: Accept-Encoding, and when the request accepts one of the encodings their ETag becomes weak (it stands for
+# the content, not for these exact bytes), whether or not the body ended up compressed, so that a 304 can carry
+# the same ETag without knowing the body's size.
+# With INSTRUMENTATION=true, the time spent compressing and the sizes before and after are reported per route
+# (see app/instrumentation.py).
+import zlib
+
+from flask import current_app, request
+
+from app.instrumentation import record_compression, timed
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+
+# Each encoding: config -> function starting a compressor, which returns its (compress, finish) functions
+
+def _gzip(config):
+    level = config['COMPRESS_GZIP_LEVEL']
+
+    def start():
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+        return compressor.compress, compressor.flush
+    return start
+
+
+def _brotli(config):
+    if brotli is None:
+        return None
+    quality = config['COMPRESS_BROTLI_QUALITY']
+
+    def start():
+        compressor = brotli.Compressor(quality=quality)
+        return compressor.process, compressor.finish
+    return start
+
+
+def _zstd(config):
+    level = config['COMPRESS_ZSTD_LEVEL']
+    if zstd is not None:
+        def start():
+            compressor = zstd.ZstdCompressor(level)
+            return compressor.compress, compressor.flush
+    elif zstandard is not None:
+        factory = zstandard.ZstdCompressor(level=level)
+
+        def start():
+            compressor = factory.compressobj()
+            return compressor.compress, compressor.flush
+    else:
+        return None
+    return start
+
+
+ENCODINGS = {
+    'gzip': _gzip,
+    'br': _brotli,
+    'zstd': _zstd,
+}
+
+
+def _parse_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _choose(encoders):
+    # The accepted encoding with the highest q-value, ties broken by the server's order
+    best, best_quality = None, 0
+    for name in encoders:
+        quality = request.accept_encodings.quality(name)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def _compress(start, data):
+    compress, finish = start()
+    return compress(data) + finish()
+
+
+def _compress_stream(start, body):
+    compress, finish = start()
+    try:
+        for chunk in body:
+            out = compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if out:  # an empty chunk would end a chunked response
+                yield out
+        yield finish()
+    finally:
+        # Closing the original body ends the request context of stream_with_context() and the query behind it
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    # after_request hook: runs after set_validators (its ETag is weakened) and before instrumentation's hook (which
+    # then reports the compressed size)
+    settings = current_app.extensions['compression']
+    if response.status_code == 304:
+        # Same validators as the 200 it stands for
+        if _choose(settings['encoders']) is not None:
+            response.vary.add('Accept-Encoding')
+            _weaken_etag(response)
+        return response
+    if (response.status_code < 200 or response.status_code in (204, 206) or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in settings['mimetypes']):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose(settings['encoders'])
+    if encoding is None:
+        return response
+    _weaken_etag(response)
+    start = settings['encoders'][encoding]
+
+    if response.is_streamed:
+        response.response = _compress_stream(start, response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < settings['min_size']:
+            return response
+        with timed('compress'):
+            body = _compress(start, data)
+        response.set_data(body)
+        record_compression(encoding, len(data), len(body))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    config = app.config
+    if not config['COMPRESSION']:
+        return
+
+    encoders = {}
+    for name in _parse_list(config['COMPRESS_ALGORITHMS']):
+        if name not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{name}' in COMPRESS_ALGORITHMS (expected some of "
+                             f"{', '.join(ENCODINGS)})")
+        start = ENCODINGS[name](config)
+        if start is None:
+            app.logger.info('%s compression is not available (its package is not installed)', name)
+        else:
+            encoders[name] = start
+
+    app.extensions['compression'] = {
+        'encoders': encoders,
+        'min_size': config['COMPRESS_MIN_SIZE'],
+        'mimetypes': set(_parse_list(config['COMPRESS_MIMETYPES'])),
+    }
+    app.after_request(compress_response)
@@ -0,0 +1,52 @@
+# Conditional GET: strong ETags and Last-Modified derived from the table_versions counters.
+#
+# A GET handler calls conditional_get(tables) with the tables its response is read from, before querying.
+# That costs one small SELECT on table_versions; when the client's If-None-Match (or, without it,
+# If-Modified-Since) still matches, the request ends right there with a 304 and nothing is queried or serialized.
+import hashlib
+
+from flask import Response, abort, g, request
+
+from app.versions import get_versions
+
+
+def _validators(tables, versions):
+    token = '|'.join(f'{name}:{versions.get(name, (0, None))[0]}' for name in sorted(tables))
+    digest = hashlib.sha1(f'{request.full_path}|{token}'.encode()).hexdigest()
+    modified = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    return digest, max(modified).replace(microsecond=0) if modified else None
+
+
+def conditional_get(tables, versions=None):
+    """Abort with 304 Not Modified if the client's copy of this response is still current.
+
+    ``versions`` are the tables' get_versions(), when the caller has read them already (e.g. asynchronously).
+    """
+    if versions is None:
+        versions = get_versions(tables)
+    etag, last_modified = _validators(tables, versions)
+    g.etag, g.last_modified = etag, last_modified
+    # The read cache keys its entries by the same counters, so a cached body always matches this ETag
+    g.setdefault('table_versions', {}).update({name: versions.get(name, (0, None)) for name in tables})
+
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = last_modified <= request.if_modified_since.replace(tzinfo=None)
+    else:
+        fresh = False
+
+    if fresh:
+        response = Response(status=304)
+        set_validators(response)
+        abort(response)
+
+
+def set_validators(response):
+    # after_request hook: attach the validators computed by conditional_get() to successful responses
+    etag = g.get('etag')
+    if etag and response.status_code in (200, 304):
+        response.set_etag(etag)
+        if g.get('last_modified'):
+            response.last_modified = g.last_modified
+    return response
@@ -4,10 +4,85 @@ import os
 # This defines a configuration class that Flask (and extensions like Flask-SQLAlchemy) can use to configure your app.
 class Config:
     # Reads the environment variable named DATABASE_URL from .env. (It tells SQLAlchemy where the database is and how to connect to it.)
-
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///hospital.db'
+    # A relative SQLite path like the default lives in the instance/ folder.
+    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///app.db")
 
     # Disables a feature that tracks changes to objects and emits signals. (Setting it to False saves memory and avoids warnings )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # Reads the SECRET_KEY from the .env file. (If it’s not set, it uses "fallback-secret" as a default backup (this is helpful for development).)
     SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret")
+
+    # Page sizes for the collection endpoints (?limit= is capped at MAX_PAGE_SIZE so one request can't pull a whole table)
+    DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 50))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 200))
+
+    # Most ids one ?ids= batch fetch may ask for (a single SELECT ... WHERE id IN (...))
+    MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", 200))
+
+    # Raise on any relationship that an endpoint did not declare in query_for() instead of lazy loading it (for tests)
+    STRICT_LOADING = os.getenv("STRICT_LOADING", "false").lower() == "true"
+
+    # Read cache for reference data ('memory' or 'null' to disable); entries expire after CACHE_TTL seconds
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+    CACHE_TTL = int(os.getenv("CACHE_TTL", 60))
+
+    # Largest array accepted by the /bulk endpoints
+    BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 1000))
+
+    # Length of an appointment booked without an end_time, in minutes
+    APPOINTMENT_MINUTES = int(os.getenv("APPOINTMENT_MINUTES", 30))
+
+    # Hours and ISO weekdays (1 = Monday) doctors can be booked in, for GET /doctors/availability
+    WORKING_HOURS_START = os.getenv("WORKING_HOURS_START", "09:00")
+    WORKING_HOURS_END = os.getenv("WORKING_HOURS_END", "17:00")
+    WORKING_DAYS = os.getenv("WORKING_DAYS", "1,2,3,4,5")
+    # Longest date range one availability search may cover, and doctors whose appointments are read per query
+    AVAILABILITY_MAX_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", 31))
+    AVAILABILITY_DOCTOR_BATCH = int(os.getenv("AVAILABILITY_DOCTOR_BATCH", 200))
+
+    # Seconds each worker keeps the vocabulary of patient names used by /patients/search before re-reading it
+    NAME_VOCABULARY_TTL = int(os.getenv("NAME_VOCABULARY_TTL", 300))
+
+    # Rows fetched (and streamed) per batch by the /export endpoints
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+    # Rows written per transaction (and per checkpoint) by `flask import` and POST /import/<kind>
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))
+
+    # JSON encoder behind jsonify(): 'orjson' (falls back to the json module when orjson isn't installed) or 'json'
+    JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson")
+
+    # Compress responses for clients that accept it (see app/compression.py): encodings in order of preference,
+    # bodies smaller than COMPRESS_MIN_SIZE bytes are sent as they are, and only these content types are compressed
+    COMPRESSION = os.getenv("COMPRESSION", "true").lower() == "true"
+    COMPRESS_ALGORITHMS = os.getenv("COMPRESS_ALGORITHMS", "zstd,br,gzip")
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+    COMPRESS_MIMETYPES = os.getenv("COMPRESS_MIMETYPES", "application/json,application/x-ndjson,text/csv,text/plain")
+    # Levels favour speed, as every response is compressed on the fly (gzip 1-9, brotli 0-11, zstd 1-22)
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 4))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+    COMPRESS_ZSTD_LEVEL = int(os.getenv("COMPRESS_ZSTD_LEVEL", 3))
+
+    # Per-request SQL/serialization timings, Server-Timing headers and GET /_metrics (see app/instrumentation.py)
+    INSTRUMENTATION = os.getenv("INSTRUMENTATION", "false").lower() == "true"
+    # Requests slower than this are logged with their slowest statements (SLOW_QUERY_COUNT of them)
+    PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", 500))
+    SLOW_QUERY_COUNT = int(os.getenv("SLOW_QUERY_COUNT", 5))
+    # Share of requests run under cProfile (0 disables); slow profiled requests are dumped to PROFILE_DIR
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_DIR = os.getenv("PROFILE_DIR")  # default: <instance folder>/profiles
+
+    # SQLite settings applied to every new connection (see app/database.py). WAL lets readers run alongside the
+    # writer; NORMAL only syncs at checkpoints in WAL mode; a writer waits up to SQLITE_BUSY_TIMEOUT ms for the lock.
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -65536))   # pages, or KiB when negative (64 MiB)
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))  # bytes (256 MiB, 0 disables)
+
+    # Connection pool of each worker process
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))  # seconds, -1 never (for server databases)
@@ -0,0 +1,135 @@
+# Engine configuration: connection pool options and the per-connection SQLite settings.
+#
+# The database URL comes from DATABASE_URL (app/config.py). For SQLite every new connection gets
+#
+#   PRAGMA journal_mode = WAL        readers no longer block the writer, nor the writer the readers
+#   PRAGMA synchronous = NORMAL      in WAL mode: fsync at checkpoints instead of on every commit, still crash-safe
+#   PRAGMA busy_timeout = 5000       a writer waits for the lock instead of failing with "database is locked"
+#   PRAGMA cache_size / mmap_size    more of the database kept in memory
+#
+# The ASGI mode (app/asgi.py) reads through a second, async engine on the same database (aiosqlite for SQLite,
+# asyncpg for PostgreSQL) with the same pool options and PRAGMAs.
+#
+# Each worker process has its own pool. A pool that was in use when a worker was forked (gunicorn --preload, or
+# the tables created at startup) is dropped in the child without closing the parent's connections, so the
+# processes never share a SQLite file handle.
+import os
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+
+# Async driver of each backend, for async_engine()
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite', 'postgresql': 'asyncpg'}
+
+# insert() of the backends that have INSERT ... ON CONFLICT DO UPDATE, for upsert_insert()
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+_engines = weakref.WeakSet()
+
+
+def _is_sqlite(url):
+    return url.get_backend_name() == 'sqlite'
+
+
+def _in_memory(url):
+    return url.database in (None, '', ':memory:') or 'mode=memory' in str(url)
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``config``, keeping any option that is already set there."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    if _is_sqlite(url):
+        connect_args = dict(options.get('connect_args') or {})
+        # sqlite3's own wait for a locked database, in seconds (it defaults to 5)
+        connect_args.setdefault('timeout', config['SQLITE_BUSY_TIMEOUT'] / 1000)
+        options['connect_args'] = connect_args
+        if _in_memory(url):
+            # One shared connection (Flask-SQLAlchemy sets up a StaticPool), nothing to size
+            return options
+
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+    return options
+
+
+def sqlite_pragmas(config):
+    """The PRAGMA statements run on every new SQLite connection, in order."""
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE must be one of: {', '.join(sorted(JOURNAL_MODES))}")
+    if synchronous not in SYNCHRONOUS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of: {', '.join(sorted(SYNCHRONOUS))}")
+    return [
+        f'PRAGMA busy_timeout = {int(config["SQLITE_BUSY_TIMEOUT"])}',
+        f'PRAGMA journal_mode = {journal_mode}',
+        f'PRAGMA synchronous = {synchronous}',
+        f'PRAGMA cache_size = {int(config["SQLITE_CACHE_SIZE"])}',
+        f'PRAGMA mmap_size = {int(config["SQLITE_MMAP_SIZE"])}',
+    ]
+
+
+def upsert_insert(connection):
+    """The insert() construct with on_conflict_do_update() for ``connection``'s backend, or None if it has none."""
+    return _UPSERT_INSERTS.get(connection.dialect.name)
+
+
+def _listen(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _dispose_after_fork():
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
+
+
+def init_database(app, db):
+    """Set the engine options on ``app`` and initialise ``db`` with them."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    pragmas = sqlite_pragmas(app.config) if _is_sqlite(make_url(app.config['SQLALCHEMY_DATABASE_URI'])) else []
+
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+        if pragmas:
+            _listen(engine, pragmas)
+        _engines.add(engine)
+
+
+def async_engine(app, engine):
+    """An AsyncEngine on ``engine``'s database, set up like it (pool options, SQLite PRAGMAs)."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = engine.url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend} databases (supported: {', '.join(ASYNC_DRIVERS)})")
+    if _is_sqlite(url) and _in_memory(url):
+        raise ValueError("An in-memory SQLite database can't be shared with an async engine; use a database file")
+
+    created = create_async_engine(url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}'),
+                                  **engine_options(app.config))
+    if _is_sqlite(url):
+        _listen(created.sync_engine, sqlite_pragmas(app.config))
+    _engines.add(created.sync_engine)
+    return created
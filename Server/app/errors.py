@@ -0,0 +1,6 @@
+from flask import abort, jsonify, make_response
+
+
+def bad_request(message):
+    # abort() with a ready-made response works for both blueprints and flask_restful resources
+    abort(make_response(jsonify({'error': message}), 400))
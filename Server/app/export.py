@@ -0,0 +1,116 @@
+# Streaming exports (/records/export, /appointments/export) as NDJSON or CSV.
+#
+# Rows are read as plain column tuples with yield_per, so the driver hands them over in batches of
+# EXPORT_BATCH_SIZE instead of building every ORM object up front, and each batch is encoded and sent
+# before the next one is fetched. Memory stays flat however many rows the table has.
+#
+# ?format=ndjson (default) | csv
+# ?from=YYYY-MM-DD&to=YYYY-MM-DD   inclusive date range
+# ?doctor_id=&patient_id=          only rows for that doctor / patient
+import csv
+import io
+import json
+from datetime import date, time
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy import select
+
+from app import db
+from app.errors import bad_request
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def date_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        bad_request(f"Invalid {name}: expected YYYY-MM-DD")
+
+
+def int_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        bad_request(f"Invalid {name}: expected an integer")
+
+
+def filter_query(query, model):
+    """``query`` narrowed by the request's ?from=&to=&doctor_id=&patient_id= filters on ``model``."""
+    start, end = date_arg('from'), date_arg('to')
+    if start:
+        query = query.where(model.date >= start)
+    if end:
+        query = query.where(model.date <= end)
+
+    for key in ('doctor_id', 'patient_id'):
+        value = int_arg(key)
+        if value is not None:
+            query = query.where(getattr(model, key) == value)
+    return query
+
+
+def export_query(model, columns):
+    """SELECT ``columns`` of ``model`` narrowed by the request's filters, in (date, id) order."""
+    query = select(*[getattr(model, key) for key in columns])
+    return filter_query(query, model).order_by(model.date, model.id)
+
+
+def _json_default(value):
+    # DATE and TIME columns come back as datetime.date / datetime.time
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson(columns, batches):
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row)), separators=(',', ':'), default=_json_default) + '\n'
+                      for row in rows)
+
+
+def _csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(model, columns, name):
+    """A streamed response with every ``model`` row matching the request's filters."""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in FORMATS:
+        bad_request(f"Unknown format '{export_format}', expected one of: {', '.join(FORMATS)}")
+
+    query = export_query(model, columns)
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+
+    def batches():
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+
+    encode = _ndjson if export_format == 'ndjson' else _csv
+    # stream_with_context keeps the request (and its session) alive while the body is being sent
+    body = stream_with_context(encode(list(columns), batches()))
+    return Response(body, mimetype=FORMATS[export_format], headers={
+        'Content-Disposition': f'attachment; filename={name}.{export_format}',
+    })
@@ -0,0 +1,138 @@
+# Sparse fieldsets and relationship expansion: ?fields=id,name&expand=department,appointments.patient
+#
+# fields  columns to return; a dotted name (appointments.date) narrows an expanded relationship
+# expand  relationships to include (dotted paths for nested ones); nothing else is loaded or encoded
+#
+# Without either parameter an endpoint keeps its usual response. With them, the selection is turned into an
+# `only` view for the compiled serializers and pushed down to SQL with load_only(), so unused columns and
+# relationships are never fetched.
+from flask import request
+from sqlalchemy import inspect
+
+from app.errors import bad_request
+from app.serializers import serialize, serialize_many
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+
+def _column_keys(cls):
+    # Columns across the whole hierarchy, so ?fields=ward_number works on /patients/
+    keys = {}
+    for mapper in inspect(cls).self_and_descendants:
+        keys.update(dict.fromkeys(attr.key for attr in mapper.column_attrs))
+    return list(keys)
+
+
+def _target(cls, path):
+    for key in path.split('.'):
+        relationship = inspect(cls).relationships.get(key)
+        if relationship is None:
+            bad_request(f"Cannot expand '{path}'")
+        cls = relationship.mapper.class_
+    return cls
+
+
+def _view_columns(model, view):
+    # Named views are `only` schemas too, so they get the same load_only() push-down
+    if not isinstance(view, str):
+        return None
+
+    columns = {}
+    for rule in model.serialize_views[view]:
+        path, _, key = rule.rpartition('.')
+        owner = _target(model, path) if path else model
+        if key in _column_keys(owner):
+            columns.setdefault(path, []).append(key)
+    return {path: tuple(keys) for path, keys in columns.items()}
+
+
+class Fieldset:
+    """What one request wants back from `model`: the serializer view plus the query that loads just that."""
+
+    def __init__(self, model, view=None, loads=(), columns=None):
+        self.model = model
+        self.view = view
+        self.loads = loads
+        self.columns = columns
+
+    def query(self, *key_columns):
+        # Columns used for ordering/cursors have to be loaded even when they are not returned
+        columns = self.columns
+        if columns is not None and key_columns:
+            columns = dict(columns)
+            columns[''] = tuple(dict.fromkeys(columns[''] + tuple(column.key for column in key_columns)))
+        return self.model.query_for(*self.loads, columns=columns)
+
+    def tables(self):
+        # Every table the query may read, for tagging cached responses
+        classes = {self.model}
+        for path in self.loads:
+            parts = path.split('.')
+            classes.update(_target(self.model, '.'.join(parts[:i])) for i in range(1, len(parts) + 1))
+
+        names = set()
+        for cls in classes:
+            for mapper in inspect(cls).self_and_descendants:
+                names.update(table.name for table in mapper.tables)
+        return sorted(names)
+
+    def serialize(self, obj):
+        return serialize(obj, self.view)
+
+    def serialize_many(self, objs):
+        return serialize_many(objs, self.view)
+
+
+def requested_fieldset(model, view=None, loads=()):
+    """Fieldset for the current request's ?fields=&expand=, or the endpoint's usual ``view``/``loads``."""
+    fields = _split(request.args.get('fields'))
+    expand = _split(request.args.get('expand'))
+    if not fields and not expand:
+        return Fieldset(model, view, loads, _view_columns(model, view))
+
+    # Sort every field under the path it belongs to; relationships named in fields count as expanded
+    selected = {'': []}
+    for path in expand:
+        _target(model, path)
+        parts = path.split('.')
+        for i in range(1, len(parts) + 1):
+            selected.setdefault('.'.join(parts[:i]), [])
+
+    for field in fields:
+        path, _, key = field.rpartition('.')
+        owner = _target(model, path) if path else model
+        if key in inspect(owner).relationships:
+            path = f'{path}.{key}' if path else key
+            key = None
+        elif key not in _column_keys(owner):
+            bad_request(f"Unknown field '{field}'")
+
+        parts = path.split('.') if path else []
+        for i in range(1, len(parts) + 1):
+            selected.setdefault('.'.join(parts[:i]), [])
+        if key:
+            selected[path].append(key)
+
+    columns = {}
+    only = []
+    for path, keys in selected.items():
+        owner = _target(model, path) if path else model
+        keys = tuple(dict.fromkeys(keys)) or tuple(_column_keys(owner))
+        columns[path] = keys
+        only.extend(f'{path}.{key}' if path else key for key in keys)
+
+    loads = [path for path in selected if path]
+    return Fieldset(model, tuple(sorted(only)), loads, columns)
+
+
+def view_fieldset(model, view, loads=()):
+    """Fieldset of one of ``model``'s serialize_views, whatever the request's ?fields=&expand= say."""
+    return Fieldset(model, view, loads, _view_columns(model, view))
+
+
+def columns_fieldset(model):
+    """Fieldset of every column of ``model`` (subtype columns included) and no relationships."""
+    keys = tuple(_column_keys(model))
+    return Fieldset(model, keys, (), {'': keys})
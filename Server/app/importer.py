@@ -0,0 +1,278 @@
+# Streaming bulk import of patients and medical records from CSV or NDJSON, for `flask import` and POST /import/<kind>.
+#
+# The input is read one row at a time and written in chunks of IMPORT_CHUNK_SIZE rows: each chunk is validated,
+# its patient_id/doctor_id references are checked with one IN query per table, and the valid rows go in with
+# batched multi-row INSERTs (for inpatients/outpatients, one into patients and one into the subtype table, see
+# app.bulk.insert_rows). Rows may carry an explicit `id`, so legacy ids survive and records can point at them.
+#
+# Every chunk commits together with the job's row in import_checkpoints. Running the same job again skips the
+# rows that are already in, so an interrupted import picks up after its last committed chunk.
+import csv
+import itertools
+import json
+import time
+from datetime import datetime, timezone
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.bulk import existing_ids, insert_rows
+from app.models import PATIENT_TYPES, Doctor, ImportCheckpoint, Medical_Record, Patient, parse_date
+
+FORMATS = ('csv', 'ndjson')
+
+# Fields converted from CSV strings; every other value is kept as read
+_INT_FIELDS = {'id', 'age', 'ward_number', 'patient_id', 'doctor_id'}
+_DATE_FIELDS = {'date', 'admission_date', 'last_visit_date'}
+
+# How many rejected rows are reported back individually
+_MAX_ERRORS = 50
+
+
+class ImportFailed(Exception):
+    pass
+
+
+def read_rows(stream, fmt):
+    """Rows of a text stream, one dict at a time (None for an NDJSON line that isn't valid JSON)."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _int(value):
+    # A CSV string or a JSON number, as long as it is whole: 3 and 3.0 are fine, 3.9 and true are not
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError
+    return int(value)
+
+
+def _clean(row, fields):
+    # The row narrowed to `fields` (plus an optional id), with ints and dates converted;
+    # raises ValueError with a message
+    if not isinstance(row, dict):
+        raise ValueError('Row is not a JSON object')
+
+    missing = [field for field in fields if row.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+
+    values = {}
+    for field in (*fields, 'id'):
+        value = row.get(field)
+        if value in (None, ''):
+            continue
+        if field in _INT_FIELDS:
+            try:
+                value = _int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid {field}: {value!r}")
+        elif field in _DATE_FIELDS:
+            value = parse_date(value)
+        values[field] = value
+    return values
+
+
+def _reject_existing_ids(model, cleaned, errors):
+    # Explicit ids must not collide with rows already in the table (which includes the job's earlier chunks) nor
+    # repeat one of an earlier row of the chunk; either would fail the whole chunk's INSERT
+    taken = existing_ids(model, [values['id'] for _, values in cleaned if 'id' in values])
+    seen = set()
+    kept = []
+    for number, values in cleaned:
+        id = values.get('id')
+        if id in taken:
+            errors.append((number, f"id {id} already exists"))
+        elif id in seen:
+            errors.append((number, f"id {id} repeats an earlier row"))
+        else:
+            if id is not None:
+                seen.add(id)
+            kept.append((number, values))
+    return kept
+
+
+def _prepare_patients(chunk):
+    errors = []
+    cleaned = []
+    for number, row in chunk:
+        try:
+            patient_type = row.get('type') if isinstance(row, dict) else None
+            if patient_type not in PATIENT_TYPES:
+                raise ValueError(f"Invalid patient type: {patient_type!r}")
+            values = _clean(row, PATIENT_TYPES[patient_type][1])
+            values['type'] = patient_type
+            cleaned.append((number, values))
+        except ValueError as e:
+            errors.append((number, str(e)))
+
+    groups = {}
+    for _, values in _reject_existing_ids(Patient, cleaned, errors):
+        groups.setdefault(PATIENT_TYPES[values['type']][0], []).append(values)
+    return groups, errors
+
+
+RECORD_FIELDS = ['diagnosis', 'treatment', 'date', 'patient_id', 'doctor_id']
+
+
+def _prepare_records(chunk):
+    errors = []
+    cleaned = []
+    for number, row in chunk:
+        try:
+            cleaned.append((number, _clean(row, RECORD_FIELDS)))
+        except ValueError as e:
+            errors.append((number, str(e)))
+
+    patients = existing_ids(Patient, [values['patient_id'] for _, values in cleaned])
+    doctors = existing_ids(Doctor, [values['doctor_id'] for _, values in cleaned])
+    valid = []
+    for number, values in cleaned:
+        if values['patient_id'] not in patients:
+            errors.append((number, f"Invalid patient_id: {values['patient_id']}"))
+        elif values['doctor_id'] not in doctors:
+            errors.append((number, f"Invalid doctor_id: {values['doctor_id']}"))
+        else:
+            valid.append((number, values))
+
+    rows = [values for _, values in _reject_existing_ids(Medical_Record, valid, errors)]
+    return ({Medical_Record: rows} if rows else {}), errors
+
+
+KINDS = {
+    'patients': _prepare_patients,
+    'records': _prepare_records,
+}
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def run_import(kind, rows, job, chunk_size=None, restart=False, progress=None):
+    """Import ``rows`` (an iterable of dicts) as ``kind``, resuming ``job`` if it was interrupted.
+
+    Returns a summary with counts, the first rejected rows and the throughput of this run.
+    ``progress`` is called with the summary after every committed chunk.
+    """
+    if kind not in KINDS:
+        raise ImportFailed(f"Unknown import kind '{kind}', expected one of: {', '.join(KINDS)}")
+    prepare = KINDS[kind]
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+
+    checkpoint = db.session.get(ImportCheckpoint, job)
+    if checkpoint is None or restart:
+        checkpoint = db.session.merge(ImportCheckpoint(job=job, kind=kind, position=0, inserted=0, rejected=0,
+                                                       finished=False, updated_at=_now()))
+    elif checkpoint.kind != kind:
+        raise ImportFailed(f"Job '{job}' is a {checkpoint.kind} import")
+
+    summary = {
+        'job': job,
+        'kind': kind,
+        'resumed_from': checkpoint.position,
+        'processed': 0,
+        'inserted': 0,
+        'rejected': 0,
+        'errors': [],
+    }
+    started = time.perf_counter()
+
+    def report():
+        elapsed = time.perf_counter() - started
+        summary.update(
+            position=checkpoint.position,
+            total_inserted=checkpoint.inserted,
+            total_rejected=checkpoint.rejected,
+            finished=checkpoint.finished,
+            seconds=round(elapsed, 3),
+            rows_per_second=round(summary['processed'] / elapsed) if elapsed else None,
+        )
+        return summary
+
+    # Rows are numbered from 1 in input order; those before the checkpoint were committed by an earlier run
+    numbered = itertools.islice(enumerate(rows, 1), checkpoint.position, None)
+    while True:
+        try:
+            chunk = list(itertools.islice(numbered, chunk_size))
+        except UnicodeDecodeError:
+            # The stream is decoded a block at a time, so the bad bytes can be some rows past the checkpoint.
+            # The rows up to the checkpoint are committed; the job resumes from there with a re-encoded file.
+            committed = f"; rows 1-{checkpoint.position} were imported" if checkpoint.position else ''
+            raise ImportFailed(f"The file is not valid UTF-8{committed}")
+        if not chunk:
+            break
+
+        groups, errors = prepare(chunk)
+        inserted = 0
+        try:
+            for model, values in groups.items():
+                insert_rows(model, values)
+                inserted += len(values)
+        except IntegrityError as e:
+            # A constraint the row checks above don't cover; nothing of the chunk is kept, and the job resumes
+            # from its first row once the input is fixed
+            db.session.rollback()
+            raise ImportFailed(f"Rows {chunk[0][0]}-{chunk[-1][0]} could not be inserted: {e.orig}")
+
+        checkpoint.position = chunk[-1][0]
+        checkpoint.inserted += inserted
+        checkpoint.rejected += len(errors)
+        checkpoint.updated_at = _now()
+        db.session.commit()
+
+        summary['processed'] += len(chunk)
+        summary['inserted'] += inserted
+        summary['rejected'] += len(errors)
+        room = _MAX_ERRORS - len(summary['errors'])
+        summary['errors'].extend({'row': number, 'error': message} for number, message in sorted(errors)[:room])
+        if progress:
+            progress(report())
+
+    checkpoint.finished = True
+    checkpoint.updated_at = _now()
+    db.session.commit()
+    return report()
+
+
+# === CLI ===
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(list(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Input format (default: from the file extension).')
+@click.option('--job', help='Checkpoint name (default: kind and file path). Re-run the same job to resume it.')
+@click.option('--chunk-size', type=int, help='Rows per transaction (default: IMPORT_CHUNK_SIZE).')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and start from the first row.')
+@with_appcontext
+def import_command(kind, path, fmt, job, chunk_size, restart):
+    """Import patients or medical records from a CSV or NDJSON file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    job = job or f'{kind}:{click.format_filename(path)}'
+
+    def progress(summary):
+        click.echo(f"  row {summary['position']}: {summary['inserted']} inserted, {summary['rejected']} rejected, "
+                   f"{summary['rows_per_second']} rows/s")
+
+    with open(path, newline='', encoding='utf-8') as stream:
+        try:
+            summary = run_import(kind, read_rows(stream, fmt), job, chunk_size, restart, progress)
+        except ImportFailed as e:
+            raise click.ClickException(str(e))
+
+    for error in summary['errors']:
+        click.echo(f"  row {error['row']}: {error['error']}", err=True)
+    if summary['resumed_from']:
+        click.echo(f"Resumed job '{job}' after row {summary['resumed_from']}.")
+    click.echo(f"Imported {summary['inserted']} {kind} ({summary['rejected']} rejected) in {summary['seconds']}s, "
+               f"{summary['rows_per_second']} rows/s.")
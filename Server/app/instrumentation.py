@@ -0,0 +1,350 @@
+# Opt-in per-request instrumentation (INSTRUMENTATION=true).
+#
+# For every request it records the number of SQL statements and the time spent in them (engine events), the
+# slowest statements, the time spent in the serializers, in JSON encoding and in compression (app/compression.py),
+# and the response size before and after compression. Each response gets a Server-Timing header (visible in the
+# browser's network panel):
+#
+#   Server-Timing: sql;dur=12.4;desc="6 queries", serialize;dur=3.1, encode;dur=0.8,
+#                  compress;dur=0.6;desc="gzip 48210 -> 6112 bytes", total;dur=18.9
+#
+# Totals per route are exported in Prometheus text format at GET /_metrics, together with the read cache
+# counters; GET /_metrics/slow lists the latest requests slower than PROFILE_THRESHOLD_MS with their slowest
+# statements. The numbers are per process, so with several workers each one reports its own.
+#
+# A PROFILE_SAMPLE_RATE share of requests also runs under cProfile; when one of those takes longer than
+# PROFILE_THRESHOLD_MS its profile is written to PROFILE_DIR (open with `python -m pstats` or snakeviz) and the
+# hottest functions are logged.
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+from app import db
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_active = False
+
+
+class RequestTimings:
+    """What one request spent its time on."""
+
+    __slots__ = ('started', 'queries', 'sql', 'keep', 'slowest', 'phases', 'compression', 'profile',
+                 'profile_running')
+
+    def __init__(self, keep):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.keep = keep
+        self.slowest = []                 # min-heap of (seconds, statement), at most `keep` long
+        self.phases = defaultdict(float)  # 'serialize' / 'encode' / 'compress' -> seconds
+        self.compression = None           # (encoding, bytes before, bytes after) of a compressed response
+        self.profile = None
+        self.profile_running = False
+
+    def add_statement(self, statement, seconds):
+        self.queries += 1
+        self.sql += seconds
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, (seconds, statement))
+        elif self.keep:
+            heapq.heappushpop(self.slowest, (seconds, statement))
+
+    def slowest_statements(self):
+        return sorted(self.slowest, reverse=True)
+
+
+def _timings():
+    if not _active or not has_request_context():
+        return None
+    return g.get('_timings')
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the current request's ``phase`` (no-op when instrumentation is off)."""
+    timings = _timings()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+
+
+def record_compression(encoding, before, after):
+    """Note that the current response was compressed from ``before`` to ``after`` bytes (no-op when off)."""
+    timings = _timings()
+    if timings is not None:
+        timings.compression = (encoding, before, after)
+
+
+class Metrics:
+    """Per-route counters and latency histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)                      # (method, route, status) -> count
+        self.histograms = defaultdict(lambda: [0] * (len(BUCKETS) + 1))  # (method, route) -> bucket counts
+        self.sums = defaultdict(lambda: defaultdict(float))   # metric -> (method, route) -> total
+
+    def observe(self, method, route, status, seconds, timings, size):
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] += 1
+            buckets = self.histograms[key]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+                    break
+            else:
+                buckets[-1] += 1
+            sums = self.sums
+            sums['http_request_duration_seconds_sum'][key] += seconds
+            sums['http_request_sql_queries_total'][key] += timings.queries
+            sums['http_request_sql_seconds_total'][key] += timings.sql
+            sums['http_request_serialize_seconds_total'][key] += timings.phases.get('serialize', 0.0)
+            sums['http_request_encode_seconds_total'][key] += timings.phases.get('encode', 0.0)
+            if size is not None:
+                sums['http_response_size_bytes_total'][key] += size
+            if timings.compression is not None:
+                sums['http_request_compress_seconds_total'][key] += timings.phases.get('compress', 0.0)
+                sums['http_response_compressed_total'][key] += 1
+                sums['http_response_compress_input_bytes_total'][key] += timings.compression[1]
+                sums['http_response_compress_output_bytes_total'][key] += timings.compression[2]
+
+    def render(self, extra=()):
+        lines = []
+        with self._lock:
+            lines += ['# HELP http_requests_total Requests handled, by route and status.',
+                      '# TYPE http_requests_total counter']
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            lines += ['# HELP http_request_duration_seconds Time from the start of the request to the response.',
+                      '# TYPE http_request_duration_seconds histogram']
+            durations = self.sums['http_request_duration_seconds_sum']
+            for (method, route), buckets in sorted(self.histograms.items()):
+                labels = f'method="{method}",route="{route}"'
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, '+Inf'), buckets):
+                    cumulative += count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {durations[(method, route)]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+            for name, help_text in (
+                ('http_request_sql_queries_total', 'SQL statements executed.'),
+                ('http_request_sql_seconds_total', 'Time spent executing SQL statements.'),
+                ('http_request_serialize_seconds_total', 'Time spent serializing models.'),
+                ('http_request_encode_seconds_total', 'Time spent encoding JSON.'),
+                ('http_response_size_bytes_total', 'Response body bytes (streamed responses excluded).'),
+                ('http_request_compress_seconds_total', 'Time spent compressing response bodies.'),
+                ('http_response_compressed_total', 'Responses sent compressed (streamed responses excluded).'),
+                ('http_response_compress_input_bytes_total', 'Body bytes of the compressed responses, before.'),
+                ('http_response_compress_output_bytes_total', 'Body bytes of the compressed responses, after.'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (method, route), value in sorted(self.sums[name].items()):
+                    lines.append(f'{name}{{method="{method}",route="{route}"}} {value:g}')
+
+        lines.extend(extra)
+        return '\n'.join(lines) + '\n'
+
+
+def _cache_metrics():
+    cache = current_app.extensions.get('cache')
+    if cache is None:
+        return []
+    lines = []
+    for key, value in cache.stats().items():
+        if isinstance(value, (int, float)) and key not in ('max_entries', 'ttl'):
+            kind = 'gauge' if key == 'entries' else 'counter'
+            name = f'cache_{key}' if kind == 'gauge' else f'cache_{key}_total'
+            lines += [f'# TYPE {name} {kind}', f'{name} {value}']
+    return lines
+
+
+# === Request hooks ===
+
+def _route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def _before_request():
+    config = current_app.config
+    timings = g._timings = RequestTimings(config['SLOW_QUERY_COUNT'])
+    rate = config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate and _profiler_lock.acquire(blocking=False):
+        # Only one profiler can be active at a time
+        timings.profile = cProfile.Profile()
+        timings.profile.enable()
+        timings.profile_running = True
+
+
+def _stop_profile(timings):
+    if timings.profile is not None and timings.profile_running:
+        timings.profile.disable()
+        timings.profile_running = False
+        _profiler_lock.release()
+
+
+def _after_request(response):
+    timings = g.get('_timings')
+    if timings is None:
+        return response
+    total = time.perf_counter() - timings.started
+    _stop_profile(timings)
+
+    phases = [f'sql;dur={timings.sql * 1e3:.1f};desc="{timings.queries} queries"']
+    for phase, seconds in sorted(timings.phases.items()):
+        if phase == 'compress' and timings.compression is not None:
+            encoding, before, after = timings.compression
+            phases.append(f'compress;dur={seconds * 1e3:.1f};desc="{encoding} {before} -> {after} bytes"')
+        else:
+            phases.append(f'{phase};dur={seconds * 1e3:.1f}')
+    phases.append(f'total;dur={total * 1e3:.1f}')
+    response.headers['Server-Timing'] = ', '.join(phases)
+
+    size = None if response.is_streamed else response.calculate_content_length()
+    route = _route()
+    current_app.extensions['metrics'].observe(request.method, route, response.status_code, total, timings, size)
+
+    if total * 1e3 >= current_app.config['PROFILE_THRESHOLD_MS']:
+        _record_slow(route, total, timings)
+    return response
+
+
+def _teardown_request(exc):
+    # Runs after the response is built (or the request failed); a streamed body's SQL is no longer counted
+    timings = g.pop('_timings', None)
+    if timings is not None:
+        _stop_profile(timings)
+
+
+# === Slow requests ===
+
+_profiler_lock = threading.Lock()
+_slow_requests = deque(maxlen=50)
+
+
+def _record_slow(route, total, timings):
+    entry = {
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'route': route,
+        'total_ms': round(total * 1e3, 1),
+        'queries': timings.queries,
+        'sql_ms': round(timings.sql * 1e3, 1),
+        'phases_ms': {phase: round(seconds * 1e3, 1) for phase, seconds in timings.phases.items()},
+        'slowest_statements': [{'ms': round(seconds * 1e3, 2), 'statement': statement}
+                               for seconds, statement in timings.slowest_statements()],
+    }
+    if timings.profile is not None:
+        entry['profile'] = _dump_profile(route, timings.profile)
+    _slow_requests.append(entry)
+    current_app.logger.warning('Slow request %s %s: %.0f ms, %d queries (%.0f ms SQL)', request.method,
+                               entry['path'], entry['total_ms'], timings.queries, entry['sql_ms'])
+
+
+def _dump_profile(route, profile):
+    directory = current_app.config['PROFILE_DIR'] or os.path.join(current_app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    slug = route.strip('/').replace('/', '_').replace('<', '').replace('>', '').replace(':', '-') or 'root'
+    path = os.path.join(directory, f'{datetime.now():%Y%m%d-%H%M%S-%f}-{request.method}-{slug}.prof')
+    profile.dump_stats(path)
+
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(15)
+    current_app.logger.warning('Profile of %s %s written to %s\n%s', request.method, request.path, path,
+                               out.getvalue())
+    return path
+
+
+# === SQL ===
+
+def _listen(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['_query_started'].pop()
+        timings = _timings()
+        if timings is not None:
+            timings.add_statement(' '.join(statement.split())[:500], time.perf_counter() - started)
+
+    @event.listens_for(engine, 'handle_error')
+    def _error(context):
+        # after_cursor_execute doesn't run for a failed statement
+        started = context.connection.info.get('_query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def instrument_engine(engine):
+    """Time ``engine``'s statements as well (e.g. the async engine of app/asgi.py); no-op when instrumentation is off."""
+    if _active:
+        _listen(engine)
+
+
+def _time_json(app):
+    # Wraps whichever JSON provider the app uses, so jsonify()/make_response() encoding shows up as 'encode'
+    # (response(), since the orjson provider of app/json_provider.py encodes there without going through dumps())
+    provider = app.json
+    response = provider.response
+
+    def timed_response(*args, **kwargs):
+        with timed('encode'):
+            return response(*args, **kwargs)
+
+    provider.response = timed_response
+
+
+# === Endpoints ===
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+
+@metrics_bp.route('/_metrics', methods=['GET'])
+def metrics():
+    body = current_app.extensions['metrics'].render(_cache_metrics())
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+@metrics_bp.route('/_metrics/slow', methods=['GET'])
+def slow_requests():
+    return jsonify(list(reversed(_slow_requests))), 200
+
+
+def init_instrumentation(app):
+    global _active
+    if not app.config['INSTRUMENTATION']:
+        return
+
+    _active = True
+    app.extensions['metrics'] = Metrics()
+    with app.app_context():
+        _listen(db.engine)
+    _time_json(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.register_blueprint(metrics_bp)
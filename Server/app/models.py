@@ -1,9 +1,180 @@
 # Have the models here (PATIENTS, DOCTORS, DEPARTMENTS, APPOINTMENTS, MEDICAL_RECORDS)
+from datetime import date, datetime, time
+from functools import lru_cache
+
+from flask import current_app
 from app import db
 from sqlalchemy_serializer import SerializerMixin
-from sqlalchemy.orm import validates
+from sqlalchemy.orm import validates, selectinload, joinedload, raiseload, load_only, with_polymorphic
+
+
+# === Query layer ===
+# Each endpoint declares the relationship paths it is going to serialize ('doctor', 'patient.medical_records', ...)
+# and gets a query that loads them up front: collections with one SELECT ... IN per level (selectinload),
+# many-to-one references in the same statement (joinedload). A list endpoint therefore runs a constant
+# number of queries no matter how many rows it returns.
+#
+# `columns` optionally narrows the columns fetched per path ('' is the queried model itself), for sparse fieldsets.
+#
+# Patients are polymorphic: wherever a path needs subtype columns (anything beyond the base columns), the patients
+# are queried as a with_polymorphic() of Patient, which LEFT OUTER JOINs inpatients and outpatient in the same
+# SELECT, rather than loading the base rows first and the subtype rows in further queries.
+#
+# With STRICT_LOADING enabled (meant for tests), touching any relationship that was not declared raises
+# instead of quietly firing a lazy SELECT per row.
+
+def parse_date(value):
+    """A date from an ISO 8601 string ('2025-07-01', or a timestamp whose time is dropped); raises ValueError."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            try:
+                return datetime.fromisoformat(value).date()
+            except ValueError:
+                pass
+    raise ValueError(f"Invalid date: {value!r}, expected YYYY-MM-DD")
+
+
+def parse_time(value):
+    """A time of day from an ISO 8601 string ('09:30'); None stays None; raises ValueError."""
+    if value is None or isinstance(value, time):
+        return value
+    if isinstance(value, str):
+        try:
+            return time.fromisoformat(value)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid time: {value!r}, expected HH:MM")
+
+
+def parse_int(value):
+    """An integer from a JSON number or a string of digits ('42'); bools and floats are rejected; raises ValueError."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid integer: {value!r}")
+
+
+def parse_str(value):
+    """The value if it is a string; raises ValueError."""
+    if isinstance(value, str):
+        return value
+    raise ValueError(f"Invalid text: {value!r}, expected a string")
+
+
+def column_parsers(model):
+    """Parsers for ``model``'s DATE, TIME, INTEGER and string columns, for the writes that bypass the validators
+    (bulk, imports)."""
+    parsers = {}
+    for column in db.inspect(model).columns:
+        if isinstance(column.type, db.Date):
+            parsers[column.key] = parse_date
+        elif isinstance(column.type, db.Time):
+            parsers[column.key] = parse_time
+        elif isinstance(column.type, db.Integer):
+            parsers[column.key] = parse_int
+        elif isinstance(column.type, db.String):
+            parsers[column.key] = parse_str
+    return parsers
+
+
+def _subclasses(cls):
+    mapper = db.inspect(cls)
+    return [m.class_ for m in mapper.self_and_descendants if m is not mapper]
+
+
+def _polymorphic_columns(cls, path, columns):
+    # Whether rows at `path` need their subtype tables, i.e. unless only base-class columns were asked for
+    return bool(_subclasses(cls)) and (path not in columns or not all(hasattr(cls, key) for key in columns[path]))
+
+
+@lru_cache(maxsize=None)
+def _with_subtypes(cls, flat):
+    # Built once per class: a new with_polymorphic() per request would miss SQLAlchemy's compiled statement cache
+    return with_polymorphic(cls, _subclasses(cls), flat=flat)
+
+
+def _polymorphic(cls, path, columns, flat=False):
+    # `cls`, or `cls` LEFT OUTER JOINed to its subtype tables when rows at `path` need subtype columns
+    # (Inpatient.ward_number, ...), so those come back with the base row instead of from one SELECT per row
+    if _polymorphic_columns(cls, path, columns):
+        return _with_subtypes(cls, flat)
+    return cls
+
+
+def _attribute(entity, cls, key):
+    # `key` on `entity` (cls or a with_polymorphic() of it), looking in the subtypes for their own columns
+    if hasattr(cls, key):
+        return getattr(entity, key)
+    if entity is not cls:
+        for subclass in _subclasses(cls):
+            if key in db.inspect(subclass).columns:
+                return getattr(getattr(entity, subclass.__name__), key)
+    return None
+
+
+def _path_tree(paths):
+    tree = {}
+    for path in paths:
+        node = tree
+        for key in path.split('.'):
+            node = node.setdefault(key, {})
+    return tree
+
+
+def _level_options(entity, cls, path, tree, columns, strict):
+    # Options relative to `entity` (`cls` or a with_polymorphic() of it), which sits at `path` in the loaded tree
+    options = []
+    if path in columns:
+        # Base columns first: load_only() takes the entity it applies to from its first attribute
+        keys = sorted(columns[path], key=lambda key: not hasattr(cls, key))
+        attributes = [_attribute(entity, cls, key) for key in keys]
+        options.append(load_only(*[attribute for attribute in attributes if attribute is not None]))
+
+    for key, subtree in tree.items():
+        attr = getattr(entity, key)
+        relationship = attr.property
+        target = relationship.mapper.class_
+        target_path = f'{path}.{key}' if path else key
+
+        # A polymorphic target is joined to its subtype tables inside the same SELECT ... IN / JOIN (aliased, as
+        # several of them may end up in one statement)
+        target_entity = _polymorphic(target, target_path, columns, flat=True)
+        if target_entity is not target:
+            attr = attr.of_type(target_entity)
+        loader = selectinload(attr) if relationship.uselist else joinedload(attr)
+
+        nested = _level_options(target_entity, target, target_path, subtree, columns, strict)
+        options.append(loader.options(*nested) if nested else loader)
+
+    if strict:
+        options.append(raiseload('*', sql_only=True))
+    return options
+
+
+class EagerLoadingMixin:
+    # Relationship paths walked by to_dict() (derived from serialize_rules), for endpoints that return to_dict()
+    serialize_loads = ()
+
+    @classmethod
+    def query_for(cls, *paths, columns=None):
+        strict = current_app.config.get('STRICT_LOADING', False)
+        columns = columns or {}
+        entity = _polymorphic(cls, '', columns)
+        options = _level_options(entity, cls, '', _path_tree(paths), columns, strict)
+        return db.session.query(entity).options(*options)
+
 
-class Patient(db.Model, SerializerMixin):
+class Patient(db.Model, SerializerMixin, EagerLoadingMixin):
     __tablename__ = 'patients'
 
     id = db.Column(db.Integer, primary_key = True)
@@ -11,6 +182,8 @@ class Patient(db.Model, SerializerMixin):
     age = db.Column(db.Integer, nullable = False)
     gender = db.Column(db.String, nullable = False)
     type = db.Column(db.String, nullable = False)
+    # Revision of the transaction that last wrote the row, for GET /changes (see app/changes.py)
+    revision = db.Column(db.Integer, nullable = False, default = 0, server_default = '0', index = True)
 
     __mapper_args__ = {
         'polymorphic_identity': 'patient',
@@ -21,6 +194,16 @@ class Patient(db.Model, SerializerMixin):
     appointments = db.relationship('Appointment', back_populates='patient', cascade='all, delete-orphan')
 
     serialize_rules = ('-medical_records.patient',)
+    # Narrower schemas used by the compiled serializers (app/serializers.py), e.g. serialize(patient, 'list')
+    serialize_views = {
+        'list': ('id', 'name', 'age', 'gender', 'type'),
+    }
+    serialize_loads = (
+        'appointments.doctor.department',
+        'appointments.doctor.medical_records',
+        'appointments.patient.medical_records.doctor',
+        'medical_records.doctor',
+    )
 
 
 
@@ -28,26 +211,43 @@ class Inpatient(Patient):
     __tablename__ = 'inpatients'
 
     id = db.Column(db.Integer, db.ForeignKey('patients.id'), primary_key = True)
-    admission_date = db.Column(db.String, nullable = False)
-    ward_number = db.Column(db.Integer, nullable = False)
+    admission_date = db.Column(db.Date, nullable = False)
+    # Ward occupancy and ?ward= (app/routes/patients.py)
+    ward_number = db.Column(db.Integer, nullable = False, index = True)
 
     __mapper_args__ = {
         'polymorphic_identity': 'inpatient',
     }
 
+    @validates('admission_date')
+    def validate_admission_date(self, key, value):
+        return parse_date(value)
+
 
 class Outpatient(Patient):
     __tablename__ = 'outpatient'
 
     id = db.Column(db.Integer, db.ForeignKey('patients.id'), primary_key=True)
-    last_visit_date = db.Column(db.String, nullable=False)
+    last_visit_date = db.Column(db.Date, nullable=False)
 
     __mapper_args__ = {
         'polymorphic_identity': 'outpatient',
     }
 
+    @validates('last_visit_date')
+    def validate_last_visit_date(self, key, value):
+        return parse_date(value)
 
-class Medical_Record(db.Model, SerializerMixin):
+
+# Model and required fields per patient type, for the writes that bypass the constructors (bulk endpoint, imports)
+PATIENT_TYPES = {
+    'patient': (Patient, ['name', 'age', 'gender']),
+    'inpatient': (Inpatient, ['name', 'age', 'gender', 'admission_date', 'ward_number']),
+    'outpatient': (Outpatient, ['name', 'age', 'gender', 'last_visit_date']),
+}
+
+
+class Medical_Record(db.Model, SerializerMixin, EagerLoadingMixin):
     __tablename__ = 'medical_records'
 
     
@@ -57,6 +257,21 @@ class Medical_Record(db.Model, SerializerMixin):
     '-doctor.department',
     '-doctor.appointments',
 )
+    serialize_views = {
+        'list': ('id', 'diagnosis', 'treatment', 'date', 'patient_id', 'doctor_id'),
+        'detail': (
+            'id', 'diagnosis', 'treatment', 'date',
+            'patient.id', 'patient.name', 'patient.age', 'patient.gender',
+            'doctor.id', 'doctor.name',
+        ),
+        'timeline': ('id', 'date', 'diagnosis', 'treatment', 'doctor.id', 'doctor.name'),
+    }
+    serialize_loads = (
+        'doctor',
+        'patient.appointments.doctor.department',
+        'patient.appointments.doctor.medical_records',
+        'patient.appointments.patient.medical_records.doctor',
+    )
 
 
     id = db.Column(db.Integer, primary_key = True)
@@ -64,16 +279,28 @@ class Medical_Record(db.Model, SerializerMixin):
     treatment = db.Column(db.String, nullable = False)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable = False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable = False)
-    date = db.Column(db.String, nullable = False) 
+    date = db.Column(db.Date, nullable = False)
+    revision = db.Column(db.Integer, nullable = False, default = 0, server_default = '0', index = True)
+
+    # Per-patient and per-doctor history, and the (date, id) order of the list and export endpoints
+    __table_args__ = (
+        db.Index('ix_medical_records_patient_id_date', 'patient_id', 'date'),
+        db.Index('ix_medical_records_doctor_id_date', 'doctor_id', 'date'),
+        db.Index('ix_medical_records_date_id', 'date', 'id'),
+    )
 
 
     patient = db.relationship('Patient', back_populates='medical_records')
     doctor = db.relationship('Doctor', back_populates='medical_records')
 
+    @validates('date')
+    def validate_date(self, key, value):
+        return parse_date(value)
+
 
 
 
-class Doctor(db.Model, SerializerMixin):
+class Doctor(db.Model, SerializerMixin, EagerLoadingMixin):
     __tablename__ = 'doctors'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -81,7 +308,8 @@ class Doctor(db.Model, SerializerMixin):
     name = db.Column(db.String(100), nullable=False)
     specialization = db.Column(db.String(100), nullable=False)
     contact = db.Column(db.String)
-    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'))
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), index=True)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     # Relationships
     department = db.relationship('Department', back_populates='doctors', foreign_keys=[department_id])
@@ -95,35 +323,69 @@ class Doctor(db.Model, SerializerMixin):
     '-medical_records.doctor',
     '-medical_records.patient',
 )
+    serialize_loads = (
+        'appointments.patient.medical_records.doctor',
+        'department',
+        'medical_records',
+    )
+
     def __repr__(self):
         return f"<Doctor {self.name}>"
 
-class Appointment(db.Model, SerializerMixin):
+class Appointment(db.Model, SerializerMixin, EagerLoadingMixin):
     __tablename__ = 'appointments'
 
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.String, nullable=False)  # You can use db.DateTime if needed
+    date = db.Column(db.Date, nullable=False)
+    # [start_time, end_time) on `date`; appointments booked before times were recorded have neither
+    start_time = db.Column(db.Time)
+    end_time = db.Column(db.Time)
     reason = db.Column(db.String, nullable=False)
 
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
+
+    # A doctor's or patient's appointments by date, and the (date, id) order of the list and export endpoints
+    __table_args__ = (
+        db.Index('ix_appointments_doctor_id_date', 'doctor_id', 'date'),
+        db.Index('ix_appointments_patient_id_date', 'patient_id', 'date'),
+        db.Index('ix_appointments_date_id', 'date', 'id'),
+    )
 
     # Relationships
     patient = db.relationship("Patient", back_populates="appointments")
     doctor = db.relationship("Doctor", back_populates="appointments")
 
     serialize_rules = ('-patient.appointments', '-doctor.appointments')
+    serialize_views = {
+        'timeline': ('id', 'date', 'start_time', 'end_time', 'reason', 'doctor.id', 'doctor.name'),
+    }
+    serialize_loads = (
+        'doctor.department',
+        'doctor.medical_records',
+        'patient.medical_records.doctor',
+    )
+
+    @validates('date')
+    def validate_date(self, key, value):
+        return parse_date(value)
+
+    @validates('start_time', 'end_time')
+    def validate_time(self, key, value):
+        return parse_time(value)
 
     def __repr__(self):
         return f"<Appointment {self.date} with Doctor {self.doctor_id}>"
 
-class Department(db.Model, SerializerMixin):
+class Department(db.Model, SerializerMixin, EagerLoadingMixin):
     __tablename__ = 'departments'
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     specialty = db.Column(db.String(100), nullable=False)
     headdoctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), unique=True, nullable=True)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
 
     # Relationship to all doctors in this department
     doctors = db.relationship(
@@ -149,6 +411,10 @@ class Department(db.Model, SerializerMixin):
     '-headdoctor.appointments',
     '-headdoctor.medical_records',
 )
+    serialize_views = {
+        'detail': ('id', 'name', 'specialty', 'headdoctor.id', 'headdoctor.name', 'headdoctor.specialization'),
+    }
+    serialize_loads = ('doctors', 'headdoctor')
 
 
     # === Class-level utility methods ===
@@ -185,3 +451,81 @@ class Department(db.Model, SerializerMixin):
 
     def __repr__(self):
         return f"<Department {self.id}: {self.name} ({self.specialty})>"
+
+
+class TableVersion(db.Model):
+    # One row per table, bumped in the same transaction as every write to it (see app/versions.py).
+    # Conditional GETs compare these instead of re-running the query.
+    __tablename__ = 'table_versions'
+
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<TableVersion {self.name} v{self.version}>"
+
+
+class ChangeRevision(db.Model):
+    # The last revision handed out (a single row). Each write transaction takes the next one and stamps it on
+    # every row it writes, see app/changes.py.
+    __tablename__ = 'change_revision'
+
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False)
+
+
+class Tombstone(db.Model):
+    # A deleted row, so that GET /changes can tell clients to drop it
+    __tablename__ = 'tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, index=True)
+    type = db.Column(db.String, nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<Tombstone {self.type} {self.row_id} r{self.revision}>"
+
+
+class ImportCheckpoint(db.Model):
+    # Progress of one import job (see app/importer.py), committed together with each chunk it covers,
+    # so an interrupted import resumes after the last chunk that made it to the database.
+    __tablename__ = 'import_checkpoints'
+
+    job = db.Column(db.String, primary_key=True)
+    kind = db.Column(db.String, nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    rejected = db.Column(db.Integer, nullable=False, default=0)
+    finished = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<ImportCheckpoint {self.job} at {self.position}>"
+
+
+# === Summary tables ===
+# Row counts kept up to date by app/stats.py in the same transaction as every write to the tables they count,
+# so GET /stats/... reads a few small rows instead of aggregating appointments and medical_records.
+
+class DepartmentStats(db.Model):
+    __tablename__ = 'department_stats'
+
+    department_id = db.Column(db.Integer, primary_key=True)
+    doctors = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DoctorStats(db.Model):
+    __tablename__ = 'doctor_stats'
+
+    doctor_id = db.Column(db.Integer, primary_key=True)
+    appointments = db.Column(db.Integer, nullable=False, default=0)
+    records = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DiagnosisStats(db.Model):
+    __tablename__ = 'diagnosis_stats'
+
+    diagnosis = db.Column(db.String, primary_key=True)
+    records = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,163 @@
+# Keyset (cursor) pagination shared by every collection endpoint.
+#
+# Pages are fetched with "WHERE (key columns) > (last seen values) ORDER BY key columns LIMIT n",
+# so reading page 1000 costs the same as reading page 1 (unlike OFFSET, which re-reads every skipped row).
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from sqlalchemy import tuple_
+
+from app.errors import bad_request
+
+
+def encode_cursor(values):
+    # Cursors are opaque to clients: the key values of the last row, as url-safe base64 JSON
+    values = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        bad_request('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        bad_request('Invalid cursor')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        try:
+            if python_type in (date, datetime) and isinstance(value, str):
+                value = python_type.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                bad_request('Invalid cursor')
+        except ValueError:
+            bad_request('Invalid cursor')
+        decoded.append(value)
+    return decoded
+
+
+def get_limit():
+    default = current_app.config['DEFAULT_PAGE_SIZE']
+    maximum = current_app.config['MAX_PAGE_SIZE']
+
+    limit = request.args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        bad_request('limit must be an integer')
+
+    if limit < 1:
+        bad_request('limit must be a positive integer')
+    return min(limit, maximum)
+
+
+def ids_arg():
+    """The ids listed in ?ids=3,1,2 (repeats dropped, order kept), or None when it isn't given."""
+    value = request.args.get('ids')
+    if value is None:
+        return None
+    try:
+        ids = list(dict.fromkeys(int(item) for item in value.split(',') if item.strip()))
+    except ValueError:
+        bad_request('ids must be a comma-separated list of integers')
+
+    maximum = current_app.config['MAX_BATCH_IDS']
+    if len(ids) > maximum:
+        bad_request(f"At most {maximum} ids per request")
+    return ids
+
+
+class Page:
+    def __init__(self, items, next_cursor, missing=()):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.missing = missing
+
+    def headers(self):
+        if self.missing:
+            return {'X-Missing-Ids': ','.join(map(str, self.missing))}
+        if not self.next_cursor:
+            return {}
+
+        args = request.args.to_dict()
+        args['after'] = self.next_cursor
+        next_url = f"{request.base_url}?{urlencode(args)}"
+        return {
+            'X-Next-Cursor': self.next_cursor,
+            'Link': f'<{next_url}>; rel="next"',
+        }
+
+
+def _by_ids(rows, column, ids):
+    by_id = {getattr(row, column.key): row for row in rows}
+    return Page([by_id[id] for id in ids if id in by_id], None, [id for id in ids if id not in by_id])
+
+
+def _limited_page(rows, columns, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return Page(rows, next_cursor)
+
+
+def merged_after(key_column, id_column, position, cursor):
+    """Filter for the rows of one source of a merged list that come after ``cursor``.
+
+    The list is ordered by (key, position of the source, id), and ``cursor`` is those three values for the last
+    row returned; each source is read from an index on (key, id).
+    """
+    after_key, after_position, after_id = cursor
+    if position < after_position:
+        return key_column > after_key
+    if position > after_position:
+        return key_column >= after_key
+    return tuple_(key_column, id_column) > tuple_(after_key, after_id)
+
+
+def _page_query(query, columns):
+    # The query for the requested page, and the function that turns its rows into the Page
+    ids = ids_arg()
+    if ids is not None:
+        # One IN query however many ids are asked for (at most MAX_BATCH_IDS)
+        return query.filter(columns[-1].in_(ids)), lambda rows: _by_ids(rows, columns[-1], ids)
+
+    limit = get_limit()
+    after = request.args.get('after')
+
+    if after:
+        values = decode_cursor(after, columns)
+        if len(columns) == 1:
+            query = query.filter(columns[0] > values[0])
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    # Fetch one extra row to know whether there is a next page without a COUNT(*)
+    return query.order_by(*columns).limit(limit + 1), lambda rows: _limited_page(rows, columns, limit)
+
+
+def paginate(query, *columns):
+    """Return one page of ``query`` ordered by ``columns`` (the last one must be unique, e.g. the primary key).
+
+    Reads ``?limit=`` and ``?after=`` from the current request. With ``?ids=`` the page is those rows instead, in
+    the order given, and the ids that weren't found are listed in an X-Missing-Ids header.
+    """
+    query, page = _page_query(query, columns)
+    return page(query.all())
+
+
+async def paginate_async(session, query, *columns):
+    """paginate() for a query of one entity, read through ``session`` (an AsyncSession, see app/asgi.py)."""
+    query, page = _page_query(query, columns)
+    result = await session.execute(query.statement)
+    return page(result.unique().scalars().all())
@@ -0,0 +1,167 @@
+# Fuzzy patient lookup by name (GET /patients/search?q=).
+#
+# Names are indexed word by word in patient_names_fts (see app/search.py), which triggers keep in step with the
+# patients table, so a patient can be found the moment they are registered. Misspellings are handled by expanding
+# each word of the query into the indexed words it most resembles:
+#
+#   1. Every worker keeps the vocabulary (the distinct words of all names, read from patient_names_fts_vocab) with
+#      an index from each trigram ("  j", " jo", "jon", "onh", "nh ") to the words containing it. Words of patients
+#      added since it was read are picked up by id on every search; the whole vocabulary is re-read every
+#      NAME_VOCABULARY_TTL seconds so renamed and deleted patients drop out.
+#   2. A query word expands to the EXPANSIONS vocabulary words sharing the largest fraction of its trigrams (at least
+#      MIN_SIMILARITY), and the last word, which may still be being typed, also to every word it starts.
+#   3. A patient scores the mean similarity of the words matched. The combinations of expansions are looked up best
+#      first, one AND query on the index each ("jennifer" AND "smith"), until ``limit`` patients are found.
+#
+# The vocabulary is tiny next to the table (a few thousand words for a million patients with common names), so a
+# search costs a few dictionary lookups and a handful of indexed queries however many patients there are.
+import heapq
+import itertools
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+
+from flask import current_app
+from sqlalchemy import func, select, text
+
+from app import db
+from app.models import Patient
+from app.search import PATIENT_NAMES
+
+MIN_SIMILARITY = 0.2
+EXPANSIONS = 5       # spellings tried per query word
+PREFIX_SIMILARITY = 0.9
+MAX_WORDS = 4
+MAX_LOOKUPS = 20     # index queries per search
+CATCH_UP_ROWS = 10000  # new patients read one by one before the whole vocabulary is re-read instead
+
+_WORD = re.compile(r'\w+')
+
+
+def name_words(name):
+    """``name`` split like the index's tokenizer does it: lower case, accents removed, on non-word characters."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    return _WORD.findall(''.join(c for c in decomposed if not unicodedata.combining(c)).lower())
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Vocabulary:
+    """The distinct words of patient names, and the words containing each trigram."""
+
+    def __init__(self, max_id):
+        self.max_id = max_id  # the highest patient id whose name is in here
+        self.loaded_at = time.monotonic()
+        self.words = []
+        self.sizes = array('H')  # number of trigrams of each word
+        self.known = set()
+        self.postings = defaultdict(lambda: array('I'))
+
+    def add(self, word):
+        if word in self.known:
+            return
+        self.known.add(word)
+        position = len(self.words)
+        self.words.append(word)
+        grams = trigrams(word)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings[gram].append(position)
+
+    def near(self, word, count):
+        """Up to ``count`` (similarity, word) pairs, most similar first; similarity is the trigram Jaccard index."""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings:
+                shared.update(postings)
+        scored = []
+        for position, common in shared.items():
+            similarity = common / (len(grams) + self.sizes[position] - common)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((similarity, self.words[position]))
+        return heapq.nlargest(count, scored)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.vocabulary = None
+
+
+def _load():
+    vocabulary = Vocabulary(db.session.scalar(select(func.max(Patient.id))) or 0)
+    for (term,) in db.session.execute(text(f'SELECT term FROM {PATIENT_NAMES.vocabulary}')):
+        vocabulary.add(term)
+    return vocabulary
+
+
+def _catch_up(vocabulary):
+    # Names of the patients added since `vocabulary` was read; False if there are too many to be worth it
+    query = (select(Patient.id, Patient.name).where(Patient.id > vocabulary.max_id)
+             .order_by(Patient.id).limit(CATCH_UP_ROWS + 1))
+    rows = db.session.execute(query).all()
+    if len(rows) > CATCH_UP_ROWS:
+        return False
+    for id, name in rows:
+        for word in name_words(name):
+            vocabulary.add(word)
+        vocabulary.max_id = id
+    return True
+
+
+def vocabulary():
+    """This process's vocabulary, brought up to date."""
+    state = current_app.extensions.setdefault('patient_names', _State())
+    with state.lock:
+        current = state.vocabulary
+        stale = current is None or time.monotonic() - current.loaded_at > current_app.config['NAME_VOCABULARY_TTL']
+        if stale or not _catch_up(current):
+            current = state.vocabulary = _load()
+        return current
+
+
+def _expansions(vocabulary, word, typing):
+    # [(fts term, similarity)] for one query word, best first
+    choices = {f'"{term}"': similarity for similarity, term in vocabulary.near(word, EXPANSIONS)}
+    if typing:
+        choices.setdefault(f'"{word}"*', PREFIX_SIMILARITY)
+    return sorted(choices.items(), key=lambda choice: -choice[1])
+
+
+def lookup(q, limit):
+    """[(patient id, score)] of up to ``limit`` patients whose name resembles ``q``, best first."""
+    words = name_words(q)[:MAX_WORDS]
+    if not words:
+        return []
+    typing = not q[-1].isspace()  # no space after the last word: it may be incomplete
+    current = vocabulary()
+
+    options = []
+    for position, word in enumerate(words):
+        expansions = _expansions(current, word, typing and position == len(words) - 1)
+        if expansions:
+            options.append(expansions)
+    if not options:
+        return []
+
+    # Combinations of one expansion per word, highest total similarity first
+    combinations = sorted(itertools.product(*options), key=lambda combination: -sum(s for _, s in combination))
+    found = {}
+    for combination in combinations[:MAX_LOOKUPS]:
+        score = round(sum(s for _, s in combination) / len(words), 3)
+        expression = ' AND '.join(term for term, _ in combination)
+        # `limit` rows always bring in enough new ones, however many of them were found by an earlier combination
+        query = select(PATIENT_NAMES.table.c.rowid).where(PATIENT_NAMES.match(expression)).limit(limit)
+        for (id,) in db.session.execute(query):
+            found.setdefault(id, score)
+            if len(found) == limit:
+                return list(found.items())
+    return list(found.items())
@@ -1,40 +1,73 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Appointment, Doctor, Patient
+from app.pagination import paginate
+from app.bulk import bulk_create, bulk_delete, bulk_update
+from app.export import export_response
+from app.conditional import conditional_get
+from app.fieldsets import requested_fieldset
+from app.scheduling import (booking_conflict, check_bulk_create, check_bulk_update, duration, fill_times,
+                            new_booking_times, verify_bulk)
 
 appointment_bp = Blueprint("appointment_bp", __name__, url_prefix="/appointments")
 
+# (fieldset, query, ordering) of GET /appointments/, shared with the async handler in app/asgi.py
+def appointment_list():
+    fieldset = requested_fieldset(Appointment, loads=Appointment.serialize_loads)
+    return fieldset, fieldset.query(Appointment.date, Appointment.id), (Appointment.date, Appointment.id)
+
 # GET all appointments
 @appointment_bp.route("/", methods=["GET"])
 def get_appointments():
-    appointments = Appointment.query.all()
-    return jsonify([appt.to_dict() for appt in appointments]), 200
+    fieldset, query, columns = appointment_list()
+    conditional_get(fieldset.tables())
+    page = paginate(query, *columns)
+    return jsonify(fieldset.serialize_many(page.items)), 200, page.headers()
+
+# GET export every appointment as NDJSON or CSV (?format=csv&from=&to=&doctor_id=&patient_id=)
+@appointment_bp.route("/export", methods=["GET"])
+def export_appointments():
+    return export_response(Appointment, ['id', 'date', 'start_time', 'end_time', 'reason', 'patient_id', 'doctor_id'],
+                           'appointments')
 
 # GET single appointment
 @appointment_bp.route("/<int:id>", methods=["GET"])
 def get_appointment(id):
-    appt = Appointment.query.get(id)
+    fieldset = requested_fieldset(Appointment, loads=Appointment.serialize_loads)
+    conditional_get(fieldset.tables())
+    appt = fieldset.query().filter_by(id=id).first()
     if appt:
-        return jsonify(appt.to_dict()), 200
+        return jsonify(fieldset.serialize(appt)), 200
     return jsonify({"error": "Appointment not found"}), 404
 
-# POST create appointment
+# POST create appointment (end_time defaults to start_time + APPOINTMENT_MINUTES); 409 on a double booking.
+# Without a start_time (or end_time) it is booked at WORKING_HOURS_START
 @appointment_bp.route("/", methods=["POST"])
 def create_appointment():
     data = request.get_json()
     try:
+        times = new_booking_times({"start_time": data.get("start_time"), "end_time": data.get("end_time")})
         new_appt = Appointment(
             date=data["date"],
+            start_time=times["start_time"],
+            end_time=times["end_time"],
             reason=data["reason"],
             doctor_id=data["doctor_id"],
             patient_id=data["patient_id"]
         )
         db.session.add(new_appt)
-        db.session.commit()
-        return jsonify(new_appt.to_dict()), 201
+        db.session.flush()
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+    conflict = booking_conflict(new_appt)
+    if conflict:
+        db.session.rollback()
+        return jsonify({"error": conflict}), 409
+    db.session.commit()
+    return jsonify(new_appt.to_dict()), 201
+
 # PATCH update appointment
 @appointment_bp.route("/<int:id>", methods=["PATCH"])
 def update_appointment(id):
@@ -43,10 +76,25 @@ def update_appointment(id):
         return jsonify({"error": "Appointment not found"}), 404
 
     data = request.get_json()
-    for field in ['date', 'reason', 'doctor_id', 'patient_id']:
-        if field in data:
-            setattr(appt, field, data[field])
+    try:
+        # Moving the start without giving an end keeps the appointment's length
+        times = {"start_time": data.get("start_time", appt.start_time), "end_time": data.get("end_time")}
+        if "start_time" not in data and "end_time" not in data:
+            times["end_time"] = appt.end_time
+        fill_times(times, duration(appt.start_time, appt.end_time))
+        for field in ['date', 'reason', 'doctor_id', 'patient_id']:
+            if field in data:
+                setattr(appt, field, data[field])
+        appt.start_time, appt.end_time = times["start_time"], times["end_time"]
+        db.session.flush()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
 
+    conflict = booking_conflict(appt)
+    if conflict:
+        db.session.rollback()
+        return jsonify({"error": conflict}), 409
     db.session.commit()
     return jsonify(appt.to_dict()), 200
 
@@ -60,3 +108,27 @@ def delete_appointment(id):
     db.session.delete(appt)
     db.session.commit()
     return jsonify({"message": "Appointment deleted"}), 200
+
+# === Bulk ===
+# Each takes a JSON array, writes it in one transaction and reports a status per item (see app/bulk.py)
+
+APPOINTMENT_FIELDS = ['date', 'reason', 'doctor_id', 'patient_id']
+APPOINTMENT_TIMES = ['start_time', 'end_time']
+APPOINTMENT_REFERENCES = {'patient_id': Patient, 'doctor_id': Doctor}
+
+# POST create appointments in bulk
+@appointment_bp.route("/bulk", methods=["POST"])
+def create_appointments_bulk():
+    return bulk_create(Appointment, APPOINTMENT_FIELDS, APPOINTMENT_REFERENCES, optional=APPOINTMENT_TIMES,
+                       check=check_bulk_create, verify=verify_bulk)
+
+# PATCH update appointments in bulk: [{"id": 1, "reason": "..."}, ...]
+@appointment_bp.route("/bulk", methods=["PATCH"])
+def update_appointments_bulk():
+    return bulk_update(Appointment, APPOINTMENT_FIELDS + APPOINTMENT_TIMES, APPOINTMENT_REFERENCES,
+                       check=check_bulk_update, verify=verify_bulk)
+
+# DELETE appointments in bulk: [1, 2, 3]
+@appointment_bp.route("/bulk", methods=["DELETE"])
+def delete_appointments_bulk():
+    return bulk_delete(Appointment)
@@ -0,0 +1,18 @@
+from flask import Blueprint, request, jsonify
+
+from app.cache import cached
+from app.changes import feed, parse_types, tables
+from app.conditional import conditional_get
+
+changes_bp = Blueprint('changes_bp', __name__, url_prefix='/changes')
+
+
+# Rows created, changed or deleted since ?since= (see app/changes.py). Polling with an unchanged cursor and
+# If-None-Match costs one lookup in table_versions until something is written.
+@changes_bp.route('/', methods=['GET'], strict_slashes=False)
+def get_changes():
+    types = parse_types(request.args.get('types'))
+    read = tables(types)
+    conditional_get(read)
+    changes = cached(request.url, read, lambda: feed(request.args.get('since'), types))
+    return jsonify(changes), 200
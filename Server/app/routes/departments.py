@@ -2,21 +2,23 @@ from flask import request, jsonify, make_response
 from flask_restful import Resource
 from app.models import Department, Doctor
 from app import db
+from app.pagination import paginate
+from app.cache import cached, exists
+from app.conditional import conditional_get
+from app.fieldsets import requested_fieldset
+from app.serializers import serialize
 
 class DepartmentList(Resource):
     def get(self):
-        departments = Department.query.all()
-        dept_list = [{
-            'id': dept.id,
-            'name': dept.name,
-            'specialty': dept.specialty,
-            'headdoctor': {
-                'id': dept.headdoctor.id,
-                'name': dept.headdoctor.name,
-                'specialization': dept.headdoctor.specialization,
-            } if dept.headdoctor else None
-        } for dept in departments]
-        return make_response(jsonify(dept_list), 200)
+        fieldset = requested_fieldset(Department, 'detail', loads=('headdoctor',))
+        conditional_get(fieldset.tables())
+
+        def load():
+            page = paginate(fieldset.query(Department.id), Department.id)
+            return fieldset.serialize_many(page.items), page.headers()
+
+        dept_list, headers = cached(request.url, fieldset.tables(), load)
+        return make_response(jsonify(dept_list), 200, headers)
 
     def post(self):
         data = request.get_json()
@@ -28,8 +30,7 @@ class DepartmentList(Resource):
             return make_response({'error': 'Department with that name already exists'}, 400)
 
         if data.get('headdoctor_id'):
-            doctor = Doctor.query.get(data['headdoctor_id'])
-            if not doctor:
+            if not exists(Doctor, data['headdoctor_id']):
                 return make_response({'error': 'Head doctor not found'}, 400)
 
         new_dept = Department(
@@ -46,20 +47,17 @@ class DepartmentList(Resource):
 
 class DepartmentByID(Resource):
     def get(self, id):
-        dept = Department.query.get(id)
-        if not dept:
+        fieldset = requested_fieldset(Department, 'detail', loads=('headdoctor',))
+        conditional_get(fieldset.tables())
+
+        def load():
+            dept = fieldset.query().filter_by(id=id).first()
+            return fieldset.serialize(dept) if dept else None
+
+        dept_data = cached(request.url, fieldset.tables(), load)
+        if dept_data is None:
             return make_response({'error': 'Department not found'}, 404)
 
-        dept_data = {
-            'id': dept.id,
-            'name': dept.name,
-            'specialty': dept.specialty,
-            'headdoctor': {
-                'id': dept.headdoctor.id,
-                'name': dept.headdoctor.name,
-                'specialization': dept.headdoctor.specialization,
-            } if dept.headdoctor else None
-        }
 
         return make_response(dept_data, 200)
 
@@ -75,22 +73,12 @@ class DepartmentByID(Resource):
         if 'specialty' in data:
             dept.specialty = data['specialty']
         if 'headdoctor_id' in data:
-            doctor = Doctor.query.get(data['headdoctor_id'])
-            if not doctor:
+            if not exists(Doctor, data['headdoctor_id']):
                 return make_response({'error': 'Invalid doctor ID'}, 400)
             dept.headdoctor_id = data['headdoctor_id']
 
         db.session.commit()
-        return make_response({
-            'id': dept.id,
-            'name': dept.name,
-            'specialty': dept.specialty,
-            'headdoctor': {
-                'id': dept.headdoctor.id,
-                'name': dept.headdoctor.name,
-                'specialization': dept.headdoctor.specialization,
-            } if dept.headdoctor else None
-        }, 200)
+        return make_response(serialize(dept, 'detail'), 200)
 
 
     def delete(self, id):
@@ -2,19 +2,48 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Doctor
+from app.pagination import paginate
+from app.cache import cached
+from app.conditional import conditional_get
+from app.fieldsets import requested_fieldset
+from app.availability import search as search_availability
 
 doctor_bp = Blueprint('doctor_bp', __name__, url_prefix='/doctors')
 
+# (fieldset, query, ordering) of GET /doctors/, shared with the async handler in app/asgi.py
+def doctor_list():
+    fieldset = requested_fieldset(Doctor, loads=Doctor.serialize_loads)
+    return fieldset, fieldset.query(Doctor.id), (Doctor.id,)
+
 @doctor_bp.route('/', methods=['GET'])
 def get_all_doctors():
-    doctors = Doctor.query.all()
-    return jsonify([d.to_dict() for d in doctors]), 200
+    fieldset, query, columns = doctor_list()
+    conditional_get(fieldset.tables())
+
+    def load():
+        page = paginate(query, *columns)
+        return fieldset.serialize_many(page.items), page.headers()
+
+    doctors, headers = cached(request.url, fieldset.tables(), load)
+    return jsonify(doctors), 200, headers
+
+@doctor_bp.route('/availability', methods=['GET'])
+def get_availability():
+    # Not conditional or cached as a whole: the answer depends on the time of day as well as the data
+    return jsonify(search_availability()), 200
 
 @doctor_bp.route('/<int:id>', methods=['GET'])
 def get_doctor(id):
-    doctor = Doctor.query.get(id)
-    if doctor:
-        return jsonify(doctor.to_dict()), 200
+    fieldset = requested_fieldset(Doctor, loads=Doctor.serialize_loads)
+    conditional_get(fieldset.tables())
+
+    def load():
+        doctor = fieldset.query().filter_by(id=id).first()
+        return fieldset.serialize(doctor) if doctor else None
+
+    doctor = cached(request.url, fieldset.tables(), load)
+    if doctor is not None:
+        return jsonify(doctor), 200
     return jsonify({"error": "Doctor not found"}), 404
 
 @doctor_bp.route('/', methods=['POST'])
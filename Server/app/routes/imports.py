@@ -0,0 +1,29 @@
+import io
+import uuid
+
+from flask import Blueprint, request, jsonify
+from app.importer import FORMATS, KINDS, ImportFailed, read_rows, run_import
+
+import_bp = Blueprint("import_bp", __name__, url_prefix="/import")
+
+# POST import patients or records: the file is the request body (or a multipart "file" field)
+# ?format=csv|ndjson (default: from the content type), ?job= to resume an interrupted upload, ?restart=true
+@import_bp.route("/<kind>", methods=["POST"])
+def import_file(kind):
+    if kind not in KINDS:
+        return jsonify({"error": f"Unknown import kind '{kind}'"}), 404
+
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    content_type = upload.mimetype if upload else request.mimetype
+    fmt = request.args.get("format") or ("csv" if content_type == "text/csv" else "ndjson")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}'"}), 400
+
+    job = request.args.get("job") or f"upload-{uuid.uuid4().hex}"
+    rows = read_rows(io.TextIOWrapper(stream, encoding="utf-8", newline=""), fmt)
+    try:
+        summary = run_import(kind, rows, job, restart=request.args.get("restart") == "true")
+    except ImportFailed as e:
+        return jsonify({"error": str(e), "job": job}), 400
+    return jsonify(summary), 200
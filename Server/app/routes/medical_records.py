@@ -2,41 +2,49 @@ from flask import request, jsonify, make_response
 from flask_restful import Resource
 from app.models import Medical_Record, Patient, Doctor
 from app import db
+from app.pagination import paginate
+from app.cache import exists
+from app.bulk import bulk_create, bulk_delete, bulk_update
+from app.export import export_response, filter_query
+from app.conditional import conditional_get
+from app.fieldsets import requested_fieldset
+from app.search import available, rank, search_query
+
+
+def record_list():
+    # (fieldset, query, ordering) of GET /records/, shared with the async handler in app/asgi.py
+    fieldset = requested_fieldset(Medical_Record, 'list')
+    return fieldset, fieldset.query(Medical_Record.date, Medical_Record.id), (Medical_Record.date, Medical_Record.id)
 
 
 class MedicalRecords(Resource):
     def get(self):
-        records = Medical_Record.query.all()
-
-        record_list = [{
-            'id': record.id,
-            'diagnosis': record.diagnosis,
-            'treatment': record.treatment,
-            'date': record.date,
-            'patient_id': record.patient.id,
-            'doctor_id': record.doctor.id
-        } for record in records]
-
-        return make_response(jsonify(record_list), 200)
+        fieldset, query, columns = record_list()
+        conditional_get(fieldset.tables())
+        page = paginate(query, *columns)
+
+        records = fieldset.serialize_many(page.items)
+
+        return make_response(jsonify(records), 200, page.headers())
     
 
     def post(self):
         data = request.get_json()
 
         # Optional: validate patient and doctor exist
-        patient = Patient.query.get(data.get('patient_id'))
-        doctor = Doctor.query.get(data.get('doctor_id'))
-
-        if not patient or not doctor:
+        if not exists(Patient, data.get('patient_id')) or not exists(Doctor, data.get('doctor_id')):
             return make_response({"error": "Invalid patient or doctor ID"}, 400)
 
-        new_record = Medical_Record(
-            diagnosis=data['diagnosis'],
-            treatment=data['treatment'],
-            date=data['date'],
-            patient_id=data['patient_id'],
-            doctor_id=data['doctor_id']
-        )
+        try:
+            new_record = Medical_Record(
+                diagnosis=data['diagnosis'],
+                treatment=data['treatment'],
+                date=data['date'],
+                patient_id=data['patient_id'],
+                doctor_id=data['doctor_id']
+            )
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
 
         db.session.add(new_record)
         db.session.commit()
@@ -44,29 +52,45 @@ class MedicalRecords(Resource):
         return make_response(new_record.to_dict(), 201)
 
 
+class MedicalRecordsExport(Resource):
+    # Streams every matching record as NDJSON or CSV, see app/export.py for the filters
+    def get(self):
+        return export_response(Medical_Record, ['id', 'date', 'diagnosis', 'treatment', 'patient_id', 'doctor_id'],
+                               'medical_records')
+
+
+class MedicalRecordsSearch(Resource):
+    # Full-text search over diagnosis and treatment, best matches first (see app/search.py)
+    def get(self):
+        if not available():
+            return make_response({'error': 'Full-text search needs a SQLite database'}, 501)
+
+        fieldset = requested_fieldset(Medical_Record, 'list')
+        conditional_get(fieldset.tables())
+        query = filter_query(search_query(request.args.get('q')), Medical_Record)
+        page = paginate(query, rank, Medical_Record.id)
+
+        # Load the page's records and return them in rank order, each with its score (lower is better)
+        scores = {row.id: row.rank for row in page.items}
+        records = fieldset.query(Medical_Record.id).filter(Medical_Record.id.in_(scores)).all()
+        records.sort(key=lambda record: (scores[record.id], record.id))
+        results = fieldset.serialize_many(records)
+        for result, record in zip(results, records):
+            result['rank'] = scores[record.id]
+
+        return make_response(jsonify(results), 200, page.headers())
+
+
 class MedicalRecordByID(Resource):
     def get(self, id):
-        record = Medical_Record.query.get(id)
+        fieldset = requested_fieldset(Medical_Record, 'detail', loads=('patient', 'doctor'))
+        conditional_get(fieldset.tables())
+        record = fieldset.query().filter_by(id=id).first()
 
         if not record:
             return make_response({'error': 'Medical record not found'}, 404)
 
-        record_data = {
-            'id': record.id,
-            'diagnosis': record.diagnosis,
-            'treatment': record.treatment,
-            'date': record.date,
-            'patient': {
-                'id': record.patient.id,
-                'name': record.patient.name,
-                'age': record.patient.age,
-                'gender': record.patient.gender
-            },
-            'doctor': {
-                'id': record.doctor.id,
-                'name': record.doctor.name
-            }
-        }
+        record_data = fieldset.serialize(record)
 
         return make_response(jsonify(record_data), 200)
 
@@ -77,9 +101,12 @@ class MedicalRecordByID(Resource):
             return make_response({'error': 'Medical record not found'}, 404)
 
         data = request.get_json()
-        for attr in ['diagnosis', 'treatment', 'date', 'patient_id', 'doctor_id']:
-            if attr in data:
-                setattr(record, attr, data[attr])
+        try:
+            for attr in ['diagnosis', 'treatment', 'date', 'patient_id', 'doctor_id']:
+                if attr in data:
+                    setattr(record, attr, data[attr])
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
 
         db.session.commit()
         return make_response(record.to_dict(), 200)
@@ -92,3 +119,19 @@ class MedicalRecordByID(Resource):
         db.session.delete(record)
         db.session.commit()
         return make_response({'message': 'Medical record deleted'}, 204)
+
+
+RECORD_FIELDS = ['diagnosis', 'treatment', 'date', 'patient_id', 'doctor_id']
+RECORD_REFERENCES = {'patient_id': Patient, 'doctor_id': Doctor}
+
+
+class MedicalRecordsBulk(Resource):
+    # JSON arrays written in one transaction, with a status per item (see app/bulk.py)
+    def post(self):
+        return bulk_create(Medical_Record, RECORD_FIELDS, RECORD_REFERENCES)
+
+    def patch(self):
+        return bulk_update(Medical_Record, RECORD_FIELDS, RECORD_REFERENCES)
+
+    def delete(self):
+        return bulk_delete(Medical_Record)
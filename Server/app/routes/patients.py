@@ -1,9 +1,19 @@
 
-from flask import Flask, jsonify, request, make_response
+from flask import jsonify, request, make_response
 from flask_restful import Resource
-from app.models import Patient, Outpatient, Inpatient
+from app.models import Patient, Outpatient, Inpatient, Medical_Record, Appointment, PATIENT_TYPES
 from app import db
-from flask import Blueprint, request, jsonify
+from app.bulk import (BulkResult, bulk_delete, bulk_items, check_values, check_required, insert_rows, is_id,
+                      update_rows, values_by_id, write_verified)
+from app.pagination import get_limit, paginate
+from app.patient_lookup import lookup
+from app.search import available
+from app.cache import cached
+from app.conditional import conditional_get
+from app.errors import bad_request
+from app.export import int_arg
+from app.fieldsets import requested_fieldset
+from app.timeline import tables as timeline_tables, timeline
 
 class HomeResource(Resource):
     
@@ -11,20 +21,45 @@ class HomeResource(Resource):
         
        response = make_response(jsonify({"message": "Welcome to the Hospital Management System API!"}), 200)
        return response
-class Patient_List(Resource):
+def _listed_type():
+    # The model whose table ?type= (and ?ward=, which implies inpatients) lists
+    patient_type = request.args.get('type')
+    if request.args.get('ward') is not None:
+        if patient_type not in (None, 'inpatient'):
+            bad_request("ward only applies to inpatients")
+        patient_type = 'inpatient'
+    if patient_type is None:
+        return Patient
+    if patient_type not in PATIENT_TYPES:
+        bad_request(f"Invalid type: expected one of {', '.join(PATIENT_TYPES)}")
+    return PATIENT_TYPES[patient_type][0]
+
+
+def patient_list():
+    # (fieldset, query, ordering) of GET /patients/, shared with the async handler in app/asgi.py.
+    # ?type=inpatient|outpatient reads the subtype's table joined to its base rows, ?type=patient the patients with
+    # no subtype; ?ward= lists the inpatients of one ward through the ward_number index
+    model = _listed_type()
+    fieldset = requested_fieldset(model, 'list')
+    query = fieldset.query(model.id)
+    if model is Patient and request.args.get('type') == 'patient':
+        query = query.filter(Patient.type == 'patient')
+    ward = int_arg('ward')
+    if ward is not None:
+        query = query.filter(Inpatient.ward_number == ward)
+    return fieldset, query, (model.id,)
 
+
+class Patient_List(Resource):
     def get(self):
-        patients = [patient.to_dict() for patient in Patient.query.all()]
+        fieldset, query, columns = patient_list()
+        conditional_get(fieldset.tables())
+        page = paginate(query, *columns)
 
-        patient_list = [{
-           'id': patient['id'],
-           'name': patient['name'],
-           'age': patient['age'],
-           'gender': patient['gender'],
-           'type': patient['type'],
-        }for patient in patients] 
+        # Only base columns are returned, so there is no need to serialize (and load) every relationship
+        patients = fieldset.serialize_many(page.items)
 
-        response = make_response(jsonify(patient_list), 200)
+        response = make_response(jsonify(patients), 200, page.headers())
 
         return response
     
@@ -33,35 +68,38 @@ class Patient_List(Resource):
 
         patient_type = data.get('type')
 
-        if patient_type == 'inpatient':
-            new_patient = Inpatient(
-                name=data['name'],
-                age=data['age'],
-                gender=data['gender'],
-                type='inpatient',
-                admission_date=data['admission_date'],
-                ward_number=data['ward_number']
-            )
-
-        elif patient_type == 'outpatient':
-            new_patient = Outpatient(
-                name=data['name'],
-                age=data['age'],
-                gender=data['gender'],
-                type='outpatient',
-                last_visit_date=data['last_visit_date']
-            )
-
-        elif patient_type == 'patient':
-            new_patient = Patient(
-                name=data['name'],
-                age=data['age'],
-                gender=data['gender'],
-                type='patient'
-            )
-
-        else:
-            return make_response({'error': 'Invalid patient type'}, 400)
+        try:
+            if patient_type == 'inpatient':
+                new_patient = Inpatient(
+                    name=data['name'],
+                    age=data['age'],
+                    gender=data['gender'],
+                    type='inpatient',
+                    admission_date=data['admission_date'],
+                    ward_number=data['ward_number']
+                )
+
+            elif patient_type == 'outpatient':
+                new_patient = Outpatient(
+                    name=data['name'],
+                    age=data['age'],
+                    gender=data['gender'],
+                    type='outpatient',
+                    last_visit_date=data['last_visit_date']
+                )
+
+            elif patient_type == 'patient':
+                new_patient = Patient(
+                    name=data['name'],
+                    age=data['age'],
+                    gender=data['gender'],
+                    type='patient'
+                )
+
+            else:
+                return make_response({'error': 'Invalid patient type'}, 400)
+        except ValueError as e:
+            return make_response({'error': str(e)}, 400)
 
         db.session.add(new_patient)
         db.session.commit()
@@ -70,10 +108,51 @@ class Patient_List(Resource):
 
 
     
+class WardOccupancy(Resource):
+    # Inpatients per ward, counted from the ward_number index alone (the table itself is not read)
+    def get(self):
+        conditional_get([Inpatient.__tablename__])
+
+        def load():
+            query = (db.session.query(Inpatient.ward_number, db.func.count())
+                     .select_from(Inpatient.__table__)
+                     .group_by(Inpatient.ward_number).order_by(Inpatient.ward_number))
+            return [{'ward_number': ward, 'patients': count} for ward, count in query]
+
+        wards = cached(request.url, [Inpatient.__tablename__], load)
+        return make_response(jsonify(wards), 200)
+
+
+class PatientSearch(Resource):
+    # Patients (of every type) ranked by how closely their name matches ?q=, misspellings included
+    # (see app/patient_lookup.py); ?limit= as for the lists, but there is no next page
+    def get(self):
+        if not available():
+            return make_response({'error': 'Patient search needs a SQLite database'}, 501)
+        q = request.args.get('q', '')
+        if not q.strip():
+            return make_response({'error': 'q is required'}, 400)
+
+        fieldset = requested_fieldset(Patient, 'list')
+        conditional_get(fieldset.tables())
+        scores = dict(lookup(q, get_limit()))
+
+        patients = fieldset.query(Patient.id).filter(Patient.id.in_(scores)).all()
+        order = {id: position for position, id in enumerate(scores)}
+        patients.sort(key=lambda patient: order[patient.id])
+        results = fieldset.serialize_many(patients)
+        for result, patient in zip(results, patients):
+            result['score'] = scores[patient.id]
+
+        return make_response(jsonify(results), 200)
+
+
 class Patient_By_ID(Resource):
     def get(self, id):
 
-        patients = Patient.query.filter_by(id=id).first().to_dict()
+        fieldset = requested_fieldset(Patient, loads=Patient.serialize_loads)
+        conditional_get(fieldset.tables())
+        patients = fieldset.serialize(fieldset.query().filter_by(id=id).first())
         response = make_response(jsonify(patients), 200)
         return response 
     
@@ -91,10 +170,111 @@ class Patient_By_ID(Resource):
 
 class PatientMedicalRecords(Resource):
     def get(self, id):
+        fieldset = requested_fieldset(Medical_Record, loads=Medical_Record.serialize_loads)
+        conditional_get(fieldset.tables())
+
         patient = Patient.query.get(id)
         if not patient:
             return make_response({"error": "Patient not found"}, 404)
 
-        records = [record.to_dict() for record in patient.medical_records]
+        query = fieldset.query(Medical_Record.date, Medical_Record.id).filter_by(patient_id=id)
+        records = fieldset.serialize_many(query.order_by(Medical_Record.date, Medical_Record.id))
         return make_response(records, 200)
 
+
+class PatientTimeline(Resource):
+    # Appointments and medical records merged by date, a page at a time (?from=&to=&limit=&after=, see app/timeline.py)
+    def get(self, id):
+        conditional_get(timeline_tables())
+        if db.session.scalar(db.select(Patient.id).where(Patient.id == id)) is None:
+            return make_response({"error": "Patient not found"}, 404)
+
+        page = timeline(id)
+        return make_response(jsonify(page.items), 200, page.headers())
+
+
+class PatientBulk(Resource):
+    # JSON arrays written in one transaction, with a status per item (see app/bulk.py)
+    def post(self):
+        items, error = bulk_items()
+        if error:
+            return error
+
+        result = BulkResult(len(items))
+        by_type = {}
+        for i, item in enumerate(items):
+            if not check_required(result, i, item, ['type']):
+                continue
+            if item['type'] not in PATIENT_TYPES:
+                result.error(i, 'Invalid patient type')
+                continue
+            model, fields = PATIENT_TYPES[item['type']]
+            if check_required(result, i, item, fields) and check_values(result, i, item, model):
+                by_type.setdefault(item['type'], []).append(i)
+
+        # One batched INSERT per type (plus one into the subtype table for inpatients/outpatients)
+        for patient_type, indexes in by_type.items():
+            model, fields = PATIENT_TYPES[patient_type]
+            rows = [{'type': patient_type, **{field: items[i][field] for field in fields}} for i in indexes]
+            for i, new_id in zip(indexes, insert_rows(model, rows)):
+                result.ok(i, 201, id=new_id)
+        db.session.commit()
+
+        return result.response(201)
+
+    def patch(self):
+        # [{"id": 1, "ward_number": 4}, ...]: fields of the patient's stored type; the type itself can't change
+        items, error = bulk_items()
+        if error:
+            return error
+
+        result = BulkResult(len(items))
+        valid = [i for i, item in enumerate(items) if check_required(result, i, item, ['id'])]
+        types = values_by_id(Patient, Patient.type, [items[i]['id'] for i in valid])
+        any_type_fields = {field for _, fields in PATIENT_TYPES.values() for field in fields}
+
+        rows = {}
+        for i in valid:
+            item = items[i]
+            if not is_id(item['id']):
+                result.error(i, f"Invalid id: {item['id']!r}")
+                continue
+            if item['id'] not in types:
+                result.error(i, f"Invalid id: {item['id']!r}", 404)
+                continue
+            patient_type = types[item['id']]
+            model, fields = PATIENT_TYPES[patient_type]
+            if item.get('type', patient_type) != patient_type:
+                result.error(i, f"Type can't be changed from {patient_type!r}")
+                continue
+            other = sorted(field for field in item.keys() & any_type_fields if field not in fields)
+            if other:
+                result.error(i, f"Not fields of type {patient_type!r}: {', '.join(other)}")
+                continue
+            if not check_values(result, i, item, model):
+                continue
+            row = {'id': item['id'], **{field: item[field] for field in fields if field in item}}
+            if len(row) == 1:
+                result.ok(i, 200, id=item['id'])  # nothing to change
+            else:
+                rows[i] = row
+
+        def write(indexes):
+            # One batched UPDATE per type and set of columns, split between patients and the subtype's table
+            for patient_type in PATIENT_TYPES:
+                of_type = [rows[i] for i in indexes if types[rows[i]['id']] == patient_type]
+                if of_type:
+                    update_rows(PATIENT_TYPES[patient_type][0], of_type)
+            return [rows[i]['id'] for i in indexes]
+
+        write_verified(result, list(rows), write, 200)
+        return result.response(200)
+
+    def delete(self):
+        # The bulk DELETE bypasses the ORM cascades, so dependent and subtype rows are listed explicitly
+        return bulk_delete(Patient, dependents=[
+            (Appointment, Appointment.patient_id),
+            (Medical_Record, Medical_Record.patient_id),
+            (Inpatient.__table__, Inpatient.__table__.c.id),
+            (Outpatient.__table__, Outpatient.__table__.c.id),
+        ])
@@ -0,0 +1,99 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Department, DepartmentStats, DiagnosisStats, Doctor, DoctorStats
+from app.pagination import get_limit, paginate
+from app.cache import cached
+from app.conditional import conditional_get
+from app.errors import bad_request
+from app.export import int_arg
+from app.stats import SOURCE_TABLES
+
+stats_bp = Blueprint('stats_bp', __name__, url_prefix='/stats')
+
+# Read from the summary tables kept by app/stats.py; cached and conditional on the tables they are counted from
+_appointments = func.coalesce(DoctorStats.appointments, 0).label('appointments')
+_records = func.coalesce(DoctorStats.records, 0).label('records')
+DOCTOR_SORTS = {'appointments': _appointments, 'records': _records}
+
+
+def _respond(load):
+    conditional_get(SOURCE_TABLES)
+    body, headers = cached(request.url, SOURCE_TABLES, load)
+    return jsonify(body), 200, headers
+
+
+@stats_bp.route('/', methods=['GET'])
+def get_overview():
+    def load():
+        appointments, records = db.session.execute(
+            select(func.coalesce(func.sum(DoctorStats.appointments), 0),
+                   func.coalesce(func.sum(DoctorStats.records), 0))).one()
+        return {
+            'departments': db.session.scalar(select(func.count()).select_from(Department)),
+            'doctors': db.session.scalar(select(func.count()).select_from(Doctor)),
+            'appointments': appointments,
+            'medical_records': records,
+            'diagnoses': db.session.scalar(select(func.count()).where(DiagnosisStats.records > 0)),
+        }, {}
+
+    return _respond(load)
+
+
+@stats_bp.route('/departments', methods=['GET'])
+def get_department_stats():
+    # Doctors per department, and the appointments and records of those doctors
+    def load():
+        per_department = (select(Doctor.department_id,
+                                 func.sum(DoctorStats.appointments).label('appointments'),
+                                 func.sum(DoctorStats.records).label('records'))
+                          .join(DoctorStats, DoctorStats.doctor_id == Doctor.id)
+                          .group_by(Doctor.department_id).subquery())
+        query = (db.session.query(Department.id, Department.name,
+                                  func.coalesce(DepartmentStats.doctors, 0).label('doctors'),
+                                  func.coalesce(per_department.c.appointments, 0).label('appointments'),
+                                  func.coalesce(per_department.c.records, 0).label('records'))
+                 .outerjoin(DepartmentStats, DepartmentStats.department_id == Department.id)
+                 .outerjoin(per_department, per_department.c.department_id == Department.id))
+        page = paginate(query, Department.id)
+        return [row._asdict() for row in page.items], page.headers()
+
+    return _respond(load)
+
+
+@stats_bp.route('/doctors', methods=['GET'])
+def get_doctor_stats():
+    # ?department_id=; ?sort=appointments|records lists the ?limit= busiest doctors instead of a page by id
+    sort = request.args.get('sort')
+    if sort is not None and sort not in DOCTOR_SORTS:
+        bad_request(f"Invalid sort: expected one of {', '.join(DOCTOR_SORTS)}")
+    department_id = int_arg('department_id')
+
+    def load():
+        query = (db.session.query(Doctor.id, Doctor.name, Doctor.specialization, Doctor.department_id,
+                                  _appointments, _records)
+                 .outerjoin(DoctorStats, DoctorStats.doctor_id == Doctor.id))
+        if department_id is not None:
+            query = query.filter(Doctor.department_id == department_id)
+        if sort:
+            rows = query.order_by(DOCTOR_SORTS[sort].desc(), Doctor.id).limit(get_limit()).all()
+            return [row._asdict() for row in rows], {}
+        page = paginate(query, Doctor.id)
+        return [row._asdict() for row in page.items], page.headers()
+
+    return _respond(load)
+
+
+@stats_bp.route('/diagnoses', methods=['GET'])
+def get_diagnosis_stats():
+    # The ?limit= most frequent diagnoses
+    def load():
+        rows = db.session.execute(
+            select(DiagnosisStats.diagnosis, DiagnosisStats.records)
+            .where(DiagnosisStats.records > 0)
+            .order_by(DiagnosisStats.records.desc(), DiagnosisStats.diagnosis)
+            .limit(get_limit()))
+        return [row._asdict() for row in rows], {}
+
+    return _respond(load)
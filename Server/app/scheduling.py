@@ -0,0 +1,251 @@
+# Appointment times and double-booking checks.
+#
+# An appointment takes [start_time, end_time) on its date. Two appointments conflict when they share the doctor or
+# the patient, fall on the same date and their times overlap. (doctor_id, date) and (patient_id, date) are both
+# indexed (see models.py), so a check only reads the appointments that doctor and that patient have on that day:
+#
+#   WHERE doctor_id = :doctor AND date = :date AND start_time IS NOT NULL
+#
+# and compares the handful of intervals it gets back in memory, however many appointments the table holds.
+# A new appointment without times is booked at the opening time (WORKING_HOURS_START) for APPOINTMENT_MINUTES,
+# and checked like any other. Appointments booked before times were recorded have none and never conflict.
+#
+# The single-row endpoints check after flushing their own INSERT/UPDATE; the bulk endpoints check the batch before
+# writing it and verify it again once it is written (see app/bulk.py). On SQLite the write holds the database's
+# write lock until the commit, so no concurrent request can take the same slot between the check and the commit.
+# Other databases let two transactions write at once and (under READ COMMITTED) neither would see the other's
+# uncommitted appointment, so there the check first locks the doctor and patient rows it is about.
+from bisect import insort
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_, select
+
+from app import db
+from app.models import Appointment, Doctor, Patient, parse_time
+
+# (id, date) pairs per query (each binds two parameters)
+_KEY_CHUNK = 250
+
+_COLUMNS = (Appointment.id, Appointment.doctor_id, Appointment.patient_id, Appointment.date,
+            Appointment.start_time, Appointment.end_time)
+
+
+class Booking:
+    """The parts of an appointment that matter for conflicts."""
+    __slots__ = ('id', 'doctor_id', 'patient_id', 'date', 'start_time', 'end_time')
+
+    def __init__(self, id, doctor_id, patient_id, date, start_time, end_time):
+        self.id = id
+        self.doctor_id = doctor_id
+        self.patient_id = patient_id
+        self.date = date
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @classmethod
+    def of(cls, appointment):
+        return cls(*(getattr(appointment, column.key) for column in _COLUMNS))
+
+    def overlaps(self, other):
+        return self.start_time < other.end_time and other.start_time < self.end_time
+
+
+def end_after(start, minutes=None):
+    """``start`` plus ``minutes`` (default APPOINTMENT_MINUTES); raises ValueError past midnight."""
+    minutes = current_app.config['APPOINTMENT_MINUTES'] if minutes is None else minutes
+    end = datetime.combine(date.min, start) + timedelta(minutes=minutes)
+    if end.date() != date.min:
+        raise ValueError('An appointment must end on the day it starts')
+    return end.time()
+
+
+def duration(start, end):
+    """Minutes from ``start`` to ``end``, or None if either is missing."""
+    if start is None or end is None:
+        return None
+    return (datetime.combine(date.min, end) - datetime.combine(date.min, start)) // timedelta(minutes=1)
+
+
+def fill_times(values, previous_minutes=None):
+    """Parse start_time/end_time in ``values`` (a dict) and fill in a missing end_time; raises ValueError.
+
+    The end defaults to start_time plus ``previous_minutes`` (the length the appointment had before a reschedule)
+    or APPOINTMENT_MINUTES.
+    """
+    start = values['start_time'] = parse_time(values.get('start_time'))
+    end = values['end_time'] = parse_time(values.get('end_time'))
+    if start is None:
+        if end is not None:
+            raise ValueError('end_time needs a start_time')
+        return values
+    if end is None:
+        end = values['end_time'] = end_after(start, previous_minutes)
+    if end <= start:
+        raise ValueError('end_time must be after start_time')
+    return values
+
+
+def new_booking_times(values):
+    """fill_times() for a new appointment, which starts at WORKING_HOURS_START when it has no times at all."""
+    if values.get('start_time') is None and values.get('end_time') is None:
+        values['start_time'] = current_app.config['WORKING_HOURS_START']
+    return fill_times(values)
+
+
+def _lock_parties(bookings):
+    # Locks the doctor and patient rows of `bookings` until the commit, so that concurrent checks of the same doctor
+    # or patient run one after the other. FOR NO KEY UPDATE doesn't wait for the KEY SHARE lock an INSERT takes on
+    # the rows its foreign keys point to; ids are locked in order, doctors first, so two requests can't deadlock.
+    # Not needed (nor supported) on SQLite, see the top of this file.
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return
+    for model, attr in ((Doctor, 'doctor_id'), (Patient, 'patient_id')):
+        ids = sorted({getattr(b, attr) for b in bookings if b.start_time is not None})
+        for start in range(0, len(ids), _KEY_CHUNK):
+            query = select(model.id).where(model.id.in_(ids[start:start + _KEY_CHUNK])).order_by(model.id)
+            db.session.execute(query.with_for_update(key_share=True))
+
+
+def _load(bookings, exclude):
+    # Timed appointments sharing a (doctor, date) or (patient, date) with one of `bookings`, in two queries per
+    # chunk of keys. The pairs are spelled out as ORed equalities, which SQLite looks up one by one in the
+    # (doctor_id, date) / (patient_id, date) index; a row-value IN (VALUES ...) list would scan the table.
+    found = {}
+    for column, attr in ((Appointment.doctor_id, 'doctor_id'), (Appointment.patient_id, 'patient_id')):
+        keys = list({(getattr(b, attr), b.date) for b in bookings})
+        for start in range(0, len(keys), _KEY_CHUNK):
+            pairs = [and_(column == key, Appointment.date == day) for key, day in keys[start:start + _KEY_CHUNK]]
+            query = select(*_COLUMNS).where(or_(*pairs)).where(Appointment.start_time.is_not(None))
+            for row in db.session.execute(query):
+                if row.id not in exclude:
+                    found[row.id] = Booking(*row)
+    return found.values()
+
+
+def _start(booking):
+    return booking.start_time
+
+
+def _overlapping(day, booking):
+    # `day` is sorted by start time, so the scan stops at the first appointment that starts after this one ends
+    for other in day:
+        if other.start_time >= booking.end_time:
+            return None
+        if booking.overlaps(other):
+            return other
+    return None
+
+
+def find_conflicts(bookings, exclude=()):
+    """{index: message} for the ``bookings`` that overlap a stored appointment or an earlier booking in the list.
+
+    Stored appointments with an id in ``exclude`` (or the id of one of ``bookings``) are left out, so that a
+    booking is not compared with the row it is about to replace, or with itself once it is written.
+    """
+    timed = [(index, b) for index, b in enumerate(bookings) if b.start_time is not None]
+    if not timed:
+        return {}
+    exclude = set(exclude) | {b.id for _, b in timed if b.id is not None}
+
+    # Each doctor's and patient's day, sorted by start time
+    days = defaultdict(list)
+    for stored in _load([b for _, b in timed], exclude):
+        days['Doctor', stored.doctor_id, stored.date].append(stored)
+        days['Patient', stored.patient_id, stored.date].append(stored)
+    for day in days.values():
+        day.sort(key=_start)
+
+    conflicts = {}
+    for index, booking in timed:
+        keys = [('Doctor', booking.doctor_id, booking.date), ('Patient', booking.patient_id, booking.date)]
+        for key in keys:
+            clash = _overlapping(days[key], booking)
+            if clash is not None:
+                label = f'appointment {clash.id}' if clash.id else 'another appointment in this request'
+                conflicts[index] = (f"{key[0]} {key[1]} already has {label} "
+                                    f"from {clash.start_time:%H:%M} to {clash.end_time:%H:%M} on {booking.date}")
+                break
+        else:
+            # Accepted, so the bookings after it are checked against it too
+            for key in keys:
+                insort(days[key], booking, key=_start)
+    return conflicts
+
+
+def booking_conflict(appointment):
+    """Why ``appointment`` (flushed, so it has an id) can't be booked, or None."""
+    booking = Booking.of(appointment)
+    _lock_parties([booking])
+    conflicts = find_conflicts([booking])
+    return conflicts.get(0)
+
+
+# === Bulk ===
+# Hooks for app.bulk.bulk_create/bulk_update: `check` runs before the batch is written, `verify` after.
+
+def _booking(item, id=None):
+    return Booking(id, item['doctor_id'], item['patient_id'], item['date'], item['start_time'], item['end_time'])
+
+
+def check_bulk_create(result, items, indexes):
+    kept = []
+    for i in indexes:
+        try:
+            new_booking_times(items[i])
+        except ValueError as e:
+            result.error(i, str(e))
+            continue
+        kept.append(i)
+
+    conflicts = find_conflicts([_booking(items[i]) for i in kept])
+    for position, message in conflicts.items():
+        result.error(kept[position], message, 409)
+    return [i for i in kept if not result.failed(i)]
+
+
+def check_bulk_update(result, items, indexes):
+    # Patched fields are merged into the stored rows, so a partial update is checked as the row it will become
+    stored = {}
+    ids = [items[i]['id'] for i in indexes]
+    for start in range(0, len(ids), _KEY_CHUNK):
+        query = select(*_COLUMNS).where(Appointment.id.in_(ids[start:start + _KEY_CHUNK]))
+        stored.update((row.id, row._asdict()) for row in db.session.execute(query))
+
+    kept, merged = [], []
+    for i in indexes:
+        item = items[i]
+        if not {'date', 'start_time', 'end_time', 'doctor_id', 'patient_id'} & item.keys():
+            kept.append(i)
+            continue
+        row = {**stored[item['id']], **item}
+        if 'start_time' in item and 'end_time' not in item:
+            row['end_time'] = None
+        previous = stored[item['id']]
+        try:
+            fill_times(row, duration(previous['start_time'], previous['end_time']))
+        except ValueError as e:
+            result.error(i, str(e))
+            continue
+        item['end_time'] = row['end_time']
+        kept.append(i)
+        merged.append((i, _booking(row, item['id'])))
+
+    # Rows of the batch are compared at their new times, not at the ones they are moving away from
+    conflicts = find_conflicts([booking for _, booking in merged], exclude=[booking.id for _, booking in merged])
+    for position, message in conflicts.items():
+        result.error(merged[position][0], message, 409)
+    return [i for i in kept if not result.failed(i)]
+
+
+def verify_bulk(ids):
+    """{id: message} for the written rows ``ids`` that conflict with an appointment booked concurrently."""
+    stored = []
+    for start in range(0, len(ids), _KEY_CHUNK):
+        query = select(*_COLUMNS).where(Appointment.id.in_(ids[start:start + _KEY_CHUNK]))
+        stored.extend(Booking(*row) for row in db.session.execute(query))
+    # The batch was checked against itself before it was written; only rows outside it matter here
+    _lock_parties(stored)
+    conflicts = find_conflicts(stored, exclude=ids)
+    return {stored[position].id: message for position, message in conflicts.items()}
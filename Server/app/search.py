@@ -0,0 +1,178 @@
+# Full-text indexes (SQLite FTS5) and the search over medical records (GET /records/search).
+#
+# Each index is an external-content FTS5 table: it indexes some text columns of a table but stores no copy of them,
+# and triggers on the table keep it in step with every INSERT, UPDATE and DELETE, whichever way the row is written
+# (ORM, bulk endpoints, imports). An index is created with its table, and by a migration for existing databases;
+# `flask search rebuild` repopulates them all, e.g. after rows were written with the triggers missing.
+#
+#   medical_records_fts   diagnosis and treatment, stemmed (porter) so "inhalers" finds "inhaler", 2- and 3-letter
+#                         prefixes indexed so "inh*" doesn't scan the vocabulary, ranked with BM25 (diagnosis x2)
+#   patient_names_fts     patients.name word by word, with 1- to 3-letter prefixes and a table of the distinct
+#                         words (patient_names_fts_vocab), for app/patient_lookup.py
+#
+# /records/search:
+# ?q=         words that must all appear; "a phrase" in quotes, inh* for a prefix
+# ?patient_id= ?doctor_id= ?from=YYYY-MM-DD&to=YYYY-MM-DD
+# ?limit= ?after=   keyset pagination over (rank, id), like the other collection endpoints
+import re
+import time
+from contextlib import contextmanager
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, Float, column, event, literal_column, table, text, type_coerce
+
+from app import db
+from app.errors import bad_request
+from app.models import Medical_Record, Patient
+
+
+class FullTextIndex:
+    """An FTS5 index named ``name`` over ``columns`` of ``source`` (a Table with an integer ``id``)."""
+
+    def __init__(self, name, source, columns, options, rank=None, vocabulary=False):
+        self.name = name
+        self.source = source
+        self.table = table(name, column('rowid'))
+        self.triggers = tuple(f'{name}_{action}' for action in ('insert', 'delete', 'update'))
+
+        listed = ', '.join(columns)
+        new = ', '.join(f'new.{c}' for c in columns)
+        old = ', '.join(f'old.{c}' for c in columns)
+        insert = f"INSERT INTO {name}(rowid, {listed}) VALUES (new.id, {new});"
+        delete = f"INSERT INTO {name}({name}, rowid, {listed}) VALUES ('delete', old.id, {old});"
+        self.statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+            f"{listed}, content='{source.name}', content_rowid='id', {options})",
+            f"CREATE TRIGGER IF NOT EXISTS {self.triggers[0]} AFTER INSERT ON {source.name} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.triggers[1]} AFTER DELETE ON {source.name} BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.triggers[2]} AFTER UPDATE OF {listed}, id ON {source.name} "
+            f"BEGIN {delete} {insert} END",
+        ]
+        if rank:
+            self.statements.append(f"INSERT INTO {name}({name}, rank) VALUES ('rank', '{rank}')")
+
+        # <name>_vocab lists the indexed words (term) and the number of rows containing each (doc)
+        self.vocabulary = f'{name}_vocab' if vocabulary else None
+        self.tables = (name,)
+        if vocabulary:
+            self.statements.append(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.vocabulary} USING fts5vocab({name}, 'row')")
+            self.tables = (self.vocabulary, name)
+
+        # Created with the table by create_all(); the triggers go with the table, the index has to be dropped
+        for statement in self.statements:
+            event.listen(source, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+        for created in self.tables:
+            event.listen(source, 'before_drop', DDL(f'DROP TABLE IF EXISTS {created}').execute_if(dialect='sqlite'))
+
+    @property
+    def match(self):
+        # The left-hand side of "<index> MATCH :query"
+        return literal_column(self.name).op('MATCH')
+
+    def create(self, connection):
+        """Create the index and its triggers on ``connection`` if they are missing."""
+        for statement in self.statements:
+            connection.execute(text(statement))
+
+    def rebuild(self, connection):
+        """Re-read every row of the source table into the index."""
+        connection.execute(text(f"INSERT INTO {self.name}({self.name}) VALUES ('rebuild')"))
+        connection.execute(text(f"INSERT INTO {self.name}({self.name}) VALUES ('optimize')"))
+
+    def drop(self, connection):
+        for trigger in self.triggers:
+            connection.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+        for created in self.tables:
+            connection.execute(text(f'DROP TABLE IF EXISTS {created}'))
+
+
+RECORDS = FullTextIndex('medical_records_fts', Medical_Record.__table__, ('diagnosis', 'treatment'),
+                        "tokenize='porter unicode61 remove_diacritics 2', prefix='2 3'", rank='bm25(2.0, 1.0)')
+PATIENT_NAMES = FullTextIndex('patient_names_fts', Patient.__table__, ('name',),
+                              "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'", vocabulary=True)
+INDEXES = (RECORDS, PATIENT_NAMES)
+
+rank = type_coerce(literal_column(f'{RECORDS.name}.rank'), Float).label('rank')
+
+
+def available():
+    return db.engine.dialect.name == 'sqlite'
+
+
+@contextmanager
+def index_paused():
+    """Drop the sync triggers for a bulk load and rebuild the indexes once, at the end, within the session.
+
+    Indexing row by row makes inserting records about four times slower; a single rebuild costs a fraction of that.
+    """
+    if not available():
+        yield
+        return
+    for index in INDEXES:
+        for trigger in index.triggers:
+            db.session.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+    try:
+        yield
+    finally:
+        connection = db.session.connection()
+        for index in INDEXES:
+            index.create(connection)
+            index.rebuild(connection)
+        db.session.commit()
+
+
+# === Queries ===
+
+_TOKEN = re.compile(r'"([^"]*)"?|(\w+)(\*?)')
+_WORD = re.compile(r'\w+')
+
+
+def match_expression(q):
+    """The FTS5 query for the search box text ``q``, or '' if it has no words.
+
+    Every word and phrase is quoted, so operators and punctuation typed by the user are never parsed as FTS5 syntax;
+    a trailing * is kept as a prefix search.
+    """
+    terms = []
+    for phrase, word, star in _TOKEN.findall(q):
+        if word:
+            terms.append(f'"{word}"{star}')
+        else:
+            words = _WORD.findall(phrase)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+    return ' '.join(terms)
+
+
+def search_query(q):
+    """(Medical_Record.id, rank) of the records matching ``q``; order by (rank, id) for the best matches first."""
+    expression = match_expression(q or '')
+    if not expression:
+        bad_request('q must contain at least one word')
+    return (db.session.query(Medical_Record.id, rank)
+            .join(RECORDS.table, RECORDS.table.c.rowid == Medical_Record.id)
+            .filter(RECORDS.match(expression)))
+
+
+# === CLI ===
+
+@click.group('search')
+def search_command():
+    """Manage the full-text indexes."""
+
+
+@search_command.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Create the indexes if needed and repopulate them from their tables."""
+    if not available():
+        raise click.ClickException('Full-text search needs a SQLite database')
+    for index in INDEXES:
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            index.create(connection)
+            index.rebuild(connection)
+            count = connection.scalar(text(f'SELECT count(*) FROM {index.source.name}'))
+        click.echo(f"Indexed {count} rows of {index.source.name} in {time.perf_counter() - started:.1f}s.")
@@ -1,109 +1,233 @@
-
-#from .models import Doctor, Patient, Department, Appointment, Medical_Record
-from app import db, create_app
-
-from faker import Faker
-from datetime import datetime, timedelta
+# Seeds the database with synthetic data, from the small demo set up to benchmark scale.
+#
+#   python -m app.seed                                   # 10 doctors, 20 patients, 20 records, 20 appointments
+#   python -m app.seed --patients 100000 --doctors 2000 --records 5000000 --appointments 5000000
+#   python -m app.seed --preset benchmark --seed 42      # the dataset the benchmarks/ scripts are measured on
+#
+# The same --seed always produces the same database. Faker is only used to build small pools of names up front;
+# every row is then drawn from those pools with random.choices() a whole batch at a time, and written with one
+# executemany INSERT per batch of SEED_BATCH_SIZE rows, so a benchmark-size database takes minutes, not hours.
+import argparse
 import random
-from random import choice as rc
+import time
+from datetime import date, datetime, timedelta
 
-from app.models import Patient, Inpatient, Outpatient, Medical_Record, Doctor  # Ensure these are correctly imported
-import random
-
-fake = Faker()
-app = create_app()
+from faker import Faker
+from sqlalchemy import insert, update
 
-def seed_data():
+from app import db, create_app
+from app.models import Appointment, Department, Doctor, Inpatient, Medical_Record, Outpatient, Patient
+from app import versions
+from app.search import index_paused
+
+# Rows generated and inserted per statement
+SEED_BATCH_SIZE = 50_000
+
+PRESETS = {
+    'demo': {'doctors': 10, 'patients': 20, 'records': 20, 'appointments': 20},
+    'benchmark': {'doctors': 2_000, 'patients': 100_000, 'records': 5_000_000, 'appointments': 5_000_000},
+}
+
+# The first doctors are always these, as in the original hand-written seed
+MANUAL_DOCTORS = [
+    ("Dr. Alice Kamau", "Cardiologist", "alice.kamau@hospital.com"),
+    ("Dr. Brian Otieno", "Neurologist", "brian.otieno@hospital.com"),
+    ("Dr. Cynthia Mwangi", "Pediatrician", "cynthia.mwangi@hospital.com"),
+    ("Dr. Daniel Kiprotich", "Dermatologist", "daniel.kiprotich@hospital.com"),
+    ("Dr. Emily Wambui", "General Surgeon", "emily.wambui@hospital.com"),
+    ("Dr. Felix Njoroge", "Radiologist", "felix.njoroge@hospital.com"),
+    ("Dr. Grace Achieng", "Gynecologist", "grace.achieng@hospital.com"),
+    ("Dr. Henry Kimani", "Oncologist", "henry.kimani@hospital.com"),
+    ("Dr. Irene Mutua", "ENT Specialist", "irene.mutua@hospital.com"),
+    ("Dr. James Mwenda", "Orthopedic Surgeon", "james.mwenda@hospital.com"),
+]
+SPECIALIZATIONS = [specialization for _, specialization, _ in MANUAL_DOCTORS]
+
+DIAGNOSES = [
+    ("Flu", "Rest and paracetamol"),
+    ("Asthma", "Use inhaler daily"),
+    ("Malaria", "Artemether-lumefantrine"),
+    ("Hypertension", "Amlodipine 5mg daily"),
+    ("Diabetes", "Insulin therapy"),
+    ("Migraine", "Ibuprofen as needed"),
+    ("COVID-19", "Home isolation + vitamins"),
+    ("Allergy", "Cetirizine 10mg daily"),
+    ("Fracture", "Apply cast for 6 weeks"),
+    ("Ulcer", "Omeprazole 20mg daily"),
+    ("Sinusitis", "Nasal spray & rest"),
+    ("Back pain", "Physical therapy"),
+    ("Toothache", "Tooth extraction"),
+    ("Ear infection", "Antibiotic ear drops"),
+    ("Pneumonia", "Azithromycin 5 days"),
+    ("Sprain", "R.I.C.E therapy"),
+    ("Bronchitis", "Steam & cough syrup"),
+    ("Anemia", "Iron supplements"),
+    ("Chickenpox", "Calamine & antihistamine"),
+    ("Thyroid disorder", "Levothyroxine"),
+]
+
+REASONS = ["Check-up", "Follow up", "Consultation", "Surgery", "Root Canal", "Lab results", "Vaccination",
+           "Physiotherapy", "Prescription refill", "Scan review"]
+
+# Dates are spread over five years
+_FIRST_DAY = date(2021, 1, 1)
+DATES = [_FIRST_DAY + timedelta(days=i) for i in range(5 * 365)]
+
+# Appointments start on the half hour between 09:00 and 16:30 and last 30 minutes. They are drawn at random,
+# so a few of them double-book a doctor or patient (writes through the API are checked, see app/scheduling.py).
+SLOTS = [(datetime(2021, 1, 1, 9) + timedelta(minutes=30 * i)).time() for i in range(17)]
+
+
+def _batches(total, size=SEED_BATCH_SIZE):
+    # (first id, batch size) pairs covering ids 1..total
+    for start in range(0, total, size):
+        yield start + 1, min(size, total - start)
+
+
+def _insert(table, rows):
+    # Core INSERT through the session, so table_versions is bumped like any other bulk write (app/versions.py)
+    if rows:
+        db.session.execute(insert(table), rows)
+
+
+class Generator:
+    """Draws whole columns of values at a time from fixed pools, all from one seeded random.Random."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.first_names = [fake.unique.first_name() for _ in range(500)]
+        self.last_names = [fake.unique.last_name() for _ in range(500)]
+
+    def names(self, k):
+        return [f'{first} {last}' for first, last in
+                zip(self.rng.choices(self.first_names, k=k), self.rng.choices(self.last_names, k=k))]
+
+    def ints(self, low, high, k):
+        return self.rng.choices(range(low, high + 1), k=k)
+
+    def choices(self, population, k):
+        return self.rng.choices(population, k=k)
+
+
+def seed_departments_and_doctors(gen, count):
+    departments = [{'id': i, 'name': f'{specialty} Department', 'specialty': specialty}
+                   for i, specialty in enumerate(SPECIALIZATIONS, 1)]
+    _insert(Department.__table__, departments)
+
+    for first_id, k in _batches(count):
+        names = gen.names(k)
+        specialties = gen.choices(range(len(SPECIALIZATIONS)), k)
+        rows = []
+        for offset, (name, specialty) in enumerate(zip(names, specialties)):
+            doctor_id = first_id + offset
+            if doctor_id <= len(MANUAL_DOCTORS):
+                name, specialization, contact = MANUAL_DOCTORS[doctor_id - 1]
+                specialty = doctor_id - 1
+            else:
+                specialization = SPECIALIZATIONS[specialty]
+                contact = f"{name.lower().replace(' ', '.')}{doctor_id}@hospital.com"
+                name = f'Dr. {name}'
+            rows.append({'id': doctor_id, 'name': name, 'specialization': specialization, 'contact': contact,
+                         'department_id': specialty + 1})
+        _insert(Doctor.__table__, rows)
+
+    # Each department is headed by its first doctor (the departments exist before the doctors that reference them)
+    for i in range(1, min(count, len(SPECIALIZATIONS)) + 1):
+        db.session.execute(update(Department.__table__).where(Department.id == i).values(headdoctor_id=i))
+
+
+def seed_patients(gen, count):
+    patients, inpatients, outpatients = Patient.__table__, Inpatient.__table__, Outpatient.__table__
+    for first_id, k in _batches(count):
+        types = gen.choices(['inpatient', 'outpatient'], k)
+        base = [{'id': first_id + i, 'name': name, 'age': age, 'gender': gender, 'type': patient_type}
+                for i, (name, age, gender, patient_type) in
+                enumerate(zip(gen.names(k), gen.ints(1, 90, k), gen.choices(['Male', 'Female'], k), types))]
+        dates = gen.choices(DATES, k)
+        wards = gen.ints(100, 999, k)
+        _insert(patients, base)
+        _insert(inpatients, [{'id': row['id'], 'admission_date': dates[i], 'ward_number': wards[i]}
+                             for i, row in enumerate(base) if row['type'] == 'inpatient'])
+        _insert(outpatients, [{'id': row['id'], 'last_visit_date': dates[i]}
+                              for i, row in enumerate(base) if row['type'] == 'outpatient'])
+
+
+def seed_records(gen, count, patients, doctors):
+    for first_id, k in _batches(count):
+        diagnoses = gen.choices(DIAGNOSES, k)
+        _insert(Medical_Record.__table__, [
+            {'id': first_id + i, 'diagnosis': diagnosis, 'treatment': treatment, 'date': day,
+             'patient_id': patient_id, 'doctor_id': doctor_id}
+            for i, ((diagnosis, treatment), day, patient_id, doctor_id) in
+            enumerate(zip(diagnoses, gen.choices(DATES, k), gen.ints(1, patients, k), gen.ints(1, doctors, k)))
+        ])
+
+
+def seed_appointments(gen, count, patients, doctors):
+    for first_id, k in _batches(count):
+        _insert(Appointment.__table__, [
+            {'id': first_id + i, 'date': day, 'start_time': SLOTS[slot], 'end_time': SLOTS[slot + 1],
+             'reason': reason, 'patient_id': patient_id, 'doctor_id': doctor_id}
+            for i, (day, slot, reason, patient_id, doctor_id) in
+            enumerate(zip(gen.choices(DATES, k), gen.ints(0, len(SLOTS) - 2, k), gen.choices(REASONS, k),
+                          gen.ints(1, patients, k), gen.ints(1, doctors, k)))
+        ])
+
+
+def seed_data(doctors=10, patients=20, records=20, appointments=20, seed=42):
+    app = create_app()
     with app.app_context():
         db.drop_all()
         db.create_all()
+        versions.ensure_version_rows()
 
-        print('Start Seeding...')
-
-        # Seed Doctors
-                # Seed Doctors (manual)
-        print("👨‍⚕️ Seeding Doctors...")
-        doctors = [
-            Doctor(name="Dr. Alice Kamau", specialization="Cardiologist", contact="alice.kamau@hospital.com"),
-            Doctor(name="Dr. Brian Otieno", specialization="Neurologist", contact="brian.otieno@hospital.com"),
-            Doctor(name="Dr. Cynthia Mwangi", specialization="Pediatrician", contact="cynthia.mwangi@hospital.com"),
-            Doctor(name="Dr. Daniel Kiprotich", specialization="Dermatologist", contact="daniel.kiprotich@hospital.com"),
-            Doctor(name="Dr. Emily Wambui", specialization="General Surgeon", contact="emily.wambui@hospital.com"),
-            Doctor(name="Dr. Felix Njoroge", specialization="Radiologist", contact="felix.njoroge@hospital.com"),
-            Doctor(name="Dr. Grace Achieng", specialization="Gynecologist", contact="grace.achieng@hospital.com"),
-            Doctor(name="Dr. Henry Kimani", specialization="Oncologist", contact="henry.kimani@hospital.com"),
-            Doctor(name="Dr. Irene Mutua", specialization="ENT Specialist", contact="irene.mutua@hospital.com"),
-            Doctor(name="Dr. James Mwenda", specialization="Orthopedic Surgeon", contact="james.mwenda@hospital.com"),
-        ]
+        if db.engine.dialect.name == 'sqlite':
+            # Throwaway data: skip the fsync after every batch
+            db.session.execute(db.text('PRAGMA synchronous = OFF'))
 
-        for doctor in doctors:
-            db.session.add(doctor)
-        db.session.commit()
-        print("✅ 10 Manual Doctors added.")
-
-
-        # Seed Patients
-        print('Seeding Patients...')
-        for p in range(20):
-            if random.choice(['in', 'out']) == 'in':
-                patient = Inpatient(
-                    name=fake.name(),
-                    age=random.randint(1, 200),
-                    gender=random.choice(['Male', 'Female']),
-                    admission_date=str(fake.date_this_year()),
-                    ward_number=random.randint(100, 999),
-                    type='inpatient'
-                )
-            else:
-                patient = Outpatient(
-                    name=fake.name(),
-                    age=random.randint(1, 90),
-                    gender=random.choice(['Male', 'Female']),
-                    last_visit_date=str(fake.date_this_year()),
-                    type='outpatient'
-                )
-            db.session.add(patient)
-
-        db.session.commit()
-
-        # Seed Medical Records
-        print('📋 Seeding Medical Records ...')
-        patients = Patient.query.all()
-        if not patients or not doctors:
-            print("⚠️ Cannot seed medical records — missing patients or doctors.")
-            return
-
-        records = [
-            Medical_Record(diagnosis="Flu", treatment="Rest and paracetamol", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-01"),
-            Medical_Record(diagnosis="Asthma", treatment="Use inhaler daily", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-03"),
-            Medical_Record(diagnosis="Malaria", treatment="Artemether-lumefantrine", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-05"),
-            Medical_Record(diagnosis="Hypertension", treatment="Amlodipine 5mg daily", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-07"),
-            Medical_Record(diagnosis="Diabetes", treatment="Insulin therapy", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-09"),
-            Medical_Record(diagnosis="Migraine", treatment="Ibuprofen as needed", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-11"),
-            Medical_Record(diagnosis="COVID-19", treatment="Home isolation + vitamins", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-13"),
-            Medical_Record(diagnosis="Allergy", treatment="Cetirizine 10mg daily", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-15"),
-            Medical_Record(diagnosis="Fracture", treatment="Apply cast for 6 weeks", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-17"),
-            Medical_Record(diagnosis="Ulcer", treatment="Omeprazole 20mg daily", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-19"),
-            Medical_Record(diagnosis="Sinusitis", treatment="Nasal spray & rest", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-21"),
-            Medical_Record(diagnosis="Back pain", treatment="Physical therapy", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-23"),
-            Medical_Record(diagnosis="Toothache", treatment="Tooth extraction", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-25"),
-            Medical_Record(diagnosis="Ear infection", treatment="Antibiotic ear drops", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-27"),
-            Medical_Record(diagnosis="Pneumonia", treatment="Azithromycin 5 days", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-29"),
-            Medical_Record(diagnosis="Sprain", treatment="R.I.C.E therapy", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-01-31"),
-            Medical_Record(diagnosis="Bronchitis", treatment="Steam & cough syrup", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-02-02"),
-            Medical_Record(diagnosis="Anemia", treatment="Iron supplements", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-02-04"),
-            Medical_Record(diagnosis="Chickenpox", treatment="Calamine & antihistamine", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-02-06"),
-            Medical_Record(diagnosis="Thyroid disorder", treatment="Levothyroxine", patient_id=rc(patients).id, doctor_id=rc(doctors).id, date="2025-02-08"),
+        print('Start Seeding...')
+        gen = Generator(seed)
+        started = time.perf_counter()
+
+        # (label, rows, step, needs patients and doctors)
+        steps = [
+            ("👨‍⚕️ Seeding Doctors", doctors, lambda: seed_departments_and_doctors(gen, doctors), False),
+            ("🧑 Seeding Patients", patients, lambda: seed_patients(gen, patients), False),
+            ("📋 Seeding Medical Records", records, lambda: seed_records(gen, records, patients, doctors), True),
+            ("📅 Seeding Appointments", appointments, lambda: seed_appointments(gen, appointments, patients, doctors), True),
         ]
+        # Records are indexed for full-text search in one pass at the end rather than row by row
+        with index_paused():
+            for label, count, step, references in steps:
+                if not count:
+                    continue
+                if references and not (patients and doctors):
+                    print(f"⚠️ {label} skipped — missing patients or doctors.")
+                    continue
+                step_started = time.perf_counter()
+                print(f"{label} ({count:,})...")
+                step()
+                db.session.commit()
+                elapsed = time.perf_counter() - step_started
+                print(f"✅ {count:,} rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)")
+
+        print(f"✅ Seeding complete in {time.perf_counter() - started:.1f}s.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fill the database with reproducible synthetic data.')
+    parser.add_argument('--preset', choices=PRESETS, default='demo', help='Base sizes (default: demo).')
+    for name in PRESETS['demo']:
+        parser.add_argument(f'--{name}', type=int, help=f'Number of {name} (overrides the preset).')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data.')
+    args = parser.parse_args(argv)
+
+    sizes = {name: getattr(args, name) if getattr(args, name) is not None else default
+             for name, default in PRESETS[args.preset].items()}
+    seed_data(seed=args.seed, **sizes)
 
-        for record in records:
-            db.session.add(record)
-
-        db.session.commit()
-        print("✅ 20 Manual Medical Records added.")
-
-        print("✅ Seeding complete.")
 
 if __name__ == "__main__":
-    seed_data()
-
+    main()
@@ -0,0 +1,123 @@
+# Compiled serializers for the hot read paths.
+#
+# SerializerMixin.to_dict() re-walks serialize_rules ('-doctors.department', ...) through a rule tree and
+# re-inspects the mapper for every object it serializes. The output only depends on the model classes involved,
+# so here the same rule tree is walked once per (model, view) and turned into a flat plan: which columns to copy
+# and which relationships to descend into with which sub-plan. Serializing a row is then a handful of getattr calls.
+#
+# The plans are built with sqlalchemy_serializer's own Schema, so the output is identical to to_dict().
+#
+# Views:
+#   serialize(obj)               same output as obj.to_dict() (serialize_rules)
+#   serialize(obj, 'list')       the 'list' entry of the model's serialize_views (an `only` schema, see models.py)
+#   serialize(obj, ('id', ...))  an ad-hoc `only` schema, e.g. built from ?fields=&expand= (see fieldsets.py)
+from sqlalchemy import inspect
+from sqlalchemy_serializer.lib.schema import Schema
+from sqlalchemy_serializer.serializer import Serializer
+
+from app.instrumentation import timed
+
+# Values of these types are copied as-is; anything else (dates, decimals, ...) goes through sqlalchemy_serializer
+_ATOMIC_TYPES = (int, str, float, bool, type(None))
+
+# Ad-hoc views come from query parameters, so the number of compiled roots is capped
+_MAX_ROOTS = 256
+
+
+class _Node:
+    """One position in the serialization tree; holds a compiled plan per concrete model class seen there."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.plans = {}
+
+    def plan_for(self, cls):
+        plan = self.plans.get(cls)
+        if plan is None:
+            plan = self.plans[cls] = _Plan(cls, self.schema)
+        return plan
+
+
+class _Plan:
+    __slots__ = ('columns', 'relationships', 'convert')
+
+    def __init__(self, cls, schema):
+        # Same steps as Serializer.serialize_model(), done once per class instead of once per object
+        schema.update(only=cls.serialize_only, extend=cls.serialize_rules)
+
+        mapper = inspect(cls)
+        keys = schema.keys
+        if schema.is_greedy:
+            keys.update(attr.key for attr in mapper.attrs)
+
+        self.columns = []
+        self.relationships = []
+        for key in sorted(keys):
+            # A fieldset may name a subtype column (ward_number) that other rows in the hierarchy don't have
+            if not schema.is_included(key) or key not in mapper.attrs:
+                continue
+            if key in mapper.relationships:
+                self.relationships.append((key, _Node(schema.fork(key))))
+            else:
+                self.columns.append(key)
+
+        serializer = Serializer(
+            date_format=cls.date_format,
+            datetime_format=cls.datetime_format,
+            time_format=cls.time_format,
+            decimal_format=cls.decimal_format,
+        )
+        self.convert = serializer.apply_callback
+
+    def __call__(self, obj):
+        data = {}
+        for key in self.columns:
+            value = getattr(obj, key)
+            data[key] = value if isinstance(value, _ATOMIC_TYPES) else self.convert(value)
+
+        for key, node in self.relationships:
+            value = getattr(obj, key)
+            if value is None:
+                data[key] = None
+            elif isinstance(value, list):
+                data[key] = [node.plan_for(type(item))(item) for item in value]
+            else:
+                data[key] = node.plan_for(type(value))(value)
+        return data
+
+
+_roots = {}
+
+
+def _root(cls, view):
+    root = _roots.get((cls, view))
+    if root is None:
+        if len(_roots) >= _MAX_ROOTS:
+            _roots.clear()
+        schema = Schema()
+        if isinstance(view, str):
+            schema.update(only=cls.serialize_views[view])
+        elif view is not None:
+            schema.update(only=view)
+        root = _roots[(cls, view)] = _Node(schema)
+    return root
+
+
+def serialize(obj, view=None):
+    """Serialize one model instance.
+
+    ``view`` is the name of one of its serialize_views, a tuple of `only` rules, or None for the to_dict() output.
+    """
+    with timed('serialize'):
+        return _serialize(obj, view)
+
+
+def serialize_many(objs, view=None):
+    with timed('serialize'):
+        return [_serialize(obj, view) for obj in objs]
+
+
+def _serialize(obj, view):
+    # Subclasses (Inpatient, Outpatient) share their base class's views, so the root is keyed on the base
+    base = inspect(type(obj)).base_mapper.class_
+    return _root(base, view).plan_for(type(obj))(obj)
@@ -0,0 +1,285 @@
+# Precomputed statistics (GET /stats/...): doctors per department, appointments and records per doctor, records
+# per diagnosis.
+#
+# Each count lives in a summary table (DepartmentStats, DoctorStats, DiagnosisStats in models.py) and is adjusted
+# by the session hooks below in the same transaction as the write it counts, so it commits or rolls back with it:
+#
+#   ORM flushes         objects added (+1), deleted (-1) or moved to another doctor/department/diagnosis (-1, +1),
+#                       read in before_flush (stored values) and after_flush (new values, foreign keys filled in)
+#   bulk statements     INSERT: from the parameter sets; DELETE: the affected rows are read with the statement's
+#                       WHERE before it runs; UPDATE: the rows it touches are read before and after it runs
+#
+# Statements whose rows can't be told in advance (INSERT ... SELECT, a DELETE or UPDATE without WHERE) recount the
+# counters of their table instead. `flask stats check` compares every counter with its source table and
+# `flask stats rebuild` recomputes them all.
+from collections import Counter, defaultdict
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, inspect, select, update
+
+from app import db
+from app.database import upsert_insert
+from app.models import Appointment, DepartmentStats, DiagnosisStats, Doctor, DoctorStats, Medical_Record
+
+# Ids per SELECT ... IN
+_IN_CHUNK = 500
+
+
+class Statistic:
+    """``summary.<column>`` holds the number of rows of ``key``'s table per value of ``key``."""
+
+    def __init__(self, key, summary, column):
+        self.key = key
+        self.source = key.table
+        self.summary = summary
+        self.column = summary.c[column]
+        self.summary_key = summary.primary_key.columns[0]
+
+    def __repr__(self):
+        return f"{self.summary.name}.{self.column.key}"
+
+
+COUNTERS = (
+    Statistic(Doctor.__table__.c.department_id, DepartmentStats.__table__, 'doctors'),
+    Statistic(Appointment.__table__.c.doctor_id, DoctorStats.__table__, 'appointments'),
+    Statistic(Medical_Record.__table__.c.doctor_id, DoctorStats.__table__, 'records'),
+    Statistic(Medical_Record.__table__.c.diagnosis, DiagnosisStats.__table__, 'records'),
+)
+SUMMARIES = tuple(dict.fromkeys(counter.summary for counter in COUNTERS))
+
+_BY_SOURCE = defaultdict(list)
+for _counter in COUNTERS:
+    _BY_SOURCE[_counter.source].append(_counter)
+
+# Tables the statistics are derived from, for conditional GETs and cache tags
+SOURCE_TABLES = ('appointments', 'departments', 'doctors', 'medical_records')
+
+
+# === Writing ===
+
+def _upsert(connection, counter, values, add=True):
+    # Add ``values`` ({key: n}) to the counter, or set it to them with add=False
+    rows = [{counter.summary_key.key: key, counter.column.key: n} for key, n in values.items()
+            if key is not None and (n or not add)]
+    if not rows:
+        return
+    insert = upsert_insert(connection)
+    if insert is None:
+        for row in rows:
+            value = row[counter.column.key]
+            changed = connection.execute(
+                update(counter.summary).where(counter.summary_key == row[counter.summary_key.key])
+                .values({counter.column.key: counter.column + value if add else value}))
+            if not changed.rowcount:
+                connection.execute(counter.summary.insert(), row)
+        return
+    statement = insert(counter.summary)
+    new = statement.excluded[counter.column.key]
+    statement = statement.on_conflict_do_update(index_elements=[counter.summary_key],
+                                                set_={counter.column.key: counter.column + new if add else new})
+    connection.execute(statement, rows)
+
+
+def _apply(connection, deltas):
+    for counter, values in deltas.items():
+        _upsert(connection, counter, values)
+
+
+def counts(connection, counter):
+    """{key: rows} computed from the source table."""
+    query = select(counter.key, func.count()).where(counter.key.is_not(None)).group_by(counter.key)
+    return dict(connection.execute(query).all())
+
+
+def recount(connection, counter):
+    connection.execute(update(counter.summary).values({counter.column.key: 0}))
+    _upsert(connection, counter, counts(connection, counter), add=False)
+
+
+def rebuild(connection):
+    """Recompute every counter from the source tables."""
+    for summary in SUMMARIES:
+        connection.execute(delete(summary))
+    for counter in COUNTERS:
+        recount(connection, counter)
+
+
+def check(connection):
+    """{counter: [(key, stored, actual)]} for every counter that disagrees with its source table."""
+    mismatches = {}
+    for counter in COUNTERS:
+        stored = dict(connection.execute(select(counter.summary_key, counter.column).where(counter.column != 0)).all())
+        actual = counts(connection, counter)
+        wrong = [(key, stored.get(key, 0), actual.get(key, 0)) for key in stored.keys() | actual.keys()
+                 if stored.get(key, 0) != actual.get(key, 0)]
+        if wrong:
+            mismatches[counter] = sorted(wrong, key=lambda mismatch: str(mismatch[0]))
+    return mismatches
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _fill_created(metadata, connection, tables=(), **kw):
+    # A summary table created next to existing data (create_all() on an older database) starts out counted
+    created = {table.name for table in tables}
+    for counter in COUNTERS:
+        if counter.summary.name in created:
+            recount(connection, counter)
+
+
+# === ORM flushes ===
+
+def _counters(obj):
+    tables = inspect(obj).mapper.tables
+    return [counter for table in tables for counter in _BY_SOURCE.get(table, ())]
+
+
+def _stored(session, obj, column):
+    # The value of `column` in obj's row as it is before the flush
+    history = inspect(obj).attrs[column.key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    # Not loaded (or overwritten without being loaded): read it from the row, which the flush hasn't touched yet
+    return session.connection().scalar(select(column).where(column.table.c.id == inspect(obj).identity[0]))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _before_flush(session, flush_context, instances):
+    deltas = defaultdict(Counter)
+    moved = []
+    for obj in session.deleted:
+        for counter in _counters(obj):
+            deltas[counter][_stored(session, obj, counter.key)] -= 1
+    for obj in session.dirty:
+        for counter in _counters(obj):
+            moved.append((obj, counter, _stored(session, obj, counter.key)))
+    session.info['stats_flush'] = (deltas, moved)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _after_flush(session, flush_context):
+    deltas, moved = session.info.pop('stats_flush', (defaultdict(Counter), []))
+    for obj in session.new:
+        for counter in _counters(obj):
+            deltas[counter][getattr(obj, counter.key.key)] += 1
+    for obj, counter, old in moved:
+        if obj in session.deleted:
+            continue
+        new = getattr(obj, counter.key.key)
+        if new != old:
+            deltas[counter][old] -= 1
+            deltas[counter][new] += 1
+    _apply(session.connection(), deltas)
+
+
+# === Bulk statements ===
+
+def _keys(connection, table, counters, where):
+    # {id: (key of each counter)} of the rows matching `where`
+    query = select(table.c.id, *[counter.key for counter in counters]).where(where)
+    return {row[0]: tuple(row[1:]) for row in connection.execute(query)}
+
+
+def _keys_by_id(connection, table, counters, ids):
+    found = {}
+    for start in range(0, len(ids), _IN_CHUNK):
+        found.update(_keys(connection, table, counters, table.c.id.in_(ids[start:start + _IN_CHUNK])))
+    return found
+
+
+def _differences(counters, before, after):
+    deltas = defaultdict(Counter)
+    for rows, sign in ((before, -1), (after, 1)):
+        for keys in rows.values():
+            for counter, key in zip(counters, keys):
+                deltas[counter][key] += sign
+    return deltas
+
+
+def _recount_after(orm_execute_state, counters):
+    result = orm_execute_state.invoke_statement()
+    connection = orm_execute_state.session.connection()
+    for counter in counters:
+        recount(connection, counter)
+    return result
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _count_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    statement = orm_execute_state.statement
+    mapper = orm_execute_state.bind_mapper
+    table = mapper.local_table if mapper is not None else statement.table
+    counters = _BY_SOURCE.get(table)
+    if not counters:
+        return None
+
+    connection = orm_execute_state.session.connection()
+    parameters = orm_execute_state.parameters
+    rows = [parameters] if isinstance(parameters, dict) else list(parameters or ())
+
+    if orm_execute_state.is_insert:
+        if not rows:
+            return _recount_after(orm_execute_state, counters)
+        deltas = defaultdict(Counter)
+        for row in rows:
+            for counter in counters:
+                deltas[counter][row.get(counter.key.key)] += 1
+        _apply(connection, deltas)
+        return None
+
+    where = statement.whereclause
+    if orm_execute_state.is_delete:
+        if where is None:
+            return _recount_after(orm_execute_state, counters)
+        _apply(connection, _differences(counters, _keys(connection, table, counters, where), {}))
+        return None
+
+    # UPDATE: by primary key, one parameter set per row (ORM bulk UPDATE), or by its WHERE clause
+    if where is None and rows and all('id' in row for row in rows):
+        changed = [row['id'] for row in rows if any(counter.key.key in row for counter in counters)]
+        if not changed:
+            return None
+        ids = list(dict.fromkeys(changed))
+    elif where is not None:
+        ids = list(connection.scalars(select(table.c.id).where(where)))
+    else:
+        return _recount_after(orm_execute_state, counters)
+    before = _keys_by_id(connection, table, counters, ids)
+    result = orm_execute_state.invoke_statement()
+    _apply(connection, _differences(counters, before, _keys_by_id(connection, table, counters, ids)))
+    return result
+
+
+# === CLI ===
+
+@click.group('stats')
+def stats_command():
+    """Check or rebuild the precomputed statistics."""
+
+
+@stats_command.command('check')
+@with_appcontext
+def check_command():
+    """Compare every counter with the table it counts; exits with status 1 if any is off."""
+    with db.engine.connect() as connection:
+        mismatches = check(connection)
+    for counter, wrong in mismatches.items():
+        click.echo(f"{counter}: {len(wrong)} wrong")
+        for key, stored, actual in wrong[:10]:
+            click.echo(f"  {key!r}: {stored} stored, {actual} counted")
+    if mismatches:
+        raise click.ClickException('Statistics are out of date; run `flask stats rebuild`')
+    click.echo(f"All {len(COUNTERS)} counters match.")
+
+
+@stats_command.command('rebuild')
+@with_appcontext
+def rebuild_command():
+    """Recompute every counter from the source tables."""
+    with db.engine.begin() as connection:
+        rebuild(connection)
+    click.echo(f"Rebuilt {len(COUNTERS)} counters.")
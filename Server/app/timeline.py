@@ -0,0 +1,67 @@
+# Patient timeline (GET /patients/<id>/timeline): a patient's appointments and medical records in one list, by date.
+#
+# Each source is read with a range scan of its (patient_id, date) index, starting after the cursor and stopping at
+# ?limit= + 1 rows, and the two runs are merged in (date, type, id) order. A page therefore costs two short index
+# scans however long the patient's history is, and ?from=&to= narrow both scans to a window of dates.
+import heapq
+
+from flask import request
+
+from app.export import date_arg
+from app.fieldsets import view_fieldset
+from app.models import Appointment, Medical_Record
+from app.pagination import Page, decode_cursor, encode_cursor, get_limit, merged_after
+
+# Merge order of the types on the same date
+SOURCES = (
+    ('appointment', Appointment),
+    ('medical_record', Medical_Record),
+)
+
+# A cursor is the (date, position of the type in SOURCES, id) of the last entry returned
+_CURSOR_COLUMNS = (Appointment.date, Appointment.id, Appointment.id)
+
+
+def _fieldset(model):
+    return view_fieldset(model, 'timeline', loads=('doctor',))
+
+
+def tables():
+    """Tables the timeline reads, for conditional GETs."""
+    return sorted({name for _, model in SOURCES for name in _fieldset(model).tables()} | {'patients'})
+
+
+def _entries(position, model, patient_id, start, end, cursor, limit):
+    # [(date, position, id, obj)] of the first `limit` rows of one source after the cursor
+    query = _fieldset(model).query(model.date, model.id).filter(model.patient_id == patient_id)
+    if start:
+        query = query.filter(model.date >= start)
+    if end:
+        query = query.filter(model.date <= end)
+    if cursor:
+        query = query.filter(merged_after(model.date, model.id, position, cursor))
+    rows = query.order_by(model.date, model.id).limit(limit).all()
+    return [(obj.date, position, obj.id, obj) for obj in rows]
+
+
+def timeline(patient_id):
+    """One page of the patient's timeline for the current request's ?from=&to=&limit=&after=."""
+    start, end = date_arg('from'), date_arg('to')
+    limit = get_limit()
+    after = request.args.get('after')
+    cursor = tuple(decode_cursor(after, _CURSOR_COLUMNS)) if after else None
+
+    runs = [_entries(position, model, patient_id, start, end, cursor, limit + 1)
+            for position, (_, model) in enumerate(SOURCES)]
+    entries = list(heapq.merge(*runs, key=lambda entry: entry[:3]))[:limit + 1]
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(list(entries[-1][:3]))
+
+    items = []
+    for _, position, _, obj in entries:
+        name, model = SOURCES[position]
+        items.append({'type': name, **_fieldset(model).serialize(obj)})
+    return Page(items, next_cursor)
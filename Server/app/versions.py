@@ -0,0 +1,84 @@
+# Tracks which tables each transaction writes and keeps the per-table version counters in table_versions.
+#
+# ORM flushes are seen through after_flush, bulk INSERT/UPDATE/DELETE statements through do_orm_execute. The
+# counters are bumped on the same connection, so they commit (or roll back) together with the data, and every
+# process reading table_versions sees the same value. The set of written tables is kept in
+# session.info['written_tables'] until the transaction ends, for after_commit listeners such as the read cache.
+from datetime import datetime, timezone
+
+from sqlalchemy import event, inspect, select, update
+
+from app import db
+from app.models import TableVersion
+
+_versions = TableVersion.__table__
+
+
+def _now():
+    # Naive UTC, matching what SQLite hands back
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def written_tables(session):
+    return session.info.setdefault('written_tables', set())
+
+
+def _bump(session, tables):
+    tables = set(tables) - {_versions.name}
+    if not tables:
+        return
+    written_tables(session).update(tables)
+    session.connection().execute(
+        update(_versions)
+        .where(_versions.c.name.in_(tables))
+        .values(version=_versions.c.version + 1, updated_at=_now())
+    )
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_flush(session, flush_context):
+    tables = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tables.update(table.name for table in inspect(obj).mapper.tables)
+    _bump(session, tables)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _record_bulk_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        tables = mapper.tables if mapper is not None else [orm_execute_state.statement.table]
+        _bump(orm_execute_state.session, [table.name for table in tables])
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _forget_written(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('written_tables', None)
+
+
+def ensure_version_rows():
+    """Create the missing table_versions rows (one per mapped table); run once at startup."""
+    existing = set(db.session.scalars(select(_versions.c.name)))
+    missing = [name for name in db.metadata.tables if name not in existing and name != _versions.name]
+    if missing:
+        db.session.execute(_versions.insert(), [
+            {'name': name, 'version': 0, 'updated_at': _now()} for name in missing
+        ])
+        db.session.commit()
+
+
+def versions_query(tables):
+    return select(_versions.c.name, _versions.c.version, _versions.c.updated_at).where(_versions.c.name.in_(tables))
+
+
+def get_versions(tables):
+    """{table: (version, updated_at)} for ``tables``, in a single query."""
+    rows = db.session.execute(versions_query(tables))
+    return {name: (version, updated_at) for name, version, updated_at in rows}
+
+
+async def get_versions_async(session, tables):
+    """get_versions() read through ``session``, an AsyncSession."""
+    rows = await session.execute(versions_query(tables))
+    return {name: (version, updated_at) for name, version, updated_at in rows}
@@ -0,0 +1,6 @@
+from app.asgi import create_asgi_app
+from dotenv import load_dotenv
+load_dotenv()
+
+# Production serving mode: uvicorn asgi:app --host 0.0.0.0 --port 5555 --workers 4 (see README)
+app = create_asgi_app()
@@ -0,0 +1,365 @@
+# End-to-end API benchmark: drives create_app() in-process through the Flask test client.
+#
+# Meant to run against the benchmark dataset (python -m app.seed --preset benchmark). For every route in
+# app/routes/ it records latency percentiles, throughput and the number of SQL statements per request.
+# Write routes only touch rows the run creates itself (create -> patch -> delete), so the dataset is left as it was.
+#
+#   python -m benchmarks.bench_api --output results.json                   # run and save
+#   python -m benchmarks.bench_api --compare baseline.json                 # run, then fail on regressions
+#   python -m benchmarks.bench_api --compare baseline.json --against results.json   # compare two saved runs
+#   python -m benchmarks.bench_api --routes patients --iterations 200      # only routes whose name contains "patients"
+#
+# A route regresses when its p50 or p95 latency grows by more than --threshold (default 0.25, i.e. +25%) or it
+# runs more queries per request than before. Per-route thresholds are read from benchmarks/thresholds.json
+# (or the file given as --thresholds), e.g. {"default": {"latency": 0.25, "queries": 0}, "home": {"latency": 1.0}};
+# routes that answer in well under a millisecond get more room, since their timings are mostly noise.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import event, func, select
+
+from app import create_app, db
+from app.models import Appointment, Department, Doctor, Medical_Record, Patient
+from benchmarks.common import percentile
+from app.pagination import encode_cursor
+
+# Sampled rows per table for the detail routes
+_ID_SAMPLE = 200
+
+DEFAULT_THRESHOLDS = {'latency': 0.25, 'queries': 0}
+THRESHOLDS_FILE = os.path.join(os.path.dirname(__file__), 'thresholds.json')
+
+
+class Context:
+    """State shared by the cases of one run: random existing ids, and the ids of rows the run created."""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.ids = {}
+        self.created = {}
+        self.counter = 0
+
+    def sample_ids(self, name, model):
+        # Existing ids spread over the whole table (one indexed lookup each, no ORDER BY random())
+        low, high = db.session.execute(select(func.min(model.id), func.max(model.id))).one()
+        if low is None:
+            self.ids[name] = []
+            return
+        self.ids[name] = [db.session.scalar(select(func.min(model.id)).where(model.id >= self.rng.randint(low, high)))
+                          for _ in range(_ID_SAMPLE)]
+
+    def pick(self, name):
+        return self.rng.choice(self.ids[name])
+
+    def unique(self):
+        self.counter += 1
+        return self.counter
+
+    def remember(self, name, id):
+        self.created.setdefault(name, []).append(id)
+
+    def cycle(self, name):
+        # Created rows in turn, for PATCH
+        ids = self.created[name]
+        ids.append(ids.pop(0))
+        return ids[-1]
+
+    def take(self, name):
+        # A created row, used up by DELETE
+        return self.created[name].pop()
+
+
+class Case:
+    def __init__(self, name, method, path, body=None, expect=(200,), after=None, requires=(), uses=None):
+        self.name = name
+        self.method = method
+        self.path = path          # ctx -> url
+        self.body = body          # ctx -> JSON body, or None
+        self.expect = expect
+        self.after = after        # (ctx, response) -> None, e.g. to remember a created id
+        self.requires = requires  # tables that must have rows
+        self.uses = uses          # rows created by an earlier case that this one patches or deletes
+
+
+def _created(name):
+    return lambda ctx, response: ctx.remember(name, response.get_json()['id'])
+
+
+def _bulk_created(name):
+    return lambda ctx, response: ctx.remember(name, [item['id'] for item in response.get_json()['results']])
+
+
+def _appointment(ctx):
+    # A day of its own after the seeded range, so that no booking conflicts with another one
+    day = date(2030, 1, 1) + timedelta(days=ctx.unique())
+    return {'date': day.isoformat(), 'start_time': '09:00', 'reason': 'Benchmark', 'patient_id': ctx.pick('patients'),
+            'doctor_id': ctx.pick('doctors')}
+
+
+def _record(ctx):
+    return {'diagnosis': 'Benchmark', 'treatment': 'Rest', 'date': '2025-07-01', 'patient_id': ctx.pick('patients'),
+            'doctor_id': ctx.pick('doctors')}
+
+
+# In run order: creates come before the patches and deletes that use their rows
+CASES = [
+    Case('home', 'GET', lambda ctx: '/'),
+
+    Case('patients.list', 'GET', lambda ctx: '/patients/'),
+    Case('patients.list_after', 'GET', lambda ctx: f'/patients/?after={encode_cursor([ctx.pick("patients")])}',
+         requires=('patients',)),
+    Case('patients.search', 'GET', lambda ctx: '/patients/search?q=jonh smth'),
+    Case('patients.inpatients', 'GET', lambda ctx: '/patients/?type=inpatient&fields=id,name,ward_number'),
+    Case('patients.wards', 'GET', lambda ctx: '/patients/wards'),
+    Case('patients.detail', 'GET', lambda ctx: f'/patients/{ctx.pick("patients")}', requires=('patients',)),
+    Case('patients.records', 'GET', lambda ctx: f'/patients/{ctx.pick("patients")}/records', requires=('patients',)),
+    Case('patients.batch', 'GET', lambda ctx: '/patients/?ids=' + ','.join(str(ctx.pick('patients')) for _ in range(50)),
+         requires=('patients',)),
+    Case('patients.timeline', 'GET', lambda ctx: f'/patients/{ctx.pick("patients")}/timeline?limit=20',
+         requires=('patients',)),
+    Case('patients.create', 'POST', lambda ctx: '/patients/',
+         body=lambda ctx: {'type': 'outpatient', 'name': 'Benchmark Patient', 'age': 40, 'gender': 'Female',
+                           'last_visit_date': '2025-07-01'},
+         expect=(201,), after=_created('patients')),
+    Case('patients.delete', 'DELETE', lambda ctx: f'/patients/{ctx.take("patients")}', expect=(204,),
+         uses='patients'),
+
+    Case('doctors.list', 'GET', lambda ctx: '/doctors/'),
+    Case('doctors.detail', 'GET', lambda ctx: f'/doctors/{ctx.pick("doctors")}', requires=('doctors',)),
+    Case('doctors.availability', 'GET', lambda ctx: '/doctors/availability?specialization=card&limit=10'),
+    Case('doctors.create', 'POST', lambda ctx: '/doctors/',
+         body=lambda ctx: {'name': 'Dr. Benchmark', 'specialization': 'Cardiologist', 'contact': 'bench@hospital.com'},
+         expect=(201,), after=_created('doctors')),
+    Case('doctors.patch', 'PATCH', lambda ctx: f'/doctors/{ctx.cycle("doctors")}',
+         body=lambda ctx: {'contact': f'bench{ctx.unique()}@hospital.com'}, uses='doctors'),
+    Case('doctors.delete', 'DELETE', lambda ctx: f'/doctors/{ctx.take("doctors")}', uses='doctors'),
+
+    Case('departments.list', 'GET', lambda ctx: '/departments/'),
+    Case('departments.detail', 'GET', lambda ctx: f'/departments/{ctx.pick("departments")}',
+         requires=('departments',)),
+    Case('departments.create', 'POST', lambda ctx: '/departments/',
+         body=lambda ctx: {'name': f'Benchmark Department {ctx.unique()}', 'specialty': 'General'},
+         expect=(201,), after=_created('departments')),
+    Case('departments.patch', 'PATCH', lambda ctx: f'/departments/{ctx.cycle("departments")}',
+         body=lambda ctx: {'specialty': f'General {ctx.unique()}'}, uses='departments'),
+    Case('departments.delete', 'DELETE', lambda ctx: f'/departments/{ctx.take("departments")}', expect=(204,),
+         uses='departments'),
+
+    Case('records.list', 'GET', lambda ctx: '/records/'),
+    Case('records.detail', 'GET', lambda ctx: f'/records/{ctx.pick("records")}', requires=('records',)),
+    Case('records.search', 'GET', lambda ctx: '/records/search?q=asthma'),
+    Case('records.export', 'GET', lambda ctx: f'/records/export?patient_id={ctx.pick("patients")}',
+         requires=('patients',)),
+    Case('records.create', 'POST', lambda ctx: '/records/', body=_record, expect=(201,), after=_created('records'),
+         requires=('patients', 'doctors')),
+    Case('records.patch', 'PATCH', lambda ctx: f'/records/{ctx.cycle("records")}',
+         body=lambda ctx: {'treatment': f'Rest {ctx.unique()}'}, uses='records'),
+    Case('records.delete', 'DELETE', lambda ctx: f'/records/{ctx.take("records")}', expect=(204,), uses='records'),
+
+    Case('stats.overview', 'GET', lambda ctx: '/stats/'),
+    Case('stats.departments', 'GET', lambda ctx: '/stats/departments'),
+    Case('stats.doctors', 'GET', lambda ctx: '/stats/doctors?sort=appointments&limit=10'),
+    Case('stats.diagnoses', 'GET', lambda ctx: '/stats/diagnoses'),
+
+    Case('changes.feed', 'GET', lambda ctx: '/changes?limit=100'),
+    Case('changes.appointments', 'GET', lambda ctx: '/changes?types=appointment&limit=100'),
+
+    Case('appointments.list', 'GET', lambda ctx: '/appointments/'),
+    Case('appointments.detail', 'GET', lambda ctx: f'/appointments/{ctx.pick("appointments")}',
+         requires=('appointments',)),
+    Case('appointments.export', 'GET', lambda ctx: f'/appointments/export?doctor_id={ctx.pick("doctors")}'
+                                                   f'&from=2025-01-01&to=2025-01-31', requires=('doctors',)),
+    Case('appointments.create', 'POST', lambda ctx: '/appointments/', body=_appointment, expect=(201,),
+         after=_created('appointments'), requires=('patients', 'doctors')),
+    Case('appointments.patch', 'PATCH', lambda ctx: f'/appointments/{ctx.cycle("appointments")}',
+         body=lambda ctx: {'reason': f'Benchmark {ctx.unique()}'}, uses='appointments'),
+    Case('appointments.delete', 'DELETE', lambda ctx: f'/appointments/{ctx.take("appointments")}',
+         uses='appointments'),
+    Case('appointments.bulk_create', 'POST', lambda ctx: '/appointments/bulk',
+         body=lambda ctx: [_appointment(ctx) for _ in range(100)], expect=(201,),
+         after=_bulk_created('appointment_batches'), requires=('patients', 'doctors')),
+    Case('appointments.bulk_delete', 'DELETE', lambda ctx: '/appointments/bulk',
+         body=lambda ctx: ctx.take('appointment_batches'), uses='appointment_batches'),
+]
+
+_TABLES = {
+    'patients': Patient,
+    'doctors': Doctor,
+    'departments': Department,
+    'records': Medical_Record,
+    'appointments': Appointment,
+}
+
+
+def run_case(client, ctx, case, iterations, warmup, queries):
+    timings = []
+    counts = []
+    for i in range(warmup + iterations):
+        path = case.path(ctx)
+        body = case.body(ctx) if case.body else None
+        queries[0] = 0
+        start = time.perf_counter()
+        response = client.open(path, method=case.method, json=body)
+        response.get_data()  # streamed bodies (exports) are only produced while being read
+        elapsed = time.perf_counter() - start
+        response.close()
+
+        if response.status_code not in case.expect:
+            raise SystemExit(f"{case.name}: {case.method} {path} returned {response.status_code}: "
+                             f"{response.get_data(as_text=True)[:300]}")
+        if case.after:
+            case.after(ctx, response)
+        if i >= warmup:
+            timings.append(elapsed)
+            counts.append(queries[0])
+
+    timings.sort()
+    return {
+        'method': case.method,
+        'iterations': iterations,
+        'mean_ms': round(statistics.fmean(timings) * 1e3, 3),
+        'p50_ms': round(percentile(timings, 50) * 1e3, 3),
+        'p90_ms': round(percentile(timings, 90) * 1e3, 3),
+        'p95_ms': round(percentile(timings, 95) * 1e3, 3),
+        'p99_ms': round(percentile(timings, 99) * 1e3, 3),
+        'max_ms': round(timings[-1] * 1e3, 3),
+        'throughput_rps': round(len(timings) / sum(timings), 1),
+        'queries_mean': round(statistics.fmean(counts), 2),
+        'queries_max': max(counts),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    app = create_app()
+    if args.cache:
+        from app.cache import BACKENDS
+        app.extensions['cache'] = BACKENDS[args.cache](max_entries=app.config['CACHE_MAX_ENTRIES'],
+                                                       ttl=app.config['CACHE_TTL'])
+    client = app.test_client()
+    ctx = Context(random.Random(args.seed))
+    queries = [0]
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _count(*_):
+            queries[0] += 1
+
+        rows = {name: db.session.scalar(select(func.count()).select_from(model)) for name, model in _TABLES.items()}
+        for name, model in _TABLES.items():
+            ctx.sample_ids(name, model)
+        db.session.remove()
+
+    results = {}
+    print(f"{'route':28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'queries':>8}")
+    for case in CASES:
+        if args.routes and not any(part in case.name for part in args.routes):
+            continue
+        if any(not rows[table] for table in case.requires):
+            print(f"{case.name:28} skipped (no {', '.join(case.requires)})")
+            continue
+        if case.uses and len(ctx.created.get(case.uses, ())) < args.warmup + args.iterations:
+            print(f"{case.name:28} skipped (needs the rows created by the {case.uses} create route)")
+            continue
+        result = results[case.name] = run_case(client, ctx, case, args.iterations, args.warmup, queries)
+        print(f"{case.name:28} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+              f"{result['throughput_rps']:9.1f} {result['queries_mean']:8.1f}")
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'],
+            'rows': rows,
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'cache': args.cache or app.config['CACHE_BACKEND'],
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, thresholds):
+    """Regressions of ``current`` against ``baseline``, as printable lines."""
+    regressions = []
+    print(f"\n{'route':28} {'p50 before':>11} {'p50 after':>10} {'change':>8} {'queries':>12}")
+    for name, before in baseline['results'].items():
+        after = current['results'].get(name)
+        if after is None:
+            continue
+        limits = {**DEFAULT_THRESHOLDS, **thresholds.get('default', {}), **thresholds.get(name, {})}
+        change = after['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        print(f"{name:28} {before['p50_ms']:11.2f} {after['p50_ms']:10.2f} {change:+8.0%} "
+              f"{before['queries_mean']:5.1f} -> {after['queries_mean']:<4.1f}")
+
+        for metric in ('p50_ms', 'p95_ms'):
+            if before[metric] and after[metric] > before[metric] * (1 + limits['latency']):
+                regressions.append(f"{name}: {metric} {before[metric]:.2f} -> {after[metric]:.2f} "
+                                   f"(limit +{limits['latency']:.0%})")
+        if after['queries_mean'] > before['queries_mean'] + limits['queries']:
+            regressions.append(f"{name}: queries per request {before['queries_mean']} -> {after['queries_mean']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every API route in-process.')
+    parser.add_argument('--iterations', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route first')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--routes', nargs='*', help='only routes whose name contains one of these')
+    parser.add_argument('--cache', choices=['memory', 'null'], help='cache backend (default: CACHE_BACKEND)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='fail if a route regressed against this JSON file')
+    parser.add_argument('--against', metavar='RESULTS', help='compare this saved run instead of running now')
+    parser.add_argument('--threshold', type=float, help='allowed p50/p95 increase (default 0.25)')
+    parser.add_argument('--thresholds', default=THRESHOLDS_FILE, help='JSON file with per-route thresholds')
+    args = parser.parse_args(argv)
+
+    if args.against:
+        with open(args.against) as f:
+            current = json.load(f)
+    else:
+        current = run(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2)
+            print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        thresholds = {}
+        if os.path.exists(args.thresholds):
+            with open(args.thresholds) as f:
+                thresholds = json.load(f)
+        if args.threshold is not None:
+            thresholds.setdefault('default', {})['latency'] = args.threshold
+
+        regressions = compare(baseline, current, thresholds)
+        if regressions:
+            print('\nRegressions:')
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print('\nNo regressions.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# Load test of the two serving modes: WSGI (Werkzeug's threaded server, as run.py) vs ASGI (uvicorn asgi:app,
+# see app/asgi.py).
+#
+# Each mode is started as a single server process on the same database, then hit by a growing number of
+# concurrent clients for a fixed time. Each client loops over the hot list reads (/patients/, /appointments/,
+# /records/, /doctors/, see DEFAULT_PATHS) with one connection per request. For every mode and concurrency it
+# prints throughput, p50/p95/p99 latency and failed requests, i.e. how far each mode scales before requests queue.
+#
+#   python -m benchmarks.bench_asgi --concurrency 1 16 64 --duration 10
+#   python -m benchmarks.bench_asgi --modes asgi --paths /patients/ --output asgi.json
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.common import percentile
+
+# The list screens' reads; the full /appointments/ and /doctors/ payloads nest every doctor's records and spend
+# most of their time encoding JSON, which neither mode can overlap
+DEFAULT_PATHS = [
+    '/patients/',
+    '/appointments/?fields=id,date,start_time,end_time,reason,patient_id,doctor_id',
+    '/records/',
+    '/doctors/?fields=id,name,specialization,department_id',
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(mode, port):
+    """Run one server in this process (the benchmark starts itself with --serve for each mode)."""
+    if mode == 'wsgi':
+        import logging
+        from werkzeug.serving import run_simple
+        from app import create_app
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no access log
+        run_simple('127.0.0.1', port, create_app(), threaded=True)
+    else:
+        import uvicorn
+        from app.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(), host='127.0.0.1', port=port, log_level='warning')
+
+
+def _start(mode, port, startup):
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_asgi', '--serve', mode, '--port', str(port)],
+                               stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + startup
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit(f'{mode} server did not start within {startup}s')
+
+
+async def _get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response[9:12])
+
+
+async def _client(port, paths, offset, deadline, latencies, failures):
+    i = offset
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            status = await _get(port, paths[i % len(paths)])
+        except OSError:
+            status = None
+        if status == 200:
+            latencies.append(time.perf_counter() - began)
+        else:
+            failures.append(status)
+        i += 1
+
+
+async def _load(port, paths, concurrency, duration):
+    latencies, failures = [], []
+    began = time.perf_counter()
+    deadline = began + duration
+    await asyncio.gather(*[_client(port, paths, i, deadline, latencies, failures) for i in range(concurrency)])
+    elapsed = time.perf_counter() - began
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'failed': len(failures),
+        'req_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1e3, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1e3, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1e3, 2),
+    }
+
+
+def run_mode(mode, args):
+    port = _free_port()
+    process = _start(mode, port, args.startup)
+    try:
+        asyncio.run(_load(port, args.paths, 1, 1))  # warm up
+        return [asyncio.run(_load(port, args.paths, concurrency, args.duration)) for concurrency in args.concurrency]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrency and tail latency of the WSGI and ASGI serving modes.')
+    parser.add_argument('--modes', nargs='*', choices=['wsgi', 'asgi'], default=['wsgi', 'asgi'])
+    parser.add_argument('--concurrency', nargs='*', type=int, default=[1, 16, 64], help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per concurrency level')
+    parser.add_argument('--paths', nargs='*', default=DEFAULT_PATHS, help='paths the clients cycle through')
+    parser.add_argument('--startup', type=float, default=15, help='seconds allowed for a server to start')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--serve', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve(args.serve, args.port)
+
+    print(f"Database: {os.getenv('DATABASE_URL', '(default)')}")
+    print(f"{'mode':<6}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    results = {}
+    for mode in args.modes:
+        results[mode] = run_mode(mode, args)
+        for row in results[mode]:
+            print(f"{mode:<6}{row['concurrency']:>8}{row['req_per_s']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+                  f"{row['p99_ms']:>10}{row['failed']:>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# Concurrent write benchmark for the SQLite engine settings in app/database.py.
+#
+# Starts several worker processes (like gunicorn workers), each with its own create_app() against the same
+# SQLite file, and has them mix POST /patients/ with GET /patients/ for a fixed time. It is run once per profile:
+#
+#   legacy   rollback journal, synchronous=FULL, no mmap, SQLite's default cache (the settings before database.py)
+#   tuned    the Config defaults: WAL, synchronous=NORMAL, busy_timeout, larger cache, mmap
+#
+# and prints writes/s, reads/s, write latency and the number of failed requests ("database is locked") per profile.
+#
+#   python -m benchmarks.bench_concurrency --workers 8 --duration 10
+#   python -m benchmarks.bench_concurrency --profiles tuned --reads 0.8 --output concurrency.json
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from app import create_app
+from benchmarks.common import percentile
+
+PROFILES = {
+    'legacy': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_CACHE_SIZE': -2000,
+        'SQLITE_MMAP_SIZE': 0,
+    },
+    'tuned': {},
+}
+
+_PATIENT = {'type': 'outpatient', 'name': 'Benchmark Patient', 'age': 40, 'gender': 'Female',
+            'last_visit_date': '2025-07-01'}
+
+
+def worker(config, reads, duration, seed, start, results):
+    app = create_app(config)
+    client = app.test_client()
+    rng = random.Random(seed)
+    write_times, reads_done, errors = [], 0, 0
+
+    start.wait()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        read = rng.random() < reads
+        began = time.perf_counter()
+        try:
+            if read:
+                response = client.get('/patients/')
+            else:
+                response = client.post('/patients/', json=_PATIENT)
+            ok = response.status_code in (200, 201)
+            response.close()
+        except Exception:  # a locked database surfaces as an OperationalError or a 500, depending on the route
+            ok = False
+        if not ok:
+            errors += 1
+        elif read:
+            reads_done += 1
+        else:
+            write_times.append(time.perf_counter() - began)
+    results.put({'write_times': write_times, 'reads': reads_done, 'errors': errors})
+
+
+def run_profile(name, args, directory):
+    path = os.path.join(directory, f'{name}.db')
+    config = {**PROFILES[name], 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'INSTRUMENTATION': False}
+    create_app(config)  # creates the tables before the workers start
+
+    mp = multiprocessing.get_context('spawn')
+    start = mp.Event()
+    results = mp.Queue()
+    processes = [mp.Process(target=worker, args=(config, args.reads, args.duration, args.seed + i, start, results))
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    time.sleep(args.startup)  # let every worker import the app before the clock starts
+    start.set()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    write_times = sorted(t for outcome in outcomes for t in outcome['write_times'])
+    return {
+        'writes_per_s': round(len(write_times) / args.duration, 1),
+        'reads_per_s': round(sum(outcome['reads'] for outcome in outcomes) / args.duration, 1),
+        'write_p50_ms': round(percentile(write_times, 50) * 1e3, 2),
+        'write_p95_ms': round(percentile(write_times, 95) * 1e3, 2),
+        'write_p99_ms': round(percentile(write_times, 99) * 1e3, 2),
+        'errors': sum(outcome['errors'] for outcome in outcomes),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent read/write benchmark per SQLite settings profile.')
+    parser.add_argument('--workers', type=int, default=4, help='worker processes')
+    parser.add_argument('--duration', type=float, default=5, help='seconds each profile runs for')
+    parser.add_argument('--reads', type=float, default=0.5, help='share of requests that are reads')
+    parser.add_argument('--profiles', nargs='*', choices=sorted(PROFILES), default=['legacy', 'tuned'])
+    parser.add_argument('--startup', type=float, default=3, help='seconds allowed for the workers to start')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix='bench_concurrency_')
+    results = {}
+    try:
+        print(f"{'profile':8} {'writes/s':>9} {'reads/s':>9} {'write p50':>10} {'write p95':>10} "
+              f"{'write p99':>10} {'errors':>7}")
+        for name in args.profiles:
+            result = results[name] = run_profile(name, args, directory)
+            print(f"{name:8} {result['writes_per_s']:9.1f} {result['reads_per_s']:9.1f} "
+                  f"{result['write_p50_ms']:10.2f} {result['write_p95_ms']:10.2f} "
+                  f"{result['write_p99_ms']:10.2f} {result['errors']:7}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if 'legacy' in results and 'tuned' in results and results['legacy']['writes_per_s']:
+        print(f"\nWrite throughput: {results['tuned']['writes_per_s'] / results['legacy']['writes_per_s']:.1f}x")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'workers': args.workers, 'duration': args.duration, 'reads': args.reads,
+                       'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Double-booking check (app/scheduling.py) against a large appointments table.
+#
+# Seeds a throwaway SQLite database with --appointments rows (app.seed's generators), then times
+#
+#   single   find_conflicts() for one booking, as POST/PATCH /appointments/ run it
+#   batch    find_conflicts() for --batch bookings at once, as the /appointments/bulk endpoints run it
+#   scan     the same single-booking lookup with the indexes disabled (NOT INDEXED), i.e. a full table scan
+#
+# and prints the latency percentiles of each. The indexed checks should stay flat as --appointments grows.
+#
+#   python -m benchmarks.bench_conflicts                              # 1,000,000 appointments
+#   python -m benchmarks.bench_conflicts --appointments 5000000 --iterations 500
+#   python -m benchmarks.bench_conflicts --database /tmp/conflicts.db --reuse   # keep the seeded data between runs
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, select, text
+
+from app import create_app, db, versions
+from app.models import Appointment
+from app.scheduling import Booking, find_conflicts
+from app.seed import DATES, SLOTS, Generator, seed_appointments, seed_departments_and_doctors, seed_patients
+from benchmarks.common import percentile
+
+_SCAN = text("SELECT id FROM appointments NOT INDEXED "
+             "WHERE ((doctor_id = :doctor AND date = :date) OR (patient_id = :patient AND date = :date)) "
+             "AND start_time IS NOT NULL")
+
+
+def _booking(rng, args):
+    slot = rng.randrange(len(SLOTS) - 1)
+    return Booking(None, rng.randint(1, args.doctors), rng.randint(1, args.patients), rng.choice(DATES),
+                   SLOTS[slot], SLOTS[slot + 1])
+
+
+def _timed(fn, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        db.session.rollback()
+    timings.sort()
+    return {
+        'p50_ms': percentile(timings, 50) * 1e3,
+        'p95_ms': percentile(timings, 95) * 1e3,
+        'p99_ms': percentile(timings, 99) * 1e3,
+        'mean_ms': statistics.fmean(timings) * 1e3,
+    }
+
+
+def seed(args):
+    db.drop_all()
+    db.create_all()
+    versions.ensure_version_rows()
+    db.session.execute(text('PRAGMA synchronous = OFF'))
+    gen = Generator(args.seed)
+    started = time.perf_counter()
+    seed_departments_and_doctors(gen, args.doctors)
+    seed_patients(gen, args.patients)
+    seed_appointments(gen, args.appointments, args.patients, args.doctors)
+    db.session.commit()
+    print(f"Seeded {args.appointments:,} appointments in {time.perf_counter() - started:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the double-booking check on a large appointments table.')
+    parser.add_argument('--appointments', type=int, default=1_000_000)
+    parser.add_argument('--doctors', type=int, default=2000)
+    parser.add_argument('--patients', type=int, default=100_000)
+    parser.add_argument('--iterations', type=int, default=200, help='checks timed per case')
+    parser.add_argument('--scan-iterations', type=int, default=10, help='full table scans timed')
+    parser.add_argument('--batch', type=int, default=100, help='bookings per batch check')
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary one)')
+    parser.add_argument('--reuse', action='store_true', help='use the rows already in --database')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    directory = None
+    path = args.database
+    if path is None:
+        directory = tempfile.mkdtemp(prefix='bench_conflicts_')
+        path = os.path.join(directory, 'conflicts.db')
+
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(path)}'})
+        with app.app_context():
+            if not args.reuse:
+                seed(args)
+            rows = db.session.scalar(select(func.count()).select_from(Appointment))
+            rng = random.Random(args.seed)
+
+            results = {
+                'single': _timed(lambda: find_conflicts([_booking(rng, args)]), args.iterations),
+                'batch': _timed(lambda: find_conflicts([_booking(rng, args) for _ in range(args.batch)]),
+                                args.iterations),
+            }
+
+            def scan():
+                booking = _booking(rng, args)
+                db.session.execute(_SCAN, {'doctor': booking.doctor_id, 'patient': booking.patient_id,
+                                           'date': booking.date.isoformat()}).all()
+            results['scan'] = _timed(scan, args.scan_iterations)
+
+        taken = rows / (args.doctors * len(DATES) * (len(SLOTS) - 1))
+        print(f"\n{rows:,} appointments ({taken:.1%} of the doctors' half-hour slots taken)")
+        print(f"{'case':8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+        for name, result in results.items():
+            print(f"{name:8} {result['p50_ms']:9.3f} {result['p95_ms']:9.3f} {result['p99_ms']:9.3f} "
+                  f"{result['mean_ms']:9.3f}")
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Compares the JSON providers (Flask's json module vs orjson, see app/json_provider.py) and the response encodings
+# (gzip, brotli, zstd, see app/compression.py) on real list payloads.
+#
+# Each path is fetched once from the database in DATABASE_URL. Its data is then encoded with both providers
+# (the bodies must decode to the same data, see app/json_provider.py) and its body compressed with every
+# available encoding at the configured level. For each path it prints the time per response and the compressed
+# size as a share of the body.
+#
+#   python -m benchmarks.bench_encoding --repeat 50
+#   python -m benchmarks.bench_encoding --paths '/records/?limit=200' --gzip-level 1
+import argparse
+import json
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app
+from app.compression import ENCODINGS
+from app.json_provider import OrjsonProvider
+
+DEFAULT_PATHS = [
+    '/patients/?limit=200',
+    '/records/?limit=200',
+    '/appointments/?limit=200',
+    '/doctors/?limit=200',
+    '/changes?limit=200',
+]
+
+
+def compress(start, body):
+    compress_chunk, finish = start()
+    return compress_chunk(body) + finish()
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON encoding and compression time per response.')
+    parser.add_argument('--paths', nargs='*', default=DEFAULT_PATHS)
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per path')
+    parser.add_argument('--gzip-level', type=int, help='default: COMPRESS_GZIP_LEVEL')
+    parser.add_argument('--brotli-quality', type=int, help='default: COMPRESS_BROTLI_QUALITY')
+    parser.add_argument('--zstd-level', type=int, help='default: COMPRESS_ZSTD_LEVEL')
+    args = parser.parse_args()
+
+    config = {'COMPRESSION': False}
+    for key, value in (('COMPRESS_GZIP_LEVEL', args.gzip_level), ('COMPRESS_BROTLI_QUALITY', args.brotli_quality),
+                       ('COMPRESS_ZSTD_LEVEL', args.zstd_level)):
+        if value is not None:
+            config[key] = value
+    app = create_app(config)
+    client = app.test_client()
+    providers = {'json': DefaultJSONProvider(app), 'orjson': OrjsonProvider(app)}
+    encoders = {name: start for name, make in ENCODINGS.items() if (start := make(app.config)) is not None}
+
+    print(f"{'path':28}{'KiB':>8}{'json ms':>9}{'orjson ms':>10}{'speedup':>8}"
+          + ''.join(f"{name + ' ms':>9}{name + ' %':>8}" for name in encoders))
+    for path in args.paths:
+        response = client.get(path)
+        if response.status_code != 200:
+            raise SystemExit(f'{path}: {response.status_code}')
+        data = response.get_json()
+
+        with app.app_context():
+            bodies, times = {}, {}
+            for name, provider in providers.items():
+                bodies[name], times[name] = per_call(lambda: provider.response(data).get_data(), args.repeat)
+        if json.loads(bodies['json']) != json.loads(bodies['orjson']):
+            raise SystemExit(f'{path}: orjson output differs from the json module')
+
+        body = bodies['orjson']
+        row = (f"{path:28}{len(body) / 1024:8.1f}{times['json'] * 1e3:9.2f}{times['orjson'] * 1e3:10.2f}"
+               f"{times['json'] / times['orjson']:7.1f}x")
+        for start in encoders.values():
+            compressed, seconds = per_call(lambda: compress(start, body), args.repeat)
+            row += f'{seconds * 1e3:9.2f}{len(compressed) / len(body) * 100:7.1f}%'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
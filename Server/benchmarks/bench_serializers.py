@@ -0,0 +1,84 @@
+# Compares SerializerMixin.to_dict() with the compiled serializers in app/serializers.py.
+#
+# Builds an in-memory object graph (no database needed), checks both produce identical output
+# and prints the time per object for each model/view.
+#
+#   python -m benchmarks.bench_serializers --doctors 200 --patients 2000 --visits 10
+import argparse
+import random
+import time
+
+from app.models import Appointment, Department, Doctor, Inpatient, Medical_Record, Outpatient
+from app.serializers import serialize
+
+
+def build_graph(n_doctors, n_patients, visits, seed=42):
+    rng = random.Random(seed)
+    departments = [Department(id=i, name=f"Dept {i}", specialty="General") for i in range(1, 11)]
+    doctors = []
+    for i in range(1, n_doctors + 1):
+        doctor = Doctor(id=i, name=f"Dr. {i}", specialization="Cardiologist", contact=f"dr{i}@hospital.com")
+        doctor.department = rng.choice(departments)
+        doctors.append(doctor)
+    for department in departments:
+        department.headdoctor = department.doctors[0] if department.doctors else None
+
+    patients = []
+    for i in range(1, n_patients + 1):
+        if i % 2:
+            patient = Inpatient(id=i, name=f"Patient {i}", age=rng.randint(1, 90), gender="Female",
+                                type="inpatient", admission_date="2025-01-01", ward_number=rng.randint(100, 999))
+        else:
+            patient = Outpatient(id=i, name=f"Patient {i}", age=rng.randint(1, 90), gender="Male",
+                                 type="outpatient", last_visit_date="2025-01-01")
+        patients.append(patient)
+
+    appointments, records = [], []
+    for i in range(1, n_patients * visits + 1):
+        patient, doctor = rng.choice(patients), rng.choice(doctors)
+        day = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        appointments.append(Appointment(id=i, date=day, reason="Check-up", patient=patient, doctor=doctor,
+                                        patient_id=patient.id, doctor_id=doctor.id))
+        records.append(Medical_Record(id=i, date=day, diagnosis="Flu", treatment="Rest", patient=patient,
+                                      doctor=doctor, patient_id=patient.id, doctor_id=doctor.id))
+    return {
+        'Doctor': doctors,
+        'Appointment': appointments,
+        'Medical_Record': records,
+        'Department': departments,
+        'Patient': patients,
+    }
+
+
+def timed(fn, objs):
+    start = time.perf_counter()
+    out = [fn(obj) for obj in objs]
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--visits', type=int, default=2, help='appointments and records per patient')
+    parser.add_argument('--sample', type=int, default=500, help='objects serialized per model')
+    args = parser.parse_args()
+
+    graph = build_graph(args.doctors, args.patients, args.visits)
+    print(f"{'model':16} {'view':8} {'to_dict us/obj':>15} {'compiled us/obj':>16} {'speedup':>8}")
+    for name, objs in graph.items():
+        objs = objs[:args.sample]
+        model = type(objs[0])
+        views = [(None, ())] + list(getattr(model, 'serialize_views', {}).items())
+        for view, only in views:
+            serialize(objs[0], view)  # compile the plan outside the timed loop
+            expected, slow = timed(lambda obj: obj.to_dict(only=only), objs)
+            actual, fast = timed(lambda obj: serialize(obj, view), objs)
+            if expected != actual:
+                raise SystemExit(f"{name} {view}: compiled output differs from to_dict()")
+            print(f"{name:16} {view or 'default':8} {slow / len(objs) * 1e6:15.1f} "
+                  f"{fast / len(objs) * 1e6:16.1f} {slow / fast:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
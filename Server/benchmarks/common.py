@@ -0,0 +1,9 @@
+# Helpers shared by the benchmark scripts.
+
+
+def percentile(sorted_values, q):
+    """The nearest-rank ``q``th percentile (0-100) of ``sorted_values``, or 0.0 when there are none."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
@@ -0,0 +1,33 @@
+"""Medical records full-text index
+
+Revision ID: 5c2e8f7a9d14
+Revises: 467905a181e4
+Create Date: 2026-10-16 23:02:11.408153
+
+"""
+from alembic import op
+
+from app.search import RECORDS
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8f7a9d14'
+down_revision = '467905a181e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 virtual table and its sync triggers (SQLite only), filled from the existing records
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    RECORDS.create(bind)
+    RECORDS.rebuild(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    RECORDS.drop(bind)
@@ -0,0 +1,33 @@
+"""Patient names full-text index
+
+Revision ID: 8e41b6d0c3a7
+Revises: 5c2e8f7a9d14
+Create Date: 2026-10-16 23:48:05.712394
+
+"""
+from alembic import op
+
+from app.search import PATIENT_NAMES
+
+
+# revision identifiers, used by Alembic.
+revision = '8e41b6d0c3a7'
+down_revision = '5c2e8f7a9d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 word index over patients.name and its sync triggers (SQLite only), filled from the existing patients
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    PATIENT_NAMES.create(bind)
+    PATIENT_NAMES.rebuild(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    PATIENT_NAMES.drop(bind)
@@ -0,0 +1,191 @@
+# The /bulk endpoints (app/bulk.py): a status per item, and what ends up in the database.
+#
+# Each test gets its own seeded database. A batch with both valid and invalid items answers 207 and writes only the
+# valid ones; a batch with no valid item answers 400 and writes nothing. Malformed items (not an object, an id or a
+# foreign key that is a list or an object, a string in an INTEGER column) are per-item 400s, never a 500.
+#
+#   python -m pytest tests          (from the Server/ directory)
+from datetime import date, time
+
+import pytest
+from sqlalchemy import func, insert, select
+
+import app.routes.appointments as appointment_routes
+from app import create_app, db
+from app.models import Appointment, Inpatient, Medical_Record, Outpatient, Patient
+from app.seed import Generator, seed_appointments, seed_departments_and_doctors, seed_patients, seed_records
+
+DOCTORS, PATIENTS, VISITS = 6, 20, 40
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'bulk.db'}",
+        'CACHE_BACKEND': 'null',
+    })
+    with app.app_context():
+        gen = Generator(11)
+        seed_departments_and_doctors(gen, DOCTORS)
+        seed_patients(gen, PATIENTS)
+        seed_records(gen, VISITS, PATIENTS, DOCTORS)
+        seed_appointments(gen, VISITS, PATIENTS, DOCTORS)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _statuses(response):
+    return [item['status'] for item in response.get_json()['results']]
+
+
+def _count(app, model, *where):
+    with app.app_context():
+        return db.session.scalar(select(func.count()).select_from(model).where(*where))
+
+
+def _first_id(app, model):
+    with app.app_context():
+        return db.session.scalar(select(model.id).order_by(model.id))
+
+
+def test_post_patients_mixed_batch(app, client):
+    before = _count(app, Patient)
+    response = client.post('/patients/bulk', json=[
+        {'type': 'patient', 'name': 'Ann Lee', 'age': 40, 'gender': 'Female'},
+        {'type': 'inpatient', 'name': 'Bo Kim', 'age': 7, 'gender': 'Male', 'admission_date': '2025-01-02',
+         'ward_number': 12},
+        {'type': 'inpatient', 'name': 'Cy Ode', 'age': 'old', 'gender': 'Male', 'admission_date': '2025-01-02',
+         'ward_number': 'abc'},
+        {'type': 'patient', 'name': ['x'], 'age': 3, 'gender': 'Female'},
+        {'type': 'ghost', 'name': 'Dee', 'age': 3, 'gender': 'Female'},
+        {'type': 'patient', 'age': 3, 'gender': 'Female'},
+        'not an object',
+    ])
+    assert response.status_code == 207
+    assert _statuses(response) == [201, 201, 400, 400, 400, 400, 400]
+
+    results = response.get_json()['results']
+    assert _count(app, Patient) == before + 2
+    with app.app_context():
+        inpatient = db.session.get(Inpatient, results[1]['id'])
+        assert (inpatient.name, inpatient.ward_number) == ('Bo Kim', 12)
+        assert db.session.scalar(select(Patient.type).where(Patient.id == results[0]['id'])) == 'patient'
+
+
+def test_post_all_invalid_is_400(app, client):
+    before = _count(app, Patient)
+    response = client.post('/patients/bulk', json=[{'type': 'patient', 'name': 'A', 'age': True, 'gender': 'F'}, 5])
+    assert response.status_code == 400
+    assert _statuses(response) == [400, 400]
+    assert _count(app, Patient) == before
+
+
+def test_post_records_checks_foreign_keys(app, client):
+    before = _count(app, Medical_Record)
+    record = {'date': '2025-02-03', 'diagnosis': 'Flu', 'treatment': 'Rest', 'doctor_id': 1}
+    response = client.post('/records/bulk', json=[
+        {**record, 'patient_id': 1},
+        {**record, 'patient_id': [1]},
+        {**record, 'patient_id': {'id': 1}},
+        {**record, 'patient_id': 99999},
+        {**record, 'patient_id': 1, 'doctor_id': 2.5},
+    ])
+    assert response.status_code == 207
+    assert _statuses(response) == [201, 400, 400, 400, 400]
+    assert _count(app, Medical_Record) == before + 1
+
+
+def test_patch_patients(app, client):
+    inpatient_id, outpatient_id = _first_id(app, Inpatient), _first_id(app, Outpatient)
+    with app.app_context():
+        outpatient_age = db.session.get(Outpatient, outpatient_id).age
+
+    response = client.patch('/patients/bulk', json=[
+        {'id': inpatient_id, 'ward_number': 321, 'name': 'New Name'},
+        {'id': outpatient_id, 'last_visit_date': '2025-03-04'},
+        {'id': outpatient_id, 'age': {'a': 1}},
+        {'id': outpatient_id, 'ward_number': 5},
+        {'id': outpatient_id, 'type': 'inpatient'},
+        {'id': 99999, 'age': 3},
+        {'id': [1], 'age': 3},
+        {'age': 3},
+    ])
+    assert response.status_code == 207
+    assert _statuses(response) == [200, 200, 400, 400, 400, 404, 400, 400]
+
+    with app.app_context():
+        inpatient = db.session.get(Inpatient, inpatient_id)
+        assert (inpatient.name, inpatient.ward_number) == ('New Name', 321)
+        outpatient = db.session.get(Outpatient, outpatient_id)
+        assert (str(outpatient.last_visit_date), outpatient.age, outpatient.type) == \
+            ('2025-03-04', outpatient_age, 'outpatient')
+
+
+def test_patch_unknown_ids_are_404(client):
+    response = client.patch('/records/bulk', json=[{'id': 99999, 'diagnosis': 'x'}, {'id': 99998}])
+    assert response.status_code == 400
+    assert _statuses(response) == [404, 404]
+
+
+@pytest.mark.parametrize('path, body', [
+    ('/patients/bulk', [{'id': 1}]),
+    ('/appointments/bulk', [[1]]),
+    ('/records/bulk', ['1', True, None]),
+])
+def test_delete_malformed_ids(app, client, path, body):
+    before = _count(app, Patient), _count(app, Appointment), _count(app, Medical_Record)
+    response = client.delete(path, json=body)
+    assert response.status_code == 400
+    assert set(_statuses(response)) == {400}
+    assert (_count(app, Patient), _count(app, Appointment), _count(app, Medical_Record)) == before
+
+
+def test_delete_patients_removes_subtype_rows_and_dependents(app, client):
+    inpatient_id, outpatient_id = _first_id(app, Inpatient), _first_id(app, Outpatient)
+    response = client.delete('/patients/bulk', json=[inpatient_id, outpatient_id, 99999])
+    assert response.status_code == 207
+    assert _statuses(response) == [200, 200, 404]
+
+    ids = [inpatient_id, outpatient_id]
+    assert _count(app, Patient, Patient.id.in_(ids)) == 0
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Inpatient.__table__)
+                                 .where(Inpatient.__table__.c.id == inpatient_id)) == 0
+        assert db.session.scalar(select(func.count()).select_from(Outpatient.__table__)
+                                 .where(Outpatient.__table__.c.id == outpatient_id)) == 0
+    assert _count(app, Appointment, Appointment.patient_id.in_(ids)) == 0
+    assert _count(app, Medical_Record, Medical_Record.patient_id.in_(ids)) == 0
+
+
+def test_concurrent_booking_is_409_and_the_rest_is_committed(app, client, monkeypatch):
+    # Another worker books doctor 1 at 09:00 on 2030-05-06 after the batch was checked and before it is written
+    check = appointment_routes.check_bulk_create
+
+    def check_then_book(result, items, indexes):
+        kept = check(result, items, indexes)
+        with db.engine.begin() as connection:
+            connection.execute(insert(Appointment.__table__).values(
+                date=date(2030, 5, 6), start_time=time(9), end_time=time(9, 30), reason='Walk-in',
+                doctor_id=1, patient_id=2))
+        return kept
+
+    monkeypatch.setattr(appointment_routes, 'check_bulk_create', check_then_book)
+    before = _count(app, Appointment)
+    booking = {'date': '2030-05-06', 'reason': 'Checkup'}
+    response = client.post('/appointments/bulk', json=[
+        {**booking, 'doctor_id': 2, 'patient_id': 3, 'start_time': '09:00'},
+        {**booking, 'doctor_id': 1, 'patient_id': 4, 'start_time': '09:15'},
+        {**booking, 'doctor_id': 2, 'patient_id': 5, 'start_time': '10:00'},
+    ])
+    assert response.status_code == 207
+    assert _statuses(response) == [201, 409, 201]
+    assert 'Doctor 1 already has appointment' in response.get_json()['results'][1]['error']
+
+    # The walk-in plus the two bookings that didn't clash
+    assert _count(app, Appointment) == before + 3
+    assert _count(app, Appointment, Appointment.date == date(2030, 5, 6), Appointment.doctor_id == 1) == 1
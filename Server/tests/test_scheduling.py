@@ -0,0 +1,63 @@
+# Double-booking checks (app/scheduling.py) through POST /appointments/ and /appointments/bulk.
+#
+# An appointment booked without times goes to WORKING_HOURS_START for APPOINTMENT_MINUTES, so leaving the time out
+# doesn't get around the conflict check.
+#
+#   python -m pytest tests          (from the Server/ directory)
+import pytest
+
+from app import create_app, db
+from app.seed import Generator, seed_departments_and_doctors, seed_patients
+
+BOOKING = {'date': '2030-06-03', 'reason': 'Checkup', 'doctor_id': 1}
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'scheduling.db'}",
+        'CACHE_BACKEND': 'null',
+        'WORKING_HOURS_START': '08:30',
+        'APPOINTMENT_MINUTES': 20,
+    })
+    with app.app_context():
+        gen = Generator(5)
+        seed_departments_and_doctors(gen, 3)
+        seed_patients(gen, 5)
+        db.session.commit()
+    return app.test_client()
+
+
+def test_untimed_appointment_gets_the_first_slot(client):
+    response = client.post('/appointments/', json={**BOOKING, 'patient_id': 1})
+    assert response.status_code == 201
+    assert (response.get_json()['start_time'], response.get_json()['end_time']) == ('08:30', '08:50')
+
+
+def test_untimed_duplicate_is_rejected(client):
+    assert client.post('/appointments/', json={**BOOKING, 'patient_id': 1}).status_code == 201
+
+    response = client.post('/appointments/', json={**BOOKING, 'patient_id': 2})
+    assert response.status_code == 409
+    assert response.get_json()['error'].startswith('Doctor 1 already has appointment')
+
+    # The same doctor later that day is fine
+    assert client.post('/appointments/', json={**BOOKING, 'patient_id': 2, 'start_time': '08:50'}).status_code == 201
+
+
+def test_untimed_duplicates_in_bulk_are_rejected(client):
+    assert client.post('/appointments/', json={**BOOKING, 'patient_id': 1}).status_code == 201
+
+    response = client.post('/appointments/bulk', json=[
+        {**BOOKING, 'patient_id': 2},
+        {**BOOKING, 'doctor_id': 2, 'patient_id': 3},
+        {**BOOKING, 'doctor_id': 2, 'patient_id': 4},
+    ])
+    assert response.status_code == 207
+    assert [item['status'] for item in response.get_json()['results']] == [409, 201, 409]
+
+
+def test_end_time_alone_is_rejected(client):
+    response = client.post('/appointments/', json={**BOOKING, 'patient_id': 1, 'end_time': '10:00'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'end_time needs a start_time'
@@ -0,0 +1,79 @@
+# The list endpoints under STRICT_LOADING=true.
+#
+# With STRICT_LOADING, a relationship that the endpoint's query did not load raises on access instead of being
+# lazy loaded (see query_for() in app/models.py), so an endpoint that misses one answers 500 here. Each endpoint is
+# read with a small and a large page, and the number of SQL statements must be the same for both, i.e. it doesn't
+# grow with the rows returned.
+#
+#   python -m pytest tests          (from the Server/ directory)
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db
+from app.seed import Generator, seed_appointments, seed_departments_and_doctors, seed_patients, seed_records
+
+DOCTORS, PATIENTS, VISITS = 12, 60, 120
+
+# One path per list endpoint and relationship expansion; ?limit= is added by the test
+PATHS = [
+    '/patients/',
+    '/patients/?expand=medical_records,appointments.doctor',
+    '/patients/?type=inpatient',
+    '/records/',
+    '/records/?expand=patient,doctor.department',
+    '/appointments/',
+    '/appointments/?expand=patient,doctor',
+    '/doctors/',
+    '/doctors/?expand=department,appointments.patient',
+    '/departments/',
+    '/departments/?expand=doctors,headdoctor',
+]
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    path = tmp_path_factory.mktemp('db') / 'strict.db'
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'STRICT_LOADING': True,
+        'CACHE_BACKEND': 'null',  # every request runs its queries
+    })
+    with app.app_context():
+        gen = Generator(7)
+        seed_departments_and_doctors(gen, DOCTORS)
+        seed_patients(gen, PATIENTS)
+        seed_records(gen, VISITS, PATIENTS, DOCTORS)
+        seed_appointments(gen, VISITS, PATIENTS, DOCTORS)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def count_queries(app):
+    counter = {'queries': 0}
+
+    def _count(*args):
+        counter['queries'] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _count)
+    yield counter
+    event.remove(engine, 'before_cursor_execute', _count)
+
+
+def _get(client, counter, path, limit):
+    counter['queries'] = 0
+    separator = '&' if '?' in path else '?'
+    response = client.get(f'{path}{separator}limit={limit}')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return len(response.get_json()), counter['queries']
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_queries_do_not_grow_with_the_page(app, count_queries, path):
+    client = app.test_client()
+    small_rows, small_queries = _get(client, count_queries, path, 2)
+    large_rows, large_queries = _get(client, count_queries, path, 50)
+    assert small_rows < large_rows
+    assert small_queries == large_queries